@@ -16,6 +16,7 @@ class MainWindow(QMainWindow):
     volume_changed = Signal(int)  # Signal for volume changes (0-100)
     rx_received = Signal(int, int)  # Signal for RX indicator (channel, jitter_ms)
     channel_changed = Signal(int)  # Signal for channel change without reconnect
+    floor_denied = Signal(int)  # Signal for a busy channel (server dropped our transmission)
 
     def __init__(self):
         super().__init__()
@@ -459,6 +460,7 @@ class MainWindow(QMainWindow):
         
         # Connect RX signal
         self.rx_received.connect(self._on_rx_received)
+        self.floor_denied.connect(self._on_floor_denied)
         
         self.current_volume = 100
         self.current_ping = 0
@@ -932,6 +934,21 @@ class MainWindow(QMainWindow):
         """Show which channel is currently receiving from (thread-safe via signal)"""
         self.rx_received.emit(channel if channel else 0, jitter_ms)
     
+    def _on_floor_denied(self, channel):
+        """Handle floor denied signal (called from main thread via signal)"""
+        if not self.is_transmitting:
+            return
+        # Orange LED until PTT is released (show_transmitting resets it)
+        self.led_label.setStyleSheet("background: #ff8800; border: 1px solid #ffaa33; border-radius: 6px;")
+        self.info_label.setText(f"K{channel:02d} BELEGT")
+        self.rx_channel_box.show()
+        self.rx_hide_timer.stop()
+        self.rx_hide_timer.start(2000)
+    
+    def set_channel_busy(self, channel):
+        """Show that the channel is busy and our transmission is dropped (thread-safe via signal)"""
+        self.floor_denied.emit(channel)
+    
     def _apply_channel(self):
         """Apply the selected channel without reconnecting"""
         self._play_button_sound()
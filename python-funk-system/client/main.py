@@ -11,6 +11,7 @@ from audio_out import AudioOutput
 from network import NetworkClient
 from hotkeys import HotkeyManager
 from config import USER_ID
+from protocol import FLOOR_DENIED
 from logger import setup_logger, log_exception
 from overlay_widget import OverlayWidget
 
@@ -232,6 +233,7 @@ class FunkClient:
                 self.on_connection_lost,
                 funk_key
             )
+            self.network.floor_callback = self.on_floor_changed
             self.network.connect()
             
             # Set network client reference for stats dialog
@@ -330,6 +332,12 @@ class FunkClient:
             self.window.show_error("Verbindung verloren!")
         self.on_disconnect()
     
+    def on_floor_changed(self, channel_id, state, user_id):
+        """Called from the network thread when the server announces who may talk on a channel"""
+        if state == FLOOR_DENIED and self.window.is_transmitting:
+            # Someone else holds the floor: our audio is dropped until PTT is pressed again
+            self.window.set_channel_busy(channel_id)
+    
     def on_audio_received(self, audio_data, sender_channel=None):
         if self.is_connected and self.audio_output:
             current_time = time.time()
@@ -446,6 +454,8 @@ class FunkClient:
         # Stop active transmission
         if self.audio_input:
             self.audio_input.stop_recording()
+        if self.network:
+            self.network.release_floor()
         self.window.show_transmitting(False)
         
         # Update overlay
@@ -1,8 +1,9 @@
 import socket
 import threading
 import logging
-from protocol import (build_packet, parse_header, build_ping_packet, build_auth_packet,
-                     PACKET_TYPE_PONG, PACKET_TYPE_AUDIO, PACKET_TYPE_AUTH_OK, PACKET_TYPE_AUTH_FAIL)
+from protocol import (build_packet, parse_header, build_ping_packet, build_auth_packet, build_floor_packet,
+                     PACKET_TYPE_PONG, PACKET_TYPE_AUDIO, PACKET_TYPE_AUTH_OK, PACKET_TYPE_AUTH_FAIL,
+                     PACKET_TYPE_FLOOR, FLOOR_DENIED, FLOOR_RELEASE)
 
 logger = logging.getLogger('DFG-Funk')
 
@@ -48,6 +49,9 @@ class NetworkClient:
         self.jitter_ms = 0  # Jitter in milliseconds
         self.last_latencies = []  # Store last 10 latencies for jitter calculation
         self.quality_callback = None  # Callback for UI updates
+        
+        # Floor control (server grants one talker per channel)
+        self.floor_callback = None  # Called with (channel_id, state, user_id) from the receive thread
 
     def connect(self):
         import time
@@ -235,6 +239,15 @@ class NetworkClient:
                             logger.info("Heartbeat bestätigt - Verbindung aktiv")
                         continue
                     
+                    # Handle FLOOR packets (who may talk on a channel)
+                    if packet_type == PACKET_TYPE_FLOOR and payload:
+                        state = payload[0]
+                        if state == FLOOR_DENIED:
+                            logger.warning(f"🚫 Kanal {channel_id} belegt - Übertragung wird vom Server verworfen")
+                        if self.floor_callback:
+                            self.floor_callback(channel_id, state, user_id)
+                        continue
+                    
                     # Handle AUDIO packets
                     if packet_type == PACKET_TYPE_AUDIO and payload:
                         packet_count += 1
@@ -330,6 +343,16 @@ class NetworkClient:
                 self._send_auth_primary()
                 # Secondary channel 41 bleibt verbunden, keine neue Auth nötig
     
+    def release_floor(self):
+        """Tell the server the transmission ended (PTT released), so others may talk at once"""
+        if not self.running or not self.socket or not self.authenticated:
+            return
+        try:
+            packet = build_floor_packet(self.channel_id, self.user_id, FLOOR_RELEASE)
+            self.socket.sendto(packet, (self.server_ip, self.server_port))
+        except Exception as e:
+            logger.debug(f"Floor-Release nicht gesendet: {e}")
+
     def set_transmit_channel(self, channel_id):
         """Switch transmit channel without re-authentication (for hotkeys)"""
         with self.lock:
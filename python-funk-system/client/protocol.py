@@ -7,23 +7,49 @@ PACKET_TYPE_PONG = 2
 PACKET_TYPE_AUTH = 3
 PACKET_TYPE_AUTH_OK = 4
 PACKET_TYPE_AUTH_FAIL = 5
+PACKET_TYPE_FLOOR = 6
+
+# Floor control (first payload byte of PACKET_TYPE_FLOOR); header user_id = floor holder
+FLOOR_TAKEN = 1  # Server -> channel: user_id holds the floor
+FLOOR_DENIED = 2  # Server -> talker: floor is held by user_id, your audio is dropped
+FLOOR_IDLE = 3  # Server -> channel: floor is free again
+FLOOR_RELEASE = 4  # Client -> server: PTT released, give up the floor
+
+
+# Header: packet_type, channel_id, user_id, sequence_number (compiled once)
+HEADER = struct.Struct('!BBBH')
+HEADER_SIZE = HEADER.size
 
 
 def build_header(channel_id, user_id, sequence_number, packet_type=PACKET_TYPE_AUDIO):
-    return struct.pack('!BBBH', packet_type, channel_id, user_id, sequence_number)
+    return HEADER.pack(packet_type, channel_id, user_id, sequence_number)
 
 
 def parse_header(data):
-    if len(data) < 5:
+    if len(data) < HEADER_SIZE:
         return None, None, None, None, None
-    packet_type, channel_id, user_id, sequence_number = struct.unpack('!BBBH', data[:5])
-    payload = data[5:]
+    packet_type, channel_id, user_id, sequence_number = HEADER.unpack_from(data)
+    payload = data[HEADER_SIZE:]
     return packet_type, channel_id, user_id, sequence_number, payload
 
 
+def unpack_header(data):
+    """
+    Read the header fields without touching the payload
+
+    Unlike parse_header no payload slice is allocated, so a received
+    datagram can be inspected and forwarded as-is without any copy.
+
+    Returns:
+        (packet_type, channel_id, user_id, sequence_number) or None if too short
+    """
+    if len(data) < HEADER_SIZE:
+        return None
+    return HEADER.unpack_from(data)
+
+
 def build_packet(channel_id, user_id, sequence_number, audio_data, packet_type=PACKET_TYPE_AUDIO):
-    header = build_header(channel_id, user_id, sequence_number, packet_type)
-    return header + audio_data
+    return HEADER.pack(packet_type, channel_id, user_id, sequence_number) + audio_data
 
 
 def build_ping_packet(channel_id, user_id):
@@ -38,3 +64,8 @@ def build_auth_packet(channel_id, user_id, funk_key):
     """Build authentication packet with funk key"""
     funk_key_bytes = funk_key.encode('utf-8')
     return build_packet(channel_id, user_id, 0, funk_key_bytes, PACKET_TYPE_AUTH)
+
+
+def build_floor_packet(channel_id, user_id, state):
+    """Build floor control packet (state: FLOOR_TAKEN, FLOOR_DENIED, FLOOR_IDLE or FLOOR_RELEASE)"""
+    return build_packet(channel_id, user_id, 0, bytes((state,)), PACKET_TYPE_FLOOR)
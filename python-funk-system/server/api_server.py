@@ -4,7 +4,7 @@ FastAPI REST API Server for Funk System Administration and Authentication
 from fastapi import FastAPI, HTTPException, Depends, status, Header, UploadFile, File, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime, timedelta
@@ -51,6 +51,36 @@ db = Database()
 # UDP Server instance (set by run_server.py)
 udp_server_instance = None
 
+async def lookup_funk_key(funk_key):
+    """
+    Verify a funk key through the UDP server's cache when it runs in this process
+
+    Cache misses (SQLite lookup) run in the thread pool, so unknown keys
+    cannot stall the relay sharing this event loop.
+    """
+    if udp_server_instance is not None:
+        return await udp_server_instance.lookup_funk_key(funk_key)
+    return await asyncio.to_thread(db.verify_user, funk_key)
+
+def invalidate_funk_key_cache(funk_key):
+    """Drop a cached funk key so a newly created user can authenticate at once"""
+    if udp_server_instance is not None:
+        udp_server_instance.auth_cache.invalidate(funk_key)
+
+def update_live_sessions(username, **changes):
+    """
+    Push an admin change into the running UDP relay (control channel)
+
+    Connected sessions of the user see it on their next packet; the
+    user's cached funk-key records are dropped as well.
+
+    Returns:
+        Number of affected sessions (0 if no UDP server runs in this process)
+    """
+    if udp_server_instance is None:
+        return 0
+    return udp_server_instance.update_user_sessions(username, **changes) or 0
+
 def set_udp_server(server):
     """Set UDP server instance for test tone functionality"""
     global udp_server_instance
@@ -137,6 +167,24 @@ async def serve_login_page():
 async def health_check():
     return {"status": "healthy", "database": "connected"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Packet, drop, auth and latency metrics of the UDP server (Prometheus text format)
+
+    With channel shards, sends, fan-out and latency happen in the shard
+    processes: per-channel send metrics stay empty, funk_shard_* has the
+    totals per shard.
+    """
+    if udp_server_instance is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="UDP server not available"
+        )
+
+    return PlainTextResponse(udp_server_instance.metrics.render(),
+                             media_type="text/plain; version=0.0.4")
+
 # Admin authentication
 def verify_admin_token(authorization: Optional[str] = Header(None)):
     """Verify admin session token"""
@@ -193,7 +241,7 @@ async def verify_funk_key(request: FunkKeyVerify):
     """
     Verify a funk key and return user information
     """
-    user = db.verify_user(request.funk_key)
+    user = await lookup_funk_key(request.funk_key)
     
     if not user:
         raise HTTPException(
@@ -213,7 +261,7 @@ async def get_user_info(funk_key: str):
     """
     Get user information by funk key
     """
-    user = db.verify_user(funk_key)
+    user = await lookup_funk_key(funk_key)
     
     if not user:
         raise HTTPException(
@@ -255,7 +303,7 @@ async def get_user_channels(funk_key: str):
     """
     Get allowed channels for a specific user
     """
-    user = db.verify_user(funk_key)
+    user = await lookup_funk_key(funk_key)
     
     if not user:
         raise HTTPException(
@@ -282,11 +330,14 @@ async def create_user(request: CreateUserRequest, session: dict = Depends(verify
     Create a new user with funk key
     """
     try:
-        user_id = db.create_user(
+        user_id = await asyncio.to_thread(
+            db.create_user,
             username=request.username,
             funk_key=request.funk_key,
             allowed_channels=request.allowed_channels
         )
+        # The key may be cached as invalid from an earlier attempt
+        invalidate_funk_key_cache(request.funk_key)
         
         return {
             "user_id": user_id,
@@ -306,7 +357,7 @@ async def list_users(session: dict = Depends(verify_admin_token)):
     """
     List all users
     """
-    users = db.get_all_users()
+    users = await asyncio.to_thread(db.get_all_users)
     return {"users": users, "count": len(users)}
 
 @app.get("/api/admin/users/{username}")
@@ -314,7 +365,7 @@ async def get_user(username: str, session: dict = Depends(verify_admin_token)):
     """
     Get specific user by username
     """
-    user = db.get_user(username)
+    user = await asyncio.to_thread(db.get_user, username)
     
     if not user:
         raise HTTPException(
@@ -329,7 +380,8 @@ async def update_user(username: str, request: UpdateUserRequest, session: dict =
     """
     Update user settings
     """
-    success = db.update_user(
+    success = await asyncio.to_thread(
+        db.update_user,
         username=username,
         allowed_channels=request.allowed_channels,
         is_active=request.is_active
@@ -341,14 +393,20 @@ async def update_user(username: str, request: UpdateUserRequest, session: dict =
             detail="User not found"
         )
     
-    return {"message": "User updated successfully", "username": username}
+    live_sessions = update_live_sessions(
+        username,
+        allowed_channels=request.allowed_channels,
+        is_active=request.is_active
+    )
+
+    return {"message": "User updated successfully", "username": username, "live_sessions": live_sessions}
 
 @app.delete("/api/admin/users/{username}")
 async def delete_user(username: str, session: dict = Depends(verify_admin_token)):
     """
     Delete a user
     """
-    success = db.delete_user(username)
+    success = await asyncio.to_thread(db.delete_user, username)
     
     if not success:
         raise HTTPException(
@@ -356,7 +414,24 @@ async def delete_user(username: str, session: dict = Depends(verify_admin_token)
             detail="User not found"
         )
     
-    return {"message": "User deleted successfully", "username": username}
+    live_sessions = update_live_sessions(username, kick=True, reason="User deleted")
+
+    return {"message": "User deleted successfully", "username": username, "live_sessions": live_sessions}
+
+@app.post("/api/admin/users/{username}/kick")
+async def kick_user(username: str, session: dict = Depends(verify_admin_token)):
+    """
+    Disconnect all live sessions of a user (the user stays active and may reconnect)
+    """
+    if udp_server_instance is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="UDP server not available"
+        )
+
+    live_sessions = update_live_sessions(username, kick=True, reason="Kicked by admin")
+
+    return {"message": "User kicked", "username": username, "live_sessions": live_sessions}
 
 # Statistics and logging endpoints
 @app.get("/api/stats/active-users")
@@ -364,7 +439,7 @@ async def get_active_users(session: dict = Depends(verify_admin_token)):
     """
     Get currently active users
     """
-    active_users = db.get_active_users()
+    active_users = await asyncio.to_thread(db.get_active_users)
     return {
         "active_users": active_users,
         "count": len(active_users)
@@ -375,7 +450,7 @@ async def get_traffic_stats(session: dict = Depends(verify_admin_token)):
     """
     Get traffic statistics summary (24h, 7d, 30d)
     """
-    stats = db.get_traffic_summary()
+    stats = await asyncio.to_thread(db.get_traffic_summary)
     
     def format_bytes(b):
         for unit in ['B', 'KB', 'MB', 'GB']:
@@ -392,19 +467,189 @@ async def get_traffic_stats(session: dict = Depends(verify_admin_token)):
             "bytes_out": data["bytes_out"],
             "bytes_in_formatted": format_bytes(data["bytes_in"]),
             "bytes_out_formatted": format_bytes(data["bytes_out"]),
+            "bytes_suppressed": data["bytes_suppressed"],
+            "bytes_suppressed_formatted": format_bytes(data["bytes_suppressed"]),
             "total_formatted": format_bytes(data["bytes_in"] + data["bytes_out"])
         }
     
+    # Counters of the running UDP server that are not yet persisted
+    current = None
+    if udp_server_instance is not None:
+        current = udp_server_instance.get_current_traffic()
+        current["bytes_in_formatted"] = format_bytes(current["bytes_in"])
+        current["bytes_out_formatted"] = format_bytes(current["bytes_out"])
+        current["bytes_suppressed_formatted"] = format_bytes(current["bytes_suppressed"])
+        if udp_server_instance.silence is not None:
+            current["silence_suppression"] = udp_server_instance.silence.get_stats()
+    
     return {
-        "traffic": formatted
+        "traffic": formatted,
+        "current": current
     }
 
+@app.get("/api/stats/jitter")
+async def get_jitter_stats(session: dict = Depends(verify_admin_token)):
+    """
+    Get per-stream jitter buffer depth and adaptation history of the running UDP server
+    """
+    if udp_server_instance is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="UDP server not available"
+        )
+
+    if udp_server_instance.channel_shards is not None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Jitter buffers run in the channel shards (CHANNEL_SHARDS), see /api/stats/shards"
+        )
+
+    streams = udp_server_instance.get_jitter_stats()
+    return {
+        "streams": streams,
+        "count": len(streams)
+    }
+
+@app.get("/api/stats/latency")
+async def get_latency_stats(session: dict = Depends(verify_admin_token)):
+    """
+    Get sampled ingress-to-egress latency (p50/p95/p99) per channel,
+    split into jitter buffering time and send time
+    """
+    if udp_server_instance is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="UDP server not available"
+        )
+
+    if udp_server_instance.channel_shards is not None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Latency is traced in the channel shards (CHANNEL_SHARDS), see /api/stats/shards"
+        )
+
+    stats = udp_server_instance.get_latency_stats()
+    if stats is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Latency tracing disabled (LATENCY_TRACE_ENABLED)"
+        )
+    return stats
+
+@app.get("/api/stats/mixing")
+async def get_mixing_stats(session: dict = Depends(verify_admin_token)):
+    """
+    Get counters of the server-side mixer (MCU mode) of the running UDP server
+    """
+    if udp_server_instance is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="UDP server not available"
+        )
+
+    if udp_server_instance.mixer is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Mixing disabled (MIXING_CHANNELS)"
+        )
+    return udp_server_instance.mixer.get_stats()
+
+@app.get("/api/stats/floor")
+async def get_floor_stats(session: dict = Depends(verify_admin_token)):
+    """
+    Get current floor holders and floor control counters of the running UDP server
+    """
+    if udp_server_instance is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="UDP server not available"
+        )
+
+    if udp_server_instance.floor is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Floor control disabled (FLOOR_CONTROL)"
+        )
+    if udp_server_instance.channel_shards is not None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Floor control runs in the channel shards (CHANNEL_SHARDS), see /api/stats/shards"
+        )
+    return udp_server_instance.floor.get_stats()
+
+@app.get("/api/stats/shards")
+async def get_shard_stats(session: dict = Depends(verify_admin_token)):
+    """
+    Get dispatch counters, ring usage and the busiest channels of every channel shard
+    """
+    if udp_server_instance is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="UDP server not available"
+        )
+
+    if udp_server_instance.channel_shards is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Channel shards disabled (CHANNEL_SHARDS)"
+        )
+    return udp_server_instance.channel_shards.get_stats()
+
+@app.get("/api/stats/federation")
+async def get_federation_stats(session: dict = Depends(verify_admin_token)):
+    """
+    Get peer nodes, their advertised channels and forwarding counters of the federation link
+    """
+    if udp_server_instance is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="UDP server not available"
+        )
+
+    if udp_server_instance.federation is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Federation disabled (FEDERATION_PORT)"
+        )
+    return udp_server_instance.federation.get_stats()
+
+@app.get("/api/stats/capture")
+async def get_capture_stats(session: dict = Depends(verify_admin_token)):
+    """
+    Get the counters of the packet capture of the running UDP server
+    """
+    if udp_server_instance is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="UDP server not available"
+        )
+
+    if udp_server_instance.capture is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Packet capture disabled (CAPTURE_PATH)"
+        )
+    return udp_server_instance.capture.get_stats()
+
+@app.get("/api/stats/auth-cache")
+async def get_auth_cache_stats(session: dict = Depends(verify_admin_token)):
+    """
+    Get hit/miss counters of the funk-key cache of the running UDP server
+    """
+    if udp_server_instance is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="UDP server not available"
+        )
+
+    return udp_server_instance.auth_cache.get_stats()
+
 @app.get("/api/stats/channel-usage")
 async def get_channel_usage(session: dict = Depends(verify_admin_token)):
     """
     Get channel usage statistics
     """
-    usage = db.get_channel_usage()
+    usage = await asyncio.to_thread(db.get_channel_usage)
     return {
         "channel_usage": usage,
         "count": len(usage)
@@ -415,7 +660,7 @@ async def get_connection_logs(username: Optional[str] = None, limit: int = 100,
     """
     Get connection logs
     """
-    logs = db.get_connection_logs(username, limit)
+    logs = await asyncio.to_thread(db.get_connection_logs, username, limit)
     return {
         "logs": logs,
         "count": len(logs)
@@ -428,7 +673,7 @@ async def check_channel_permission(funk_key: str, channel_id: int):
     Check if user has permission for specific channel
     Internal endpoint for UDP server
     """
-    user = db.verify_user(funk_key)
+    user = await lookup_funk_key(funk_key)
     
     if not user:
         return {
@@ -447,9 +692,9 @@ async def check_channel_permission(funk_key: str, channel_id: int):
         "username": user["username"]
     }
 
-def start_api_server(host: str = "0.0.0.0", port: int = 8000):
+def _prepare_api_server(host: str, port: int):
     """
-    Start the FastAPI server
+    Print the admin banner and make sure the updates directory exists
     """
     print(f"Starting Funk System API Server on {host}:{port}")
     print(f"")
@@ -472,9 +717,25 @@ def start_api_server(host: str = "0.0.0.0", port: int = 8000):
     updates_dir = Path(os.path.dirname(__file__)) / "updates"
     updates_dir.mkdir(exist_ok=True)
     print(f"📦 Updates-Verzeichnis: {updates_dir}")
-    
+
+def start_api_server(host: str = "0.0.0.0", port: int = 8000):
+    """
+    Start the FastAPI server (blocking, creates its own event loop)
+    """
+    _prepare_api_server(host, port)
     uvicorn.run(app, host=host, port=port, log_level="info")
 
+async def serve_api_server(host: str = "0.0.0.0", port: int = 8000):
+    """
+    Serve the FastAPI app on the already running event loop
+    
+    Used by run_server.py so the API shares its loop with AsyncUDPServer.
+    """
+    _prepare_api_server(host, port)
+    config = uvicorn.Config(app, host=host, port=port, log_level="info")
+    server = uvicorn.Server(config)
+    await server.serve()
+
 # ========================================
 # UPDATE SYSTEM ENDPOINTS
 # ========================================
@@ -543,11 +804,14 @@ async def upload_client(
     updates_dir = get_updates_dir()
     exe_path = updates_dir / "DFG-Funk-Client.exe"
     
-    try:
+    def save_upload():
         with open(exe_path, 'wb') as f:
             shutil.copyfileobj(file.file, f)
-        
-        file_size = exe_path.stat().st_size
+        return exe_path.stat().st_size
+    
+    try:
+        # Disk I/O in the thread pool, the event loop also runs the UDP relay
+        file_size = await asyncio.to_thread(save_upload)
         
         # Save version info
         version_data = {
@@ -557,7 +821,7 @@ async def upload_client(
             "file_size": file_size,
             "changelog": changelog or "Keine Änderungen angegeben"
         }
-        save_version_info(version_data)
+        await asyncio.to_thread(save_version_info, version_data)
         
         return {
             "success": True,
@@ -601,7 +865,7 @@ async def send_test_tone(channel_id: int, background_tasks: BackgroundTasks, adm
         raise HTTPException(status_code=503, detail="UDP server not available")
     
     # Get channel info
-    channel_info = db.get_channel(channel_id)
+    channel_info = await asyncio.to_thread(db.get_channel, channel_id)
     if not channel_info:
         raise HTTPException(status_code=404, detail=f"Channel {channel_id} not found")
     
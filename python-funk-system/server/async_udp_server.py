@@ -1,10 +1,31 @@
 import asyncio
-from protocol import (parse_header, build_pong_packet, build_auth_ok_packet, 
+import logging
+import time
+from protocol import (unpack_header, HEADER_SIZE, build_pong_packet, build_auth_ok_packet, 
                      build_auth_fail_packet, PACKET_TYPE_PING, PACKET_TYPE_AUDIO, 
-                     PACKET_TYPE_AUTH)
-from config import MAX_PACKET_SIZE
+                     PACKET_TYPE_AUTH, PACKET_TYPE_FLOOR, FLOOR_TAKEN, FLOOR_DENIED,
+                     FLOOR_IDLE, FLOOR_RELEASE, build_channel_mask, build_floor_packet)
+from config import (MAX_PACKET_SIZE, UDP_IO_BACKEND, UDP_BATCH_SIZE,
+                    JITTER_BUFFER_SIZE, JITTER_MAX_AGE_MS, JITTER_ADAPTIVE,
+                    JITTER_MIN_BUFFER_SIZE, JITTER_MAX_BUFFER_SIZE,
+                    JITTER_CUT_THROUGH, JITTER_CUT_THROUGH_HOLD_MS,
+                    JITTER_PLAYOUT_TIMER, JITTER_END_OF_TALK_MS,
+                    OPUS_FRAME_SIZE, OPUS_SAMPLE_RATE, AUTH_CACHE_SIZE,
+                    AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_NEGATIVE_TTL_SECONDS,
+                    METRICS_TALKER_WINDOW_SECONDS, LATENCY_TRACE_ENABLED,
+                    LATENCY_TRACE_SAMPLE_EVERY, LATENCY_TRACE_SAMPLES, MIXING_CHANNELS,
+                    FLOOR_CONTROL, FLOOR_SILENCE_TIMEOUT_MS, AUDIO_CODEC, SILENCE_SUPPRESSION,
+                    SILENCE_MAX_FRAME_BYTES, SILENCE_HANGOVER_FRAMES)
 from database import Database
+from auth_cache import FunkKeyCache
+from logger import log_event, flush_suppressed
 from jitter_buffer import JitterBuffer
+from metrics import MetricsRegistry, FANOUT_BUCKETS, LATENCY_BUCKETS
+from latency_trace import LatencyTracer
+from mixer import MixingRelay
+from floor_control import FloorControl, HOLDER, GRANTED, DENIED
+from silence_suppression import SilenceSuppressor
+import udp_batch
 
 
 class AsyncUDPProtocol(asyncio.DatagramProtocol):
@@ -18,119 +39,513 @@ class AsyncUDPProtocol(asyncio.DatagramProtocol):
         self.transport = transport
     
     def datagram_received(self, data, addr):
-        """Called when a datagram is received - non-blocking"""
-        asyncio.create_task(self.server.handle_packet(data, addr))
+        """Called when a datagram is received - handled inline, AUTH is deferred to a task"""
+        self.server.handle_packet(data, addr)
     
     def error_received(self, exc):
-        print(f'Error received: {exc}')
+        log_event(logging.WARNING, 'socket_error', f'Error received: {exc}', rate_key=type(exc).__name__)
 
 
 class AsyncUDPServer:
     """AsyncIO-based UDP Server for concurrent packet handling"""
     
-    def __init__(self, host, port, client_registry):
+    def __init__(self, host, port, client_registry, io_backend=UDP_IO_BACKEND, reuse_port=False):
         self.host = host
         self.port = port
         self.client_registry = client_registry
+        self.io_backend = io_backend
+        self.reuse_port = reuse_port  # SO_REUSEPORT for multi-worker mode
+        self.worker_relay = None  # udp_workers.WorkerRelay when running as one of several workers
+        self.federation = None  # federation.FederationLink when peered with other relay nodes
+        self.channel_shards = None  # channel_shards.ChannelShards when channels are owned by shard processes
+        self.capture = None  # packet_capture.PacketCapture when incoming datagrams are recorded
         self.transport = None
         self.protocol = None
         self.running = False
         self.db = Database()
-        self.authenticated_clients = {}  # {client_address: {'username': str, 'user_id': int, 'allowed_channels': list}}
+        self.auth_cache = FunkKeyCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_NEGATIVE_TTL_SECONDS)
+        self.authenticated_clients = {}  # {client_address: {'username': str, 'user_id': int, 'allowed_channels': list, 'channel_mask': int}}
         self.traffic_bytes_in = 0
         self.traffic_bytes_out = 0
+        self.traffic_bytes_suppressed = 0  # Fan-out bytes not sent because of silence suppression
         self.last_traffic_save = None
         self.jitter_buffers = {}  # {(channel_id, client_addr): JitterBuffer}
+        self.jitter_settings = {
+            'buffer_size': JITTER_BUFFER_SIZE,
+            'max_age_ms': JITTER_MAX_AGE_MS,
+            'min_size': JITTER_MIN_BUFFER_SIZE if JITTER_ADAPTIVE else JITTER_BUFFER_SIZE,
+            'max_size': JITTER_MAX_BUFFER_SIZE if JITTER_ADAPTIVE else JITTER_BUFFER_SIZE,
+            'frame_ms': OPUS_FRAME_SIZE * 1000 / OPUS_SAMPLE_RATE,
+            'max_hold_ms': JITTER_CUT_THROUGH_HOLD_MS if JITTER_CUT_THROUGH else None
+        }
+        self.cut_through = JITTER_CUT_THROUGH
+        self.playout_timer = JITTER_PLAYOUT_TIMER
+        self.end_of_talk = JITTER_END_OF_TALK_MS / 1000.0
+        self._playout_timers = {}  # {(channel_id, client_addr): asyncio.TimerHandle} for streams with held packets
         self._cleanup_task = None
         self._traffic_task = None
+        self._floor_task = None
+        self._auth_tasks = set()  # Strong refs so pending AUTH tasks aren't garbage collected
+        self._loop = None
+        self._init_metrics()
+        self.silence = (SilenceSuppressor(SILENCE_MAX_FRAME_BYTES, SILENCE_HANGOVER_FRAMES)
+                        if SILENCE_SUPPRESSION and AUDIO_CODEC == 'opus' else None)
+        self.floor = FloorControl(FLOOR_SILENCE_TIMEOUT_MS / 1000.0) if FLOOR_CONTROL else None
+        self.mixer = MixingRelay(self, MIXING_CHANNELS) if MIXING_CHANNELS else None  # MCU mode for these channels
+        self.tracer = LatencyTracer(LATENCY_TRACE_SAMPLE_EVERY, LATENCY_TRACE_SAMPLES) if LATENCY_TRACE_ENABLED else None
+    
+    def _init_metrics(self):
+        """Create the metrics exposed at /metrics (per worker process)"""
+        self.metrics = MetricsRegistry()
+        self.metric_packets_in = self.metrics.counter(
+            'funk_packets_received_total', 'Packets received from authenticated clients', ('channel',))
+        self.metric_bytes_in = self.metrics.counter(
+            'funk_bytes_received_total', 'Bytes received from authenticated clients', ('channel',))
+        self.metric_packets_out = self.metrics.counter(
+            'funk_packets_sent_total', 'Audio packets sent to channel members', ('channel',))
+        self.metric_bytes_out = self.metrics.counter(
+            'funk_bytes_sent_total', 'Audio bytes sent to channel members', ('channel',))
+        self.metric_drops = self.metrics.counter(
+            'funk_packets_dropped_total', 'Packets dropped before forwarding', ('channel', 'reason'))
+        self.metric_auth_failures = self.metrics.counter(
+            'funk_auth_failures_total', 'Rejected AUTH requests', ('reason',))
+        self.metrics.gauge(
+            'funk_active_talkers', 'Streams that sent audio within the talker window', ('channel',),
+            function=self._count_active_talkers)
+        self.metrics.gauge(
+            'funk_authenticated_clients', 'Authenticated client sessions',
+            function=lambda: {(): len(self.authenticated_clients)})
+        self.metric_fanout = self.metrics.histogram(
+            'funk_fanout_size', 'Recipients per forwarded audio packet', FANOUT_BUCKETS, ('channel',))
+        self.metric_latency = self.metrics.histogram(
+            'funk_forward_latency_seconds', 'Time from packet arrival to send, per recipient',
+            LATENCY_BUCKETS, ('channel',))
+    
+    def _count_active_talkers(self):
+        """Active talkers per channel, evaluated when /metrics is rendered"""
+        since = time.monotonic() - METRICS_TALKER_WINDOW_SECONDS
+        talkers = {}
+        for (channel_id, _), jitter_buffer in list(self.jitter_buffers.items()):
+            if jitter_buffer.last_arrival is not None and jitter_buffer.last_arrival >= since:
+                talkers[(channel_id,)] = talkers.get((channel_id,), 0) + 1
+        return talkers
     
     async def start(self):
         """Start async UDP server"""
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
+        self._loop = loop
         
-        self.transport, self.protocol = await loop.create_datagram_endpoint(
-            lambda: AsyncUDPProtocol(self),
-            local_addr=(self.host, self.port)
-        )
+        if self.channel_shards is not None and self.federation is not None:
+            # Shards send straight to their members, peers would never get local audio
+            raise ValueError("Channel shards can't be combined with federation")
+        
+        if self.io_backend == 'mmsg' and not udp_batch.is_available():
+            log_event(logging.WARNING, 'backend_fallback',
+                      "⚠️ recvmmsg/sendmmsg not available, falling back to asyncio UDP backend")
+            self.io_backend = 'asyncio'
+        
+        if self.capture is not None:
+            self.capture.start()
+            log_event(logging.INFO, 'capture_started', f"💾 Recording incoming datagrams to {self.capture.path}")
+        
+        if self.io_backend == 'mmsg':
+            self.transport, self.protocol = await udp_batch.create_batched_datagram_endpoint(
+                loop,
+                lambda: AsyncUDPProtocol(self),
+                local_addr=(self.host, self.port),
+                batch_size=UDP_BATCH_SIZE,
+                max_packet_size=MAX_PACKET_SIZE,
+                reuse_port=self.reuse_port
+            )
+        else:
+            self.transport, self.protocol = await loop.create_datagram_endpoint(
+                lambda: AsyncUDPProtocol(self),
+                local_addr=(self.host, self.port),
+                reuse_port=self.reuse_port or None
+            )
         
         self.running = True
-        print(f"🚀 AsyncIO UDP Server listening on {self.host}:{self.port}")
+        log_event(logging.INFO, 'server_started',
+                  f"🚀 AsyncIO UDP Server listening on {self.host}:{self.port} (backend: {self.io_backend})")
+        
+        if self.worker_relay is not None:
+            await self.worker_relay.start(self)
+            log_event(logging.INFO, 'worker_linked',
+                      f"🔀 Worker {self.worker_relay.index + 1}/{self.worker_relay.count} linked via {self.worker_relay.socket_dir}")
+        
+        if self.federation is not None:
+            await self.federation.start(self)
+            log_event(logging.INFO, 'federation_linked',
+                      f"🌐 Federation on port {self.federation.port} with {len(self.federation.peer_addresses)} peer node(s)")
+        
+        if self.channel_shards is not None:
+            self.mixer = None  # Mixed channels are mixed by the shard owning them
+            self.channel_shards.start(self)
+            log_event(logging.INFO, 'shards_started',
+                      f"🧩 Dispatching channels to {self.channel_shards.count} shard processes")
+        
+        self.start_tasks()
+    
+    def start_tasks(self):
+        """Start the mixer and background tasks (channel shards call this without binding a socket)"""
+        if self.mixer is not None and not self.mixer.start():
+            self.mixer = None
         
         # Start background tasks
         self._cleanup_task = asyncio.create_task(self._cleanup_loop())
         self._traffic_task = asyncio.create_task(self._traffic_stats_loop())
+        if self.floor is not None:
+            self._floor_task = asyncio.create_task(self._floor_loop())
     
-    async def handle_packet(self, data, client_address):
-        """Handle incoming packet asynchronously - no blocking!"""
+    def handle_packet(self, data, client_address):
+        """
+        Handle incoming packet synchronously on the event loop
+        
+        AUDIO and PING packets never block, so they are processed inline
+        without allocating a task per datagram. Only AUTH (SQLite lookup)
+        is handed off to a task. Only the header is decoded; audio is
+        forwarded as the received datagram, the payload is never copied.
+        """
+        received_at = time.perf_counter() if self.tracer is not None else None
+        if self.capture is not None:
+            self.capture.record(data, client_address)
         try:
             # Track incoming traffic
             self.traffic_bytes_in += len(data)
             
-            packet_type, channel_id, user_id, sequence_number, payload = parse_header(data)
-            if channel_id is None:
+            header = unpack_header(data)
+            if header is None:
+                self.metric_drops.inc(('unknown', 'malformed'))
                 return
+            packet_type, channel_id, user_id, sequence_number = header
             
             # Handle AUTH packets first
             if packet_type == PACKET_TYPE_AUTH:
-                await self._handle_auth(client_address, channel_id, user_id, payload)
+                task = asyncio.create_task(
+                    self._handle_auth(client_address, channel_id, user_id, data[HEADER_SIZE:])
+                )
+                self._auth_tasks.add(task)
+                task.add_done_callback(self._auth_tasks.discard)
                 return
             
             # Check if client is authenticated before processing other packets
-            if client_address not in self.authenticated_clients:
-                print(f"⚠️ Unauthenticated client {client_address} tried to send packet type {packet_type}")
+            auth_info = self.authenticated_clients.get(client_address)
+            if auth_info is None:
+                log_event(logging.WARNING, 'unauthenticated_packet',
+                          "⚠️ Unauthenticated client %s tried to send packet type %s", client_address, packet_type,
+                          rate_key=client_address, client=client_address, packet_type=packet_type)
+                self.metric_drops.inc((channel_id, 'unauthenticated'))
                 auth_fail = build_auth_fail_packet(channel_id, user_id, b'Not authenticated')
                 self._send_packet(auth_fail, client_address)
                 return
             
-            # Check channel permission
-            auth_info = self.authenticated_clients[client_address]
-            if channel_id not in auth_info['allowed_channels']:
-                print(f"⚠️ User {auth_info['username']} not authorized for channel {channel_id}")
+            # Check channel permission (single bit test in the session's channel mask)
+            if not auth_info['channel_mask'] >> channel_id & 1:
+                log_event(logging.WARNING, 'channel_not_authorized',
+                          "⚠️ User %s not authorized for channel %s", auth_info['username'], channel_id,
+                          rate_key=client_address, client=client_address, username=auth_info['username'],
+                          channel_id=channel_id)
+                self.metric_drops.inc((channel_id, 'not_authorized'))
                 return
             
-            self.client_registry.register_client(client_address, channel_id, user_id)
-            self.client_registry.update_timestamp(client_address)
+            labels = (channel_id,)
+            self.metric_packets_in.inc(labels)
+            self.metric_bytes_in.inc(labels, len(data))
             
-            # Handle PING packets - respond with PONG
-            if packet_type == PACKET_TYPE_PING:
-                pong_packet = build_pong_packet(channel_id, user_id)
-                self._send_packet(pong_packet, client_address)
+            if self.channel_shards is not None:
+                # Dispatcher: the shard process owning the channel does the rest
+                self._register_client(client_address, channel_id, user_id)
+                self.client_registry.update_timestamp(client_address)
+                self.channel_shards.dispatch(channel_id, client_address, data)
                 return
             
-            # Handle AUDIO packets with jitter buffer
-            if packet_type == PACKET_TYPE_AUDIO:
-                await self._handle_audio_packet(
-                    data, client_address, channel_id, user_id, sequence_number
-                )
+            self._handle_member_packet(data, client_address, packet_type, channel_id, user_id,
+                                       sequence_number, received_at)
                 
         except Exception as e:
+            self.metric_drops.inc(('unknown', 'error'))
             if self.running:
-                print(f"❌ Error handling packet: {e}")
+                log_event(logging.ERROR, 'packet_error', "❌ Error handling packet: %s", e,
+                          rate_key=client_address, client=client_address, error=repr(e))
+    
+    def _handle_member_packet(self, data, client_address, packet_type, channel_id, user_id,
+                              sequence_number, received_at=None):
+        """Handle a PING/FLOOR/AUDIO packet of an authenticated, authorized client"""
+        self._register_client(client_address, channel_id, user_id)
+        self.client_registry.update_timestamp(client_address)
+        
+        # Handle PING packets - respond with PONG
+        if packet_type == PACKET_TYPE_PING:
+            pong_packet = build_pong_packet(channel_id, user_id)
+            self._send_packet(pong_packet, client_address)
+            return
+        
+        if packet_type == PACKET_TYPE_FLOOR:
+            self._handle_floor_packet(data, client_address, channel_id)
+            return
+        
+        # Handle AUDIO packets with jitter buffer
+        if packet_type == PACKET_TYPE_AUDIO:
+            self._handle_audio_packet(
+                data, client_address, channel_id, user_id, sequence_number, received_at
+            )
+    
+    def _register_client(self, client_address, channel_id, user_id):
+        """Register client in channel and advertise newly used channels to peer workers/nodes"""
+        new_channel = channel_id not in self.client_registry.channels
+        self.client_registry.register_client(client_address, channel_id, user_id)
+        if new_channel and self.worker_relay is not None:
+            self.worker_relay.advertise()
+        if new_channel and self.federation is not None:
+            self.federation.advertise()
     
-    async def _handle_audio_packet(self, data, client_address, channel_id, user_id, sequence_number):
-        """Handle audio packet with jitter buffer for stable playback"""
+    def _handle_audio_packet(self, data, client_address, channel_id, user_id, sequence_number,
+                             received_at=None):
+        """
+        Handle audio packet with jitter buffer for stable playback
+        
+        In cut-through mode the next expected packet of a stream without
+        held packets is forwarded at once; the buffer only engages after
+        a sequence gap.
+        
+        Args:
+            received_at: time.perf_counter() at receive when latency tracing is enabled
+        """
+        if self.floor is not None and (self.mixer is None or channel_id not in self.mixer.channels):
+            result = self.floor.request(channel_id, client_address, user_id, time.monotonic())
+            if result != HOLDER and not self._floor_changed(result, channel_id, client_address, user_id):
+                return
+        
         # Get or create jitter buffer for this client in this channel
         buffer_key = (channel_id, client_address)
-        if buffer_key not in self.jitter_buffers:
-            self.jitter_buffers[buffer_key] = JitterBuffer(buffer_size=5)
+        jitter_buffer = self.jitter_buffers.get(buffer_key)
+        if jitter_buffer is None:
+            jitter_buffer = self.jitter_buffers[buffer_key] = JitterBuffer(
+                name=f"{channel_id}/{client_address[0]}:{client_address[1]}", **self.jitter_settings
+            )
+        
+        sampled = received_at is not None and self.tracer.should_sample()
+        
+        if self.mixer is not None and channel_id in self.mixer.channels:
+            # Mixed channel: in-order frames go to the mixer instead of the recipients
+            jitter_buffer.add_packet(sequence_number, data)
+            self._forward_ready_packets(jitter_buffer, channel_id, client_address)
+            if self.playout_timer:
+                self._schedule_playout(buffer_key, jitter_buffer)
+            return
         
-        jitter_buffer = self.jitter_buffers[buffer_key]
+        if self.cut_through and jitter_buffer.pass_through(sequence_number):
+            recipients = self.client_registry.get_clients_in_channel(
+                channel_id,
+                exclude_address=client_address
+            )
+            if (self.silence is not None and len(data) <= self.silence.max_packet_size
+                    and self.silence.suppress(buffer_key, data)):
+                self.traffic_bytes_suppressed += len(data) * len(recipients)
+                return
+            if sampled:
+                released_at = time.perf_counter()
+                self._send_packet_to_many(data, recipients)
+                self.tracer.record(channel_id, received_at, released_at, time.perf_counter(), len(recipients))
+            else:
+                self._send_packet_to_many(data, recipients)
+            self._observe_forward(channel_id, len(data), len(recipients), (jitter_buffer.last_arrival,))
+            if self.worker_relay is not None:
+                self.worker_relay.relay_packet(channel_id, data)
+            if self.federation is not None:
+                self.federation.relay_packet(channel_id, data)
+            return
         
         # Add packet to jitter buffer
+        if sampled:
+            self.tracer.hold(buffer_key, sequence_number, received_at)
         jitter_buffer.add_packet(sequence_number, data)
         
-        # Get packets ready for forwarding (in correct order)
-        ready_packets = jitter_buffer.get_ready_packets()
+        self._forward_ready_packets(jitter_buffer, channel_id, client_address)
+        
+        if self.playout_timer:
+            self._schedule_playout(buffer_key, jitter_buffer)
+    
+    def _forward_ready_packets(self, jitter_buffer, channel_id, client_address):
+        """Forward packets the jitter buffer released (in correct order) to the channel"""
+        ready_packets, arrivals = jitter_buffer.pop_ready()
+        if not ready_packets:
+            return
+        
+        if self.mixer is not None and channel_id in self.mixer.channels:
+            for packet_data in ready_packets:
+                self.mixer.submit(channel_id, client_address, packet_data)
+                if self.worker_relay is not None:
+                    self.worker_relay.relay_packet(channel_id, packet_data)
+                if self.federation is not None:
+                    self.federation.relay_packet(channel_id, packet_data)
+            return
         
-        # Forward ordered packets to recipients
         recipients = self.client_registry.get_clients_in_channel(
             channel_id, 
             exclude_address=client_address
         )
         
+        if self.silence is not None:
+            ready_packets, arrivals = self._suppress_silence(
+                (channel_id, client_address), ready_packets, arrivals, len(recipients)
+            )
+            if not ready_packets:
+                return
+        
+        trace = self.tracer.held.get((channel_id, client_address)) if self.tracer is not None else None
+        if trace is not None:
+            released_at = time.perf_counter()
+        
+        size = 0
         for packet_data in ready_packets:
-            for recipient_address in recipients:
-                self._send_packet(packet_data, recipient_address)
+            self._send_packet_to_many(packet_data, recipients)
+            size += len(packet_data)
+            if trace is not None and unpack_header(packet_data)[3] == trace[0]:
+                # Sampled packet: send time includes the packets released before it
+                self.tracer.record(channel_id, trace[1], released_at, time.perf_counter(), len(recipients))
+                self.tracer.discard((channel_id, client_address))
+                trace = None
+            if self.worker_relay is not None:
+                self.worker_relay.relay_packet(channel_id, packet_data)
+            if self.federation is not None:
+                self.federation.relay_packet(channel_id, packet_data)
+        self._observe_forward(channel_id, size, len(recipients), arrivals)
+    
+    def _suppress_silence(self, stream_key, packets, arrivals, fanout):
+        """
+        Drop silent frames past the hangover from a stream's in-order packets
+        
+        Returns:
+            (packets, arrivals) still to be forwarded
+        """
+        silence = self.silence
+        limit = silence.max_packet_size
+        kept_packets = []
+        kept_arrivals = []
+        for packet, arrival in zip(packets, arrivals):
+            if len(packet) <= limit and silence.suppress(stream_key, packet):
+                self.traffic_bytes_suppressed += len(packet) * fanout
+            else:
+                kept_packets.append(packet)
+                kept_arrivals.append(arrival)
+        return kept_packets, kept_arrivals
+    
+    def _observe_forward(self, channel_id, size, fanout, arrivals):
+        """
+        Record a forward in the metrics
+        
+        Args:
+            size: Total bytes of the forwarded packets (sent once per recipient)
+            fanout: Number of recipients
+            arrivals: time.monotonic() arrival of each forwarded packet
+        """
+        labels = (channel_id,)
+        now = time.monotonic()
+        count = len(arrivals)
+        self.metric_packets_out.inc(labels, count * fanout)
+        self.metric_bytes_out.inc(labels, size * fanout)
+        self.metric_fanout.observe_many(fanout, count, labels)
+        if fanout:
+            for arrival in arrivals:
+                self.metric_latency.observe_many(now - arrival, fanout, labels)
+    
+    def _floor_changed(self, result, channel_id, client_address, user_id):
+        """
+        Announce a new floor holder or deny a competing talker
+        
+        Returns:
+            True if the packet may be forwarded (the sender got the floor)
+        """
+        if result == GRANTED:
+            # New talk spurt: no stream of the previous holder (or of this talker's last spurt) carries over
+            for buffer_key in [key for key in self.jitter_buffers if key[0] == channel_id]:
+                self._drop_jitter_buffer(buffer_key)
+            self._send_to_channel(channel_id, build_floor_packet(channel_id, user_id, FLOOR_TAKEN))
+            return True
+        if result == DENIED:
+            # Told once per talker and floor holder, further packets are dropped silently
+            holder_user_id = self.floor.holder(channel_id)[1]
+            self._send_packet(build_floor_packet(channel_id, holder_user_id, FLOOR_DENIED), client_address)
+        self.metric_drops.inc((channel_id, 'floor_denied'))
+        return False
+    
+    def _handle_floor_packet(self, data, client_address, channel_id):
+        """Handle FLOOR_RELEASE of a talker (PTT released)"""
+        if self.floor is None or len(data) <= HEADER_SIZE or data[HEADER_SIZE] != FLOOR_RELEASE:
+            return
+        if self.floor.release(channel_id, client_address):
+            # Send the end of the talk spurt before the floor goes idle, then start the next one fresh
+            buffer_key = (channel_id, client_address)
+            jitter_buffer = self.jitter_buffers.get(buffer_key)
+            if jitter_buffer is not None:
+                jitter_buffer.flush()
+                self._forward_ready_packets(jitter_buffer, channel_id, client_address)
+                self._drop_jitter_buffer(buffer_key)
+            self._send_to_channel(channel_id, build_floor_packet(channel_id, 0, FLOOR_IDLE))
+    
+    async def _floor_loop(self):
+        """Free floors whose holder went silent and announce them as idle"""
+        interval = self.floor.timeout / 4
+        while self.running:
+            await asyncio.sleep(interval)
+            for channel_id in self.floor.expire(time.monotonic()):
+                self._send_to_channel(channel_id, build_floor_packet(channel_id, 0, FLOOR_IDLE))
+    
+    def _send_to_channel(self, channel_id, packet):
+        """Send a control packet to every local member of a channel"""
+        self._send_packet_to_many(packet, self.client_registry.get_clients_in_channel(channel_id))
+    
+    def _schedule_playout(self, buffer_key, jitter_buffer):
+        """
+        (Re)arm the playout timer of a stream
+        
+        A timer only exists while the buffer holds packets behind a gap. It
+        fires at the max-age deadline of the oldest held packet, or earlier
+        when the talker went silent (end of talk), so held frames never wait
+        for the next transmission.
+        """
+        timer = self._playout_timers.pop(buffer_key, None)
+        if timer is not None:
+            timer.cancel()
+        
+        deadline = jitter_buffer.next_deadline()
+        if deadline is None:
+            return
+        deadline = min(deadline, jitter_buffer.last_arrival + self.end_of_talk)
+        
+        delay = max(0.0, deadline - time.monotonic())
+        self._playout_timers[buffer_key] = self._loop.call_later(
+            delay, self._on_playout_timer, buffer_key
+        )
+    
+    def _on_playout_timer(self, buffer_key):
+        """Release due packets of a stream and flush it at end of talk"""
+        self._playout_timers.pop(buffer_key, None)
+        jitter_buffer = self.jitter_buffers.get(buffer_key)
+        if jitter_buffer is None or not self.running:
+            return
+        
+        now = time.monotonic()
+        if now - jitter_buffer.last_arrival >= self.end_of_talk:
+            jitter_buffer.flush()
+        else:
+            jitter_buffer.release_expired(now)
+        
+        channel_id, client_address = buffer_key
+        self._forward_ready_packets(jitter_buffer, channel_id, client_address)
+        self._schedule_playout(buffer_key, jitter_buffer)
+    
+    def _drop_jitter_buffer(self, buffer_key):
+        """Remove a stream's jitter buffer and its playout timer"""
+        self.jitter_buffers.pop(buffer_key, None)
+        if self.tracer is not None:
+            self.tracer.discard(buffer_key)
+        if self.silence is not None:
+            self.silence.forget(buffer_key)
+        timer = self._playout_timers.pop(buffer_key, None)
+        if timer is not None:
+            timer.cancel()
     
     def _send_packet(self, data, address):
         """Send packet (non-blocking)"""
@@ -138,20 +553,43 @@ class AsyncUDPServer:
             self.transport.sendto(data, address)
             self.traffic_bytes_out += len(data)
         except Exception as e:
-            print(f"Failed to send to {address}: {e}")
+            log_event(logging.WARNING, 'send_failed', "Failed to send to %s: %s", address, e,
+                      rate_key=address)
+    
+    def _send_packet_to_many(self, data, addresses):
+        """Send the same packet to several recipients (one sendmmsg with the mmsg backend)"""
+        if not addresses:
+            return
+        sendto_many = getattr(self.transport, 'sendto_many', None)
+        if sendto_many is None:
+            for address in addresses:
+                self._send_packet(data, address)
+            return
+        try:
+            sendto_many(data, addresses)
+            self.traffic_bytes_out += len(data) * len(addresses)
+        except Exception as e:
+            log_event(logging.WARNING, 'send_failed', "Failed to send to %s recipients: %s", len(addresses), e,
+                      rate_key=type(e).__name__)
     
     async def _handle_auth(self, client_address, channel_id, user_id, payload):
         """Handle authentication request"""
         try:
             funk_key = payload.decode('utf-8').strip()
             
-            # Verify funk key against database (blocking I/O in thread pool)
-            user = await asyncio.to_thread(self.db.verify_user, funk_key)
+            found, user = self.auth_cache.get(funk_key)
+            if not found:
+                # Verify funk key against database (blocking I/O in thread pool)
+                user = await asyncio.to_thread(self._load_funk_key, funk_key)
             
             if user:
                 # Check channel permission
                 if channel_id not in user['allowed_channels']:
-                    print(f"🔒 User {user['username']} not authorized for channel {channel_id}")
+                    self.metric_auth_failures.inc(('channel_not_authorized',))
+                    log_event(logging.WARNING, 'channel_not_authorized',
+                              f"🔒 User {user['username']} not authorized for channel {channel_id}",
+                              rate_key=client_address, client=client_address, username=user['username'],
+                              channel_id=channel_id)
                     auth_fail = build_auth_fail_packet(channel_id, user_id, b'Channel not authorized')
                     self._send_packet(auth_fail, client_address)
                     return
@@ -161,6 +599,7 @@ class AsyncUDPServer:
                     'username': user['username'],
                     'user_id': user['id'],
                     'allowed_channels': user['allowed_channels'],
+                    'channel_mask': build_channel_mask(user['allowed_channels']),
                     'funk_key': funk_key
                 }
                 
@@ -171,45 +610,88 @@ class AsyncUDPServer:
                 )
                 await asyncio.to_thread(self.db.update_last_seen, user['id'])
                 
-                print(f"✅ User {user['username']} authenticated for channel {channel_id}")
+                log_event(logging.INFO, 'authenticated',
+                          f"✅ User {user['username']} authenticated for channel {channel_id}",
+                          rate_key=client_address, client=client_address, username=user['username'],
+                          channel_id=channel_id)
+                
+                # Register client immediately in this channel, so it is also
+                # covered by expiry if it never sends another packet
+                self._register_client(client_address, channel_id, user['id'])
+                if self.channel_shards is not None:
+                    # The owning shard otherwise learns the member only from its first PING/AUDIO
+                    self.channel_shards.join(client_address, channel_id, user['id'])
                 
                 # Send auth success
                 auth_ok = build_auth_ok_packet(channel_id, user_id)
                 self._send_packet(auth_ok, client_address)
             else:
-                print(f"❌ Invalid funk key from {client_address}")
+                self.metric_auth_failures.inc(('invalid_key',))
+                log_event(logging.WARNING, 'invalid_funk_key', f"❌ Invalid funk key from {client_address}",
+                          rate_key=client_address[0], client=client_address)
                 auth_fail = build_auth_fail_packet(channel_id, user_id, b'Invalid funk key')
                 self._send_packet(auth_fail, client_address)
                 
         except Exception as e:
-            print(f"Error handling auth: {e}")
+            self.metric_auth_failures.inc(('error',))
+            log_event(logging.ERROR, 'auth_error', f"Error handling auth: {e}",
+                      rate_key=client_address, client=client_address, error=repr(e))
             auth_fail = build_auth_fail_packet(channel_id, user_id, b'Auth error')
             self._send_packet(auth_fail, client_address)
     
+    async def lookup_funk_key(self, funk_key):
+        """
+        Verify a funk key through the cache without blocking the event loop
+        
+        Cache misses (SQLite lookup) run in the thread pool.
+        
+        Returns:
+            User dict as returned by Database.verify_user, or None
+        """
+        found, user = self.auth_cache.get(funk_key)
+        if not found:
+            user = await asyncio.to_thread(self._load_funk_key, funk_key)
+        return user
+    
+    def _load_funk_key(self, funk_key):
+        """Look up a funk key in the database and cache the result"""
+        generation = self.auth_cache.generation
+        user = self.db.verify_user(funk_key)
+        self.auth_cache.put(funk_key, user, generation)
+        return user
+    
     async def _cleanup_loop(self):
         """Background task for client cleanup"""
         while self.running:
             await asyncio.sleep(5)
             
-            removed = self.client_registry.remove_stale_clients()
-            if removed > 0:
-                print(f"🧹 Removed {removed} stale clients")
+            # Only clients whose expiry bucket is due are visited
+            removed = self.client_registry.expire_clients()
+            if removed:
+                log_event(logging.INFO, 'clients_expired', f"🧹 Removed {len(removed)} stale clients",
+                          count=len(removed))
                 
-                # Clean up authentication cache for removed clients
-                stale_auth = []
-                for addr in self.authenticated_clients:
-                    if addr not in self.client_registry.clients:
-                        stale_auth.append(addr)
-                
-                for addr in stale_auth:
-                    username = self.authenticated_clients[addr]['username']
-                    print(f"🔓 Logged out: {username}")
-                    del self.authenticated_clients[addr]
+                # Clean up authentication cache and jitter buffers in the same pass
+                for client_info in removed:
+                    addr = client_info['address']
+                    auth_info = self.authenticated_clients.pop(addr, None)
+                    if auth_info:
+                        log_event(logging.INFO, 'logged_out', f"🔓 Logged out: {auth_info['username']}",
+                                  username=auth_info['username'], client=addr)
                     
-                    # Clean up jitter buffers
-                    buffers_to_remove = [k for k in self.jitter_buffers if k[1] == addr]
-                    for key in buffers_to_remove:
-                        del self.jitter_buffers[key]
+                    for channel_id in client_info['channel_ids']:
+                        self._drop_jitter_buffer((channel_id, addr))
+                        if self.channel_shards is not None:
+                            self.channel_shards.leave(addr, channel_id)
+            
+            # Summaries for rate-limited messages of clients that went quiet
+            flush_suppressed()
+            
+            # Periodic re-advertisement keeps peer workers in sync
+            if self.worker_relay is not None:
+                self.worker_relay.advertise(force=True)
+            if self.federation is not None:
+                self.federation.advertise()
     
     async def _traffic_stats_loop(self):
         """Background task for traffic statistics"""
@@ -226,14 +708,18 @@ class AsyncUDPServer:
                 await asyncio.to_thread(
                     self.db.record_traffic, 
                     self.traffic_bytes_in, 
-                    self.traffic_bytes_out
+                    self.traffic_bytes_out,
+                    self.traffic_bytes_suppressed
                 )
-                print(f"📊 Traffic: ⬇️ {self._format_bytes(self.traffic_bytes_in)} | ⬆️ {self._format_bytes(self.traffic_bytes_out)}")
+                log_event(logging.INFO, 'traffic_saved',
+                          f"📊 Traffic: ⬇️ {self._format_bytes(self.traffic_bytes_in)} | ⬆️ {self._format_bytes(self.traffic_bytes_out)}"
+                          f" | 🤫 {self._format_bytes(self.traffic_bytes_suppressed)} eingespart")
                 self.traffic_bytes_in = 0
                 self.traffic_bytes_out = 0
+                self.traffic_bytes_suppressed = 0
                 self.last_traffic_save = datetime.now()
             except Exception as e:
-                print(f"Fehler beim Speichern der Traffic-Statistiken: {e}")
+                log_event(logging.ERROR, 'traffic_save_failed', f"Fehler beim Speichern der Traffic-Statistiken: {e}")
     
     def _format_bytes(self, bytes_val):
         """Format bytes to human readable format"""
@@ -252,19 +738,216 @@ class AsyncUDPServer:
             self._cleanup_task.cancel()
         if self._traffic_task:
             self._traffic_task.cancel()
+        if self._floor_task:
+            self._floor_task.cancel()
+        for timer in self._playout_timers.values():
+            timer.cancel()
+        self._playout_timers.clear()
         
         # Save remaining traffic stats
         if self.traffic_bytes_in > 0 or self.traffic_bytes_out > 0:
             await self._save_traffic_stats()
         
+        if self.worker_relay is not None:
+            self.worker_relay.close()
+        
+        if self.federation is not None:
+            self.federation.close()
+        
+        if self.channel_shards is not None:
+            self.channel_shards.stop()
+        
+        if self.mixer is not None:
+            self.mixer.stop()
+        
         if self.transport:
             self.transport.close()
         
-        print("✅ AsyncIO Server stopped")
+        if self.capture is not None:
+            await self.capture.close()
+        
+        log_event(logging.INFO, 'server_stopped', "✅ AsyncIO Server stopped")
     
     def get_current_traffic(self):
         """Get current traffic counters"""
         return {
             "bytes_in": self.traffic_bytes_in,
-            "bytes_out": self.traffic_bytes_out
+            "bytes_out": self.traffic_bytes_out,
+            "bytes_suppressed": self.traffic_bytes_suppressed
         }
+    
+    def update_user_sessions(self, username, allowed_channels=None, is_active=None, kick=False,
+                             reason='Access revoked'):
+        """
+        Apply an admin change to the live sessions of a user
+        
+        Takes effect on the next packet instead of after the session times
+        out. Safe to call from other threads; in multi-worker mode the
+        change is also sent to the peer workers.
+        
+        Args:
+            username: User whose sessions are affected
+            allowed_channels: New channel list; sessions leave revoked channels
+            is_active: False ends all sessions of the user
+            kick: End all sessions without changing the user
+            reason: Text sent to kicked clients in the AUTH_FAIL packet
+        
+        Returns:
+            Number of local sessions affected, or None if scheduled from another thread
+        """
+        message = {
+            'username': username,
+            'allowed_channels': list(allowed_channels) if allowed_channels is not None else None,
+            'is_active': is_active,
+            'kick': kick,
+            'reason': reason
+        }
+        if not self.running:
+            return 0
+        
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        
+        if running_loop is not self._loop:
+            self._loop.call_soon_threadsafe(self.apply_session_control, message)
+            return None
+        
+        return self.apply_session_control(message)
+    
+    def apply_session_control(self, message, relay=True):
+        """Apply a session control message (see update_user_sessions) on the event loop"""
+        if relay and self.worker_relay is not None:
+            self.worker_relay.send_control(message)
+        
+        username = message['username']
+        self.auth_cache.invalidate_user(username)
+        
+        end_session = message.get('kick') or message.get('is_active') is False
+        allowed_channels = message.get('allowed_channels')
+        if not end_session and allowed_channels is None:
+            return 0
+        
+        affected = 0
+        for client_address, auth_info in list(self.authenticated_clients.items()):
+            if auth_info['username'] != username:
+                continue
+            affected += 1
+            
+            if end_session:
+                del self.authenticated_clients[client_address]
+                revoked = self.client_registry.unregister_client(client_address)
+                reason = message.get('reason', 'Access revoked')
+                log_event(logging.WARNING, 'session_ended',
+                          f"⛔ Session von {username} beendet ({client_address[0]}): {reason}",
+                          username=username, client=client_address, reason=reason)
+            else:
+                channel_mask = build_channel_mask(allowed_channels)
+                auth_info['allowed_channels'] = allowed_channels
+                auth_info['channel_mask'] = channel_mask
+                client_info = self.client_registry.clients.get(client_address)
+                joined = list(client_info['channel_ids']) if client_info else []
+                revoked = set()
+                for channel_id in joined:
+                    if not channel_mask >> channel_id & 1:
+                        revoked |= self.client_registry.unregister_client(client_address, channel_id)
+                reason = 'Channel not authorized'
+                if revoked:
+                    log_event(logging.WARNING, 'channels_revoked', f"🔒 {username}: Kanäle {sorted(revoked)} entzogen",
+                              username=username, client=client_address, channels=sorted(revoked))
+            
+            auth_fail_reason = reason.encode('utf-8')
+            for channel_id in revoked:
+                self._drop_jitter_buffer((channel_id, client_address))
+                if self.channel_shards is not None:
+                    self.channel_shards.leave(client_address, channel_id)
+                self._send_packet(build_auth_fail_packet(channel_id, 0, auth_fail_reason), client_address)
+        
+        return affected
+    
+    def get_jitter_stats(self):
+        """Get depth, measurements and depth history of every jitter buffer"""
+        streams = []
+        for (channel_id, client_address), jitter_buffer in list(self.jitter_buffers.items()):
+            auth_info = self.authenticated_clients.get(client_address, {})
+            streams.append({
+                "channel_id": channel_id,
+                "address": f"{client_address[0]}:{client_address[1]}",
+                "username": auth_info.get('username'),
+                "stats": jitter_buffer.get_stats(),
+                "depth_history": list(jitter_buffer.depth_history)
+            })
+        return streams
+    
+    def get_latency_stats(self):
+        """Get sampled forwarding latency percentiles per channel (None if tracing is disabled)"""
+        if self.tracer is None:
+            return None
+        return self.tracer.get_stats()
+    
+    def forward_to_channel(self, channel_id, packet, exclude_user_id=None):
+        """
+        Forward a packet to all clients in a specific channel
+        
+        Safe to call from other threads (e.g. FastAPI background tasks):
+        the send is then scheduled on the server's event loop.
+        
+        Args:
+            channel_id: Target channel ID
+            packet: Complete packet data to send
+            exclude_user_id: Optional user ID to exclude from receiving (e.g., sender)
+        
+        Returns:
+            Number of recipients, or None if the send was scheduled from another thread
+        """
+        if not self.running or not self.transport:
+            return 0
+        
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        
+        if running_loop is not self._loop:
+            self._loop.call_soon_threadsafe(
+                self._forward_to_channel, channel_id, packet, exclude_user_id
+            )
+            return None
+        
+        return self._forward_to_channel(channel_id, packet, exclude_user_id)
+    
+    def _forward_to_channel(self, channel_id, packet, exclude_user_id, relay=True):
+        """Send packet to channel members (must run on the event loop)"""
+        if not self.running or not self.transport:
+            return 0
+        
+        if relay and self.worker_relay is not None:
+            self.worker_relay.relay_packet(channel_id, packet, exclude_user_id)
+        if relay and self.federation is not None:
+            self.federation.relay_packet(channel_id, packet, exclude_user_id)
+        
+        recipients = self.client_registry.get_clients_in_channel(channel_id)
+        
+        sent_count = 0
+        for recipient_address in recipients:
+            # Skip if this is the excluded user
+            if exclude_user_id is not None:
+                client_info = self.authenticated_clients.get(recipient_address)
+                if client_info and client_info.get('user_id') == exclude_user_id:
+                    continue
+            
+            self._send_packet(packet, recipient_address)
+            sent_count += 1
+        
+        self.metric_packets_out.inc((channel_id,), sent_count)
+        self.metric_bytes_out.inc((channel_id,), len(packet) * sent_count)
+        return sent_count
+    
+    def deliver_relayed(self, channel_id, packet, exclude_user_id=None):
+        """Fan out a packet relayed by a peer worker or federation node to the local channel members"""
+        if exclude_user_id is None and self.mixer is not None and channel_id in self.mixer.channels:
+            # A peer worker's talker: mixed here for the local listeners
+            self.mixer.submit(channel_id, ('relay', packet[2]), packet)
+            return
+        self._forward_to_channel(channel_id, packet, exclude_user_id, relay=False)
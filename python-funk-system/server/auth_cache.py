@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class FunkKeyCache:
+    """
+    LRU/TTL cache of funk_key -> user record (Database.verify_user result)
+    
+    Invalid keys are cached too (negative caching, shorter TTL), so
+    reconnect storms and repeated AUTH packets with a wrong key don't
+    reach SQLite either. Entries must be invalidated when a user is
+    created, changed or deleted; the TTL only bounds staleness for
+    changes made outside the admin API.
+    
+    Thread-safe: used from the event loop, from asyncio.to_thread
+    workers and from API handlers.
+    """
+
+    def __init__(self, max_entries=4096, ttl_seconds=60, negative_ttl_seconds=5):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.entries = OrderedDict()  # {funk_key: (user or None, expires_at)}
+        self.lock = Lock()
+        self.generation = 0  # Bumped on every invalidation, see put()
+        
+        # Counters
+        self.hits = 0
+        self.negative_hits = 0  # Hits on a cached invalid key
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, funk_key):
+        """
+        Look up a funk key
+        
+        Returns:
+            (found, user): found is False on a miss; user is None for a
+            cached invalid key. The user dict is shared and must not be modified.
+        """
+        with self.lock:
+            entry = self.entries.get(funk_key)
+            if entry is not None:
+                user, expires_at = entry
+                if time.monotonic() < expires_at:
+                    self.entries.move_to_end(funk_key)
+                    if user is None:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    return True, user
+                del self.entries[funk_key]
+            self.misses += 1
+            return False, None
+
+    def put(self, funk_key, user, generation=None):
+        """
+        Store the verify_user result for a funk key (None = invalid key)
+        
+        Args:
+            generation: Value of self.generation read before the database
+                lookup; the result is dropped if an invalidation happened
+                meanwhile, so a slow lookup can't re-insert outdated data
+        """
+        ttl = self.ttl_seconds if user is not None else self.negative_ttl_seconds
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[funk_key] = (user, time.monotonic() + ttl)
+            self.entries.move_to_end(funk_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, funk_key):
+        """Drop a single funk key (e.g. after a user was created with it)"""
+        with self.lock:
+            self.generation += 1
+            if self.entries.pop(funk_key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_user(self, username):
+        """Drop every entry of a user (after update/delete by username)"""
+        with self.lock:
+            self.generation += 1
+            stale = [key for key, (user, _) in self.entries.items()
+                     if user is not None and user['username'] == username]
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+
+    def get_stats(self):
+        """Get cache statistics for monitoring"""
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
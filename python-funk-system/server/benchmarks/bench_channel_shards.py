@@ -0,0 +1,129 @@
+"""
+Benchmark for channel-sharded relaying: 32 busy channels, 0 vs N shards
+
+Runs the relay in a child process once without shards and once with
+--shards shard processes (default: one per CPU core), connects real
+UDP clients over localhost and lets one talker per channel send audio
+frames as fast as possible. Reports packets in/out per second, packets
+dropped because a shard ring was full and the dispatcher-to-shard
+handoff time. Scaling needs a free core per shard plus one for the
+dispatcher and one for this load generator.
+
+Usage:
+    python benchmarks/bench_channel_shards.py [--channels 32] [--members 10] [--shards 4] [--seconds 5]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+if multiprocessing.current_process().name == "MainProcess":
+    # Never the configured database; spawned relays re-import this module and keep the parent's path
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from bench_udp_backends import connect_clients
+from protocol import build_packet
+
+PAYLOAD = bytes(60)  # Typical 24 kbit/s Opus frame
+
+
+def run_relay(shards, port, ready, stop, results):
+    """Child process: dispatcher (and its shards) reporting packet counts"""
+    from client_registry import ClientRegistry
+    from async_udp_server import AsyncUDPServer
+    from channel_shards import ChannelShards
+    from config import CHANNEL_SHARD_RING_BYTES
+
+    async def main():
+        server = AsyncUDPServer('127.0.0.1', port, ClientRegistry(3600))
+        if shards:
+            server.channel_shards = ChannelShards(shards, CHANNEL_SHARD_RING_BYTES)
+        await server.start()
+        ready.set()
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+
+        result = {
+            "packets_in": sum(server.metric_packets_in.values.values()),
+            "packets_out": sum(server.metric_packets_out.values.values()),
+            "dropped": 0,
+            "avg_handoff_ms": 0.0,
+            "max_handoff_ms": 0.0,
+        }
+        if shards:
+            # Shards publish their final counters into the ring when they exit
+            for shard in server.channel_shards.shards:
+                shard.process.terminate()
+                shard.process.join()
+            per_shard = server.channel_shards.get_stats()["per_shard"]
+            result["packets_out"] = sum(s["packets_out"] for s in per_shard)
+            result["dropped"] = sum(s["dropped_ring_full"] for s in per_shard)
+            records = sum(s["records_handled"] for s in per_shard)
+            if records:
+                result["avg_handoff_ms"] = sum(s["avg_handoff_ms"] * s["records_handled"] for s in per_shard) / records
+            result["max_handoff_ms"] = max(s["max_handoff_ms"] for s in per_shard)
+        results.put(result)
+        await server.stop()
+
+    asyncio.run(main())
+
+
+def run_shards(shards, port, channels, members, seconds):
+    ctx = multiprocessing.get_context("spawn")
+    ready, stop, results = ctx.Event(), ctx.Event(), ctx.Queue()
+    relay = ctx.Process(target=run_relay, args=(shards, port, ready, stop, results))
+    relay.start()
+    ready.wait(30)
+
+    clients = connect_clients(port, channels, members)
+    talkers = [c for c in clients if c[2] == 1]
+    time.sleep(1.0)  # Shard processes finish starting
+
+    seq = 0
+    start = time.monotonic()
+    deadline = start + seconds
+    while time.monotonic() < deadline:
+        for sock, channel_id, user_id in talkers:
+            try:
+                sock.sendto(build_packet(channel_id, user_id, seq, PAYLOAD), ('127.0.0.1', port))
+            except BlockingIOError:
+                pass
+        seq = (seq + 1) % 65536
+    elapsed = time.monotonic() - start
+    time.sleep(0.5)  # Let the shards drain their rings
+
+    stop.set()
+    result = results.get(timeout=30)
+    relay.join()
+    for sock, _, _ in clients:
+        sock.close()
+    result["elapsed"] = elapsed
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--channels", type=int, default=32)
+    parser.add_argument("--members", type=int, default=10)
+    parser.add_argument("--shards", type=int, default=max(2, os.cpu_count() or 1))
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=50300)
+    args = parser.parse_args()
+
+    print(f"{args.channels} busy channels x {args.members} members, "
+          f"{os.cpu_count()} CPU cores, {args.seconds:.0f}s per run")
+    print(f"{'shards':>6} {'in/s':>10} {'out/s':>10} {'ring full':>10} {'handoff avg ms':>15} {'max ms':>8}")
+    for shards in (0, args.shards):
+        r = run_shards(shards, args.port, args.channels, args.members, args.seconds)
+        print(f"{shards:>6} {r['packets_in'] / r['elapsed']:>10.0f} {r['packets_out'] / r['elapsed']:>10.0f} "
+              f"{r['dropped']:>10} {r['avg_handoff_ms']:>15.3f} {r['max_handoff_ms']:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
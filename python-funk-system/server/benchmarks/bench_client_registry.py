@@ -0,0 +1,84 @@
+"""
+Microbenchmark for the ClientRegistry per-packet operations
+
+Measures the calls AsyncUDPServer makes for every audio packet
+(register_client + update_timestamp of a known member and
+get_clients_in_channel excluding the sender) for channels of 2, 50
+and 500 members. A lock-and-rebuild baseline reproduces the previous
+implementation for comparison.
+
+Usage:
+    python benchmarks/bench_client_registry.py [--sizes 2 50 500]
+"""
+import argparse
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client_registry import ClientRegistry
+
+CHANNEL_ID = 41
+
+
+class LockingBaselineRegistry(ClientRegistry):
+    """Previous behaviour: lock per call and a fresh list per lookup"""
+
+    def register_client(self, client_address, channel_id, user_id):
+        with self.lock:
+            info = self.clients.setdefault(client_address, {
+                'address': client_address, 'channel_ids': set(),
+                'user_id': user_id, 'last_seen': time.time()
+            })
+            info['channel_ids'].add(channel_id)
+            info['last_seen'] = time.time()
+            self.channels.setdefault(channel_id, set()).add(client_address)
+
+    def update_timestamp(self, client_address):
+        with self.lock:
+            if client_address in self.clients:
+                self.clients[client_address]['last_seen'] = time.time()
+
+    def get_clients_in_channel(self, channel_id, exclude_address=None):
+        with self.lock:
+            if channel_id not in self.channels:
+                return []
+            return [self.clients[k]['address'] for k in self.channels[channel_id]
+                    if k != exclude_address and k in self.clients]
+
+
+def bench_registry(registry_class, members, number):
+    """Return microseconds per simulated audio packet"""
+    registry = registry_class(timeout_seconds=30)
+    addresses = [('10.0.%d.%d' % (i // 250, i % 250 + 1), 50000) for i in range(members)]
+    for i, addr in enumerate(addresses):
+        registry.register_client(addr, CHANNEL_ID, i)
+    sender = addresses[0]
+
+    def per_packet():
+        registry.register_client(sender, CHANNEL_ID, 0)
+        registry.update_timestamp(sender)
+        registry.get_clients_in_channel(CHANNEL_ID, exclude_address=sender)
+
+    per_packet()  # Warm up exclusion cache
+    best = min(timeit.repeat(per_packet, number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 50, 500])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'members':>8} {'baseline us':>12} {'snapshot us':>12} {'speedup':>8}")
+    for members in args.sizes:
+        baseline = bench_registry(LockingBaselineRegistry, members, args.number)
+        snapshot = bench_registry(ClientRegistry, members, args.number)
+        print(f"{members:>8} {baseline:>12.3f} {snapshot:>12.3f} {baseline / snapshot:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
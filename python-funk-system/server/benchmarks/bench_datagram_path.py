@@ -0,0 +1,138 @@
+"""
+Benchmark for the AsyncUDPProtocol.datagram_received hot path
+
+Compares the inline fast path (AUDIO/PING handled directly in
+datagram_received) with the previous behaviour of spawning one
+asyncio task per datagram, and cut-through forwarding of in-order
+audio with always passing it through the jitter buffer. Reports CPU
+time per packet and the forwarding latency from datagram_received to
+the last sendto of the fan-out.
+
+Usage:
+    python benchmarks/bench_datagram_path.py [--channels 10] [--members 5] [--ticks 2000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")  # Never the configured database
+
+from client_registry import ClientRegistry
+from async_udp_server import AsyncUDPServer, AsyncUDPProtocol
+from protocol import build_packet, build_channel_mask
+
+FIRST_CHANNEL = 41
+PAYLOAD = bytes(60)  # Typical 24 kbit/s Opus frame
+
+
+class FakeTransport:
+    """Records the time of the latest send per sequence number"""
+    
+    def __init__(self):
+        self.sent_at = {}
+    
+    def sendto(self, data, addr):
+        self.sent_at[(data[1], int.from_bytes(data[3:5], 'big'))] = time.perf_counter()
+
+
+class TaskPerDatagramProtocol(AsyncUDPProtocol):
+    """Previous behaviour: one task per received datagram"""
+    
+    def datagram_received(self, data, addr):
+        asyncio.create_task(self._handle(data, addr))
+    
+    async def _handle(self, data, addr):
+        self.server.handle_packet(data, addr)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+
+def build_server(channels, members):
+    """Create a server with authenticated members and a fake transport"""
+    server = AsyncUDPServer('127.0.0.1', 0, ClientRegistry(timeout_seconds=3600))
+    server.transport = FakeTransport()
+    server.running = True
+    
+    talkers = []
+    for c in range(channels):
+        channel_id = FIRST_CHANNEL + c
+        for m in range(members):
+            addr = ('10.0.%d.%d' % (c, m + 1), 40000 + m)
+            server.authenticated_clients[addr] = {
+                'username': f'user{c}_{m}',
+                'user_id': m + 1,
+                'allowed_channels': [channel_id],
+                'channel_mask': build_channel_mask([channel_id]),
+                'funk_key': f'key{c}_{m}'
+            }
+            server.client_registry.register_client(addr, channel_id, m + 1)
+            if m == 0:
+                talkers.append((addr, channel_id))
+    return server, talkers
+
+
+async def run_mode(protocol_class, cut_through, channels, members, ticks):
+    """Feed `ticks` rounds of one audio packet per channel and measure"""
+    server, talkers = build_server(channels, members)
+    server.cut_through = cut_through
+    protocol = protocol_class(server)
+    protocol.connection_made(server.transport)
+    
+    received_at = {}
+    cpu_start = time.process_time()
+    for seq in range(ticks):
+        for addr, channel_id in talkers:
+            packet = build_packet(channel_id, 1, seq, PAYLOAD)
+            received_at[(channel_id, seq)] = time.perf_counter()
+            protocol.datagram_received(packet, addr)
+        # Yield once per tick, like the loop does between socket reads
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    cpu_total = time.process_time() - cpu_start
+    
+    sent_at = server.transport.sent_at
+    latencies = [
+        (sent_at[key] - start) * 1e6
+        for key, start in received_at.items() if key in sent_at
+    ]
+    packets = len(received_at)
+    return {
+        "packets": packets,
+        "cpu_us_per_packet": cpu_total / packets * 1e6,
+        "p50_us": percentile(latencies, 50),
+        "p99_us": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--members", type=int, default=5)
+    parser.add_argument("--ticks", type=int, default=2000)
+    args = parser.parse_args()
+    
+    modes = [
+        ("task per datagram", TaskPerDatagramProtocol, False),
+        ("inline fast path", AsyncUDPProtocol, False),
+        ("inline cut-through", AsyncUDPProtocol, True),
+    ]
+    print(f"{args.channels} channels x {args.members} members, {args.ticks} ticks")
+    print(f"{'mode':<20} {'packets':>8} {'CPU us/pkt':>11} {'p50 us':>9} {'p99 us':>9}")
+    for name, protocol_class, cut_through in modes:
+        result = asyncio.run(run_mode(protocol_class, cut_through, args.channels, args.members, args.ticks))
+        print(f"{name:<20} {result['packets']:>8} {result['cpu_us_per_packet']:>11.2f} "
+              f"{result['p50_us']:>9.1f} {result['p99_us']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
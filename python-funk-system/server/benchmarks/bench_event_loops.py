@@ -0,0 +1,163 @@
+"""
+Benchmark of the relay on the asyncio and the uvloop event loop
+
+Runs AsyncUDPServer in a child process once per event loop and drives
+both runs with the same paced load over localhost: one talker per
+channel sends --rate frames per second, one member per channel is a
+probe whose frames carry the send time. Reports packets sent by the
+relay per second, the relay's CPU usage and the send-to-receive latency
+percentiles measured at the probes. Loops that are not installed are
+skipped.
+
+Usage:
+    python benchmarks/bench_event_loops.py [--channels 20] [--members 10] [--rate 100] [--seconds 10]
+"""
+import argparse
+import multiprocessing
+import os
+import select
+import struct
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+if multiprocessing.current_process().name == "MainProcess":
+    # Never the configured database; spawned relays re-import this module and keep the parent's path
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from bench_udp_backends import connect_clients
+from event_loop import EVENT_LOOPS
+from protocol import build_packet, HEADER_SIZE
+
+PAYLOAD_SIZE = 60  # Typical 24 kbit/s Opus frame
+SEND_TIME = struct.Struct('!d')
+
+
+def run_relay(loop_name, port, ready, load, stop, results):
+    """Child process: run AsyncUDPServer on the given loop, report CPU time and packets sent under load"""
+    import asyncio
+    import event_loop
+    from client_registry import ClientRegistry
+    from async_udp_server import AsyncUDPServer
+
+    async def main():
+        server = AsyncUDPServer('127.0.0.1', port, ClientRegistry(3600))
+        await server.start()
+        ready.set()
+        while not load.is_set():
+            await asyncio.sleep(0.01)
+        cpu_start = time.process_time()
+        packets_start = sum(server.metric_packets_out.values.values())
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+        results.put({
+            "loop": type(asyncio.get_running_loop()).__module__.split('.')[0],
+            "cpu_seconds": time.process_time() - cpu_start,
+            "packets_out": sum(server.metric_packets_out.values.values()) - packets_start,
+        })
+        await server.stop()
+
+    event_loop.run(main(), loop_name)
+
+
+def drain_probe(sock, received_at, latencies):
+    """Record the latency of every frame waiting at a probe"""
+    while True:
+        try:
+            data = sock.recv(2048)
+        except BlockingIOError:
+            return
+        if len(data) >= HEADER_SIZE + SEND_TIME.size:
+            latencies.append(received_at - SEND_TIME.unpack_from(data, HEADER_SIZE)[0])
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_loop(loop_name, port, channels, members, rate, seconds):
+    ctx = multiprocessing.get_context("spawn")
+    ready, load, stop, results = ctx.Event(), ctx.Event(), ctx.Event(), ctx.Queue()
+    relay = ctx.Process(target=run_relay, args=(loop_name, port, ready, load, stop, results))
+    relay.start()
+    ready.wait(10)
+
+    clients = connect_clients(port, channels, members)
+    talkers = [c for c in clients if c[2] == 1]
+    probes = [c[0] for c in clients if c[2] == 2]
+    time.sleep(0.2)
+    load.set()
+
+    padding = bytes(PAYLOAD_SIZE - SEND_TIME.size)
+    latencies = []
+    interval = 1.0 / rate
+    seq = 0
+    start = next_send = time.perf_counter()
+    deadline = start + seconds
+    while next_send < deadline:
+        # Receive at the probes until the next frame is due
+        while True:
+            timeout = next_send - time.perf_counter()
+            if timeout <= 0:
+                break
+            readable, _, _ = select.select(probes, [], [], timeout)
+            received_at = time.perf_counter()
+            for sock in readable:
+                drain_probe(sock, received_at, latencies)
+        for sock, channel_id, user_id in talkers:
+            payload = SEND_TIME.pack(time.perf_counter()) + padding
+            try:
+                sock.sendto(build_packet(channel_id, user_id, seq, payload), ('127.0.0.1', port))
+            except BlockingIOError:
+                pass
+        seq = (seq + 1) % 65536
+        next_send += interval
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    result = results.get(timeout=10)
+    relay.join()
+    for sock, _, _ in clients:
+        sock.close()
+
+    result["elapsed"] = elapsed
+    result["latencies"] = sorted(latencies)
+    return result
+
+
+def uvloop_installed():
+    try:
+        import uvloop  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument("--members", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=100.0, help="frames per second per talker")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=50500)
+    args = parser.parse_args()
+
+    print(f"{args.channels} channels x {args.members} members, {args.rate:.0f} frames/s per talker, "
+          f"{args.seconds:.0f}s per loop")
+    print(f"{'loop':<8} {'out pps':>9} {'CPU %':>6} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'samples':>8}")
+    for loop_name in EVENT_LOOPS:
+        if loop_name == 'uvloop' and not uvloop_installed():
+            print(f"{loop_name:<8} not installed, skipped")
+            continue
+        r = run_loop(loop_name, args.port, args.channels, args.members, args.rate, args.seconds)
+        lat = r["latencies"]
+        p = [percentile(lat, pct) * 1000 if lat else 0.0 for pct in (50, 95, 99)]
+        print(f"{r['loop']:<8} {r['packets_out'] / r['elapsed']:>9.0f} {r['cpu_seconds'] / r['elapsed']:>6.1%} "
+              f"{p[0]:>7.3f} {p[1]:>7.3f} {p[2]:>7.3f} {len(lat):>8}")
+
+
+if __name__ == '__main__':
+    main()
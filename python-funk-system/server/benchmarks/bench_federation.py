@@ -0,0 +1,146 @@
+"""
+Federation check: several AsyncUDPServer nodes peered on localhost
+
+Starts --nodes relays in this process, each with a FederationLink to all
+others, spreads the members of every channel round-robin over the nodes
+and lets one talker per channel send audio to its node. The last channel
+only has members on its talker's node. Reports per node how many packets
+went to peers and whether every listener got every frame exactly once.
+
+Usage:
+    python benchmarks/bench_federation.py [--nodes 3] [--channels 4] [--members 6] [--frames 200]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")  # Never the configured database
+
+from async_udp_server import AsyncUDPServer
+from client_registry import ClientRegistry
+from database import Database
+from federation import FederationLink
+from protocol import (build_auth_packet, build_ping_packet, build_packet, unpack_header,
+                      PACKET_TYPE_AUTH_OK, PACKET_TYPE_AUDIO)
+
+FIRST_CHANNEL = 41
+PAYLOAD = bytes(60)  # Typical 24 kbit/s Opus frame
+
+
+async def start_nodes(count, base_port, secret):
+    """Start `count` relays; node i serves clients on base_port + 2i, peers on base_port + 2i + 1"""
+    nodes = []
+    for index in range(count):
+        peers = [f"127.0.0.1:{base_port + 2 * peer + 1}" for peer in range(count) if peer != index]
+        server = AsyncUDPServer('127.0.0.1', base_port + 2 * index, ClientRegistry(3600))
+        server.federation = FederationLink('127.0.0.1', base_port + 2 * index + 1, peers, secret,
+                                           advertise_interval=1.0)
+        await server.start()
+        nodes.append(server)
+    return nodes
+
+
+async def connect_clients(nodes, channels, members):
+    """Authenticate member m of every channel at node m % len(nodes), last channel only at node 0"""
+    db = Database()
+    loop = asyncio.get_running_loop()
+    clients = []  # (sock, channel_id, user_id, node index)
+    for c in range(channels):
+        channel_id = FIRST_CHANNEL + c
+        for m in range(members):
+            funk_key = f"federation-key-{c}-{m}"
+            if not db.verify_user(funk_key):
+                db.create_user(f"federation_{c}_{m}", funk_key, [channel_id])
+            node = 0 if c == channels - 1 else m % len(nodes)
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(('127.0.0.1', 0))
+            sock.setblocking(False)
+            sock.sendto(build_auth_packet(channel_id, m + 1, funk_key), ('127.0.0.1', nodes[node].port))
+            clients.append((sock, channel_id, m + 1, node))
+
+    for sock, channel_id, user_id, node in clients:
+        reply = await asyncio.wait_for(loop.sock_recv(sock, 1024), 5)
+        if reply[0] != PACKET_TYPE_AUTH_OK:
+            raise RuntimeError(f"Authentication failed for channel {channel_id}")
+        sock.sendto(build_ping_packet(channel_id, user_id), ('127.0.0.1', nodes[node].port))
+    return clients
+
+
+def drain(sock, received):
+    """Count the audio frames waiting in a client socket by (channel, sender, sequence number)"""
+    while True:
+        try:
+            data = sock.recv(2048)
+        except BlockingIOError:
+            return
+        header = unpack_header(data)
+        if header is not None and header[0] == PACKET_TYPE_AUDIO:
+            received[header[1:]] += 1
+
+
+async def run(args):
+    nodes = await start_nodes(args.nodes, args.port, args.secret)
+    try:
+        clients = await connect_clients(nodes, args.channels, args.members)
+        await asyncio.sleep(0.2)  # Channel advertisements reach the peers
+        talkers = [client for client in clients if client[2] == 1]
+        listeners = [client for client in clients if client[2] != 1]
+        received = [Counter() for _ in listeners]
+
+        for seq in range(args.frames):
+            for sock, channel_id, user_id, node in talkers:
+                sock.sendto(build_packet(channel_id, user_id, seq, PAYLOAD), ('127.0.0.1', nodes[node].port))
+            await asyncio.sleep(args.interval_ms / 1000.0)
+            for client, counts in zip(listeners, received):
+                drain(client[0], counts)
+        await asyncio.sleep(0.2)
+        for client, counts in zip(listeners, received):
+            drain(client[0], counts)
+
+        print(f"{args.nodes} nodes, {args.channels} channels x {args.members} members, {args.frames} frames per talker")
+        print(f"{'node':>4} {'clients':>8} {'to peers':>9} {'from peers':>11} {'rejected':>9}")
+        for index, node in enumerate(nodes):
+            stats = node.federation.get_stats()
+            print(f"{index:>4} {sum(1 for c in clients if c[3] == index):>8} {stats['packets_forwarded']:>9} "
+                  f"{stats['packets_delivered']:>11} {stats['messages_rejected']:>9}")
+
+        missing = duplicates = 0
+        for (_, channel_id, _, _), counts in zip(listeners, received):
+            for seq in range(args.frames):
+                count = counts[(channel_id, 1, seq)]
+                missing += count == 0
+                duplicates += max(0, count - 1)
+        # Talkers are on node 0; every other node with members gets each frame once
+        member_nodes = {m % args.nodes for m in range(args.members)}
+        expected = args.frames * (args.channels - 1) * (len(member_nodes) - 1)
+        forwarded = sum(node.federation.packets_forwarded for node in nodes)
+        print(f"frames missing: {missing}, duplicates: {duplicates}, "
+              f"forwarded to peers: {forwarded} (expected {expected})")
+        for client in clients:
+            client[0].close()
+        return missing == 0 and duplicates == 0 and forwarded == expected
+    finally:
+        for node in nodes:
+            await node.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--members", type=int, default=6)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="pause between frames")
+    parser.add_argument("--port", type=int, default=50200)
+    parser.add_argument("--secret", default="bench-secret", help="FEDERATION_SECRET of all nodes")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark for JitterBuffer.add_packet under packet reordering
+
+Compares the ring-buffer JitterBuffer with the previous dict-based
+implementation (full scan on every add, sort on overflow, print per
+force-release) for increasing reorder rates. Streams are generated
+with a fixed seed; each reordered packet is displaced by 1-3 positions
+and a small share of packets is lost.
+
+Usage:
+    python benchmarks/bench_jitter_buffer.py [--packets 50000] [--rates 0 0.05 0.2 0.5]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jitter_buffer import JitterBuffer
+
+SEED = 42
+LOSS_RATE = 0.01
+
+
+class LegacyJitterBuffer:
+    """Previous dict-based implementation, kept for comparison"""
+
+    def __init__(self, buffer_size=5, max_age_ms=200):
+        self.buffer_size = buffer_size
+        self.max_age_ms = max_age_ms
+        self.buffer = {}
+        self.next_sequence = None
+        self.ready_queue = deque()
+
+    def add_packet(self, sequence_number, data):
+        timestamp = time.time()
+        if self.next_sequence is None:
+            self.next_sequence = sequence_number
+        self.buffer[sequence_number] = (data, timestamp)
+        self._process_buffer()
+
+    def get_ready_packets(self):
+        ready = list(self.ready_queue)
+        self.ready_queue.clear()
+        return ready
+
+    def _process_buffer(self):
+        current_time = time.time()
+        while self.next_sequence in self.buffer:
+            data, _ = self.buffer.pop(self.next_sequence)
+            self.ready_queue.append(data)
+            self.next_sequence = (self.next_sequence + 1) % 65536
+        self._release_old_packets(current_time)
+        self._trim_buffer()
+
+    def _release_old_packets(self, current_time):
+        old_packets = []
+        for seq, (data, timestamp) in self.buffer.items():
+            if (current_time - timestamp) * 1000 > self.max_age_ms:
+                old_packets.append((seq, data))
+        if old_packets:
+            old_packets.sort(key=lambda x: x[0])
+            for seq, data in old_packets:
+                self.ready_queue.append(data)
+                del self.buffer[seq]
+                print(f"⚠️ Jitter buffer: Force-released old packet {seq} (age: {self.max_age_ms}ms)")
+            self.next_sequence = (old_packets[-1][0] + 1) % 65536
+
+    def _trim_buffer(self):
+        if len(self.buffer) > self.buffer_size * 2:
+            sorted_packets = sorted(self.buffer.items(), key=lambda x: x[1][1])
+            excess_count = len(self.buffer) - self.buffer_size
+            for i in range(excess_count):
+                seq, (data, _) = sorted_packets[i]
+                self.ready_queue.append(data)
+                del self.buffer[seq]
+            print(f"⚠️ Jitter buffer overflow: Released {excess_count} packets")
+
+
+def make_stream(packets, reorder_rate, seed=SEED):
+    """Sequence numbers starting near the wraparound point, reordered and lossy"""
+    rng = random.Random(seed)
+    seqs = [(65000 + i) % 65536 for i in range(packets) if rng.random() >= LOSS_RATE]
+    for i in range(len(seqs) - 4):
+        if rng.random() < reorder_rate:
+            j = i + rng.randint(1, 3)
+            seqs[i], seqs[j] = seqs[j], seqs[i]
+    return seqs
+
+
+def run(buffer_class, stream):
+    """Return (microseconds per add_packet, packets released in order)"""
+    jb = buffer_class(buffer_size=5, max_age_ms=200)
+    released = []
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for seq in stream:
+            jb.add_packet(seq, seq)
+            released.extend(jb.get_ready_packets())
+    elapsed = time.perf_counter() - start
+    in_order = sum(1 for a, b in zip(released, released[1:]) if (b - a) % 65536 < 32768)
+    return elapsed / len(stream) * 1e6, in_order / max(1, len(released) - 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--packets", type=int, default=50000)
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.0, 0.05, 0.2, 0.5])
+    args = parser.parse_args()
+
+    print(f"{'reorder':>8} {'legacy us':>10} {'ring us':>9} {'speedup':>8} {'legacy ord':>11} {'ring ord':>9}")
+    for rate in args.rates:
+        stream = make_stream(args.packets, rate)
+        legacy_us, legacy_order = run(LegacyJitterBuffer, stream)
+        ring_us, ring_order = run(JitterBuffer, stream)
+        print(f"{rate:>8.0%} {legacy_us:>10.2f} {ring_us:>9.2f} {legacy_us / ring_us:>7.1f}x "
+              f"{legacy_order:>11.2%} {ring_order:>9.2%}")
+
+
+if __name__ == '__main__':
+    main()
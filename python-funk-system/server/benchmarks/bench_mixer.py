@@ -0,0 +1,106 @@
+"""
+Benchmark for server-side mixing (MCU mode): CPU per mixed channel
+
+Mixes one frame per talker per tick with ChannelMixer, as a mixer
+process does for one channel, and reports the CPU time per 20 ms tick
+and the share of one core a mixed channel needs. With --pool the same
+ticks go through a mixer process, adding the pickling/IPC round trip.
+Uses Opus if opuslib is available, RAW PCM otherwise.
+
+Usage:
+    python benchmarks/bench_mixer.py [--talkers 2 3 4 8] [--listeners 20] [--ticks 500] [--pool]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")  # Never the configured database
+
+import mixer
+from mixer import ChannelMixer, MixingRelay, mix_frames
+from config import OPUS_FRAME_SIZE, OPUS_SAMPLE_RATE, OPUS_BITRATE
+
+FRAME_MS = OPUS_FRAME_SIZE * 1000 / OPUS_SAMPLE_RATE
+
+
+def make_frames(talkers, ticks, codec):
+    """Per talker: `ticks` frames of a sine tone, encoded like a client would"""
+    t = np.arange(OPUS_FRAME_SIZE * ticks) / OPUS_SAMPLE_RATE
+    streams = []
+    for talker in range(talkers):
+        pcm = (np.sin(2 * np.pi * (200 + 50 * talker) * t) * 8000).astype(np.int16)
+        frames = [pcm[i * OPUS_FRAME_SIZE:(i + 1) * OPUS_FRAME_SIZE].tobytes() for i in range(ticks)]
+        if codec == 'opus':
+            encoder = mixer.opuslib.Encoder(OPUS_SAMPLE_RATE, 1, mixer.opuslib.APPLICATION_VOIP)
+            encoder.bitrate = OPUS_BITRATE
+            frames = [encoder.encode(frame, OPUS_FRAME_SIZE) for frame in frames]
+        streams.append(frames)
+    return streams
+
+
+def run_inline(talkers, listeners, ticks, codec):
+    """CPU seconds per tick of ChannelMixer.mix in this process"""
+    channel = ChannelMixer(codec=codec)
+    streams = make_frames(talkers, ticks, codec)
+    keys = [('10.0.0.%d' % (i + 1), 40000) for i in range(talkers)]
+    listening = keys[:min(talkers, listeners)]
+    start = time.process_time()
+    for tick in range(ticks):
+        channel.mix([(keys[i], streams[i][tick]) for i in range(talkers)], listening)
+    return (time.process_time() - start) / ticks
+
+
+async def run_pool(talkers, listeners, ticks, codec):
+    """Wall seconds per tick through one mixer process (includes IPC), None if unavailable"""
+    relay = MixingRelay(None, [41], workers=1)
+    if not relay.start():
+        return None
+    relay._tick_task.cancel()
+    try:
+        streams = make_frames(talkers, ticks, codec)
+        keys = [('10.0.0.%d' % (i + 1), 40000) for i in range(talkers)]
+        listening = keys[:min(talkers, listeners)]
+        loop = asyncio.get_running_loop()
+        executor = relay._executor_for(41)
+        await loop.run_in_executor(executor, mix_frames, 41, [(keys[0], streams[0][0])], [])  # Warm up
+        start = time.perf_counter()
+        for tick in range(ticks):
+            frames = [(keys[i], streams[i][tick]) for i in range(talkers)]
+            await loop.run_in_executor(executor, mix_frames, 41, frames, listening)
+        return (time.perf_counter() - start) / ticks
+    finally:
+        relay.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--talkers", type=int, nargs="+", default=[2, 3, 4, 8])
+    parser.add_argument("--listeners", type=int, default=20)
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--pool", action="store_true", help="also measure the round trip through a mixer process")
+    args = parser.parse_args()
+
+    codec = 'opus' if mixer.OPUS_AVAILABLE and mixer.AUDIO_CODEC == 'opus' else 'pcm'
+    print(f"codec: {codec}, {args.listeners} listeners, {FRAME_MS:.0f} ms ticks")
+    header = f"{'talkers':>8} {'cpu ms/tick':>12} {'core share':>11} {'channels/core':>14}"
+    if args.pool:
+        header += f" {'pool ms/tick':>13}"
+    print(header)
+    for talkers in args.talkers:
+        per_tick = run_inline(talkers, args.listeners, args.ticks, codec)
+        share = per_tick * 1000 / FRAME_MS
+        line = f"{talkers:>8} {per_tick * 1000:>12.3f} {share:>10.1%} {int(1 / share) if share else 0:>14}"
+        if args.pool:
+            pool_tick = asyncio.run(run_pool(talkers, args.listeners, args.ticks, codec))
+            line += f" {pool_tick * 1000:>13.3f}" if pool_tick is not None else f" {'n/a':>13}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
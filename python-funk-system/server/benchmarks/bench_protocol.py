@@ -0,0 +1,65 @@
+"""
+Microbenchmark for the packet header codec
+
+Compares the previous protocol functions (struct.unpack/pack with the
+format string parsed per call, payload sliced into a new bytes object)
+with the precompiled struct.Struct codec, and parse_header with
+unpack_header, which reads only the header via unpack_from. The
+memoryview rows show why the payload is not handed out as a view:
+for voice-sized packets creating the view costs more than the copy.
+
+Usage:
+    python benchmarks/bench_protocol.py [--payload 60] [--number 200000]
+"""
+import argparse
+import os
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import HEADER_SIZE, build_packet, parse_header, unpack_header
+
+
+def legacy_parse_header(data):
+    if len(data) < 5:
+        return None, None, None, None, None
+    packet_type, channel_id, user_id, sequence_number = struct.unpack('!BBBH', data[:5])
+    payload = data[5:]
+    return packet_type, channel_id, user_id, sequence_number, payload
+
+
+def legacy_build_packet(channel_id, user_id, sequence_number, audio_data, packet_type=0):
+    header = struct.pack('!BBBH', packet_type, channel_id, user_id, sequence_number)
+    return header + audio_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--payload", type=int, default=60, help="Payload bytes (60 = 24 kbit/s Opus frame)")
+    parser.add_argument("--number", type=int, default=200000)
+    args = parser.parse_args()
+
+    payload = bytes(args.payload)
+    packet = build_packet(41, 1, 1234, payload)
+
+    cases = [
+        ("parse: legacy (unpack + slice)", lambda: legacy_parse_header(packet)),
+        ("parse: parse_header (Struct)", lambda: parse_header(packet)),
+        ("parse: unpack_header", lambda: unpack_header(packet)),
+        ("payload: slice", lambda: packet[HEADER_SIZE:]),
+        ("payload: memoryview", lambda: memoryview(packet)[HEADER_SIZE:]),
+        ("build: legacy (pack + concat)", lambda: legacy_build_packet(41, 1, 1234, payload)),
+        ("build: build_packet (Struct)", lambda: build_packet(41, 1, 1234, payload)),
+    ]
+
+    print(f"payload {args.payload} bytes, best of 5 x {args.number}")
+    print(f"{'operation':<32} {'ns/op':>8}")
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=args.number, repeat=5))
+        print(f"{name:<32} {best / args.number * 1e9:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Microbenchmark suite for the relay hot paths, with JSON results
+
+Runs fixed-seed timeit benchmarks of the current implementation only
+(the bench_*.py scripts compare against the previous implementations):
+the packet header codec, JitterBuffer.add_packet at increasing reorder
+rates, ClientRegistry at scale and the Database calls made per
+authentication. Results are the best of --repeat runs in ns per
+operation. --output writes them as JSON together with the git commit;
+--compare prints the change against such a file, so regressions show
+up between commits:
+
+    python benchmarks/bench_suite.py --output before.json
+    (change code)
+    python benchmarks/bench_suite.py --compare before.json
+
+Usage:
+    python benchmarks/bench_suite.py [--only protocol jitter registry database] [--output FILE] [--compare FILE]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_jitter_buffer import make_stream
+from client_registry import ClientRegistry
+from database import Database
+from jitter_buffer import JitterBuffer
+from protocol import build_packet, parse_header, unpack_header
+
+SEED = 42
+CHANNEL_ID = 41
+PAYLOAD = bytes(60)  # Typical 24 kbit/s Opus frame
+REORDER_RATES = (0.0, 0.05, 0.2, 0.5)
+REGISTRY_SIZES = (2, 50, 500)
+JITTER_PACKETS = 5000
+REGISTRY_CLIENTS = 10000
+DATABASE_USERS = 1000
+
+
+def measure(func, number, repeat, ops_per_call=1):
+    """Best of `repeat` timeit runs in ns per operation"""
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return best / (number * ops_per_call) * 1e9
+
+
+def client_addresses(count):
+    return [('10.%d.%d.%d' % (i // 62500, i // 250 % 250, i % 250 + 1), 50000) for i in range(count)]
+
+
+def bench_protocol(scale, repeat):
+    number = int(100000 * scale) or 1
+    packet = build_packet(CHANNEL_ID, 1, 1234, PAYLOAD)
+    return {
+        "protocol.parse_header": measure(lambda: parse_header(packet), number, repeat),
+        "protocol.unpack_header": measure(lambda: unpack_header(packet), number, repeat),
+        "protocol.build_packet": measure(lambda: build_packet(CHANNEL_ID, 1, 1234, PAYLOAD), number, repeat),
+    }
+
+
+def bench_jitter(scale, repeat):
+    """add_packet + get_ready_packets per packet of a reordered, lossy stream"""
+    results = {}
+    for rate in REORDER_RATES:
+        stream = make_stream(int(JITTER_PACKETS * scale) or 1, rate, seed=SEED)
+
+        def feed():
+            jb = JitterBuffer(buffer_size=5, max_age_ms=200)
+            for seq in stream:
+                jb.add_packet(seq, seq)
+                jb.get_ready_packets()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[f"jitter.add_packet[reorder={rate:g}]"] = measure(feed, 1, repeat, len(stream))
+    return results
+
+
+def bench_registry(scale, repeat):
+    results = {}
+    addresses = client_addresses(int(REGISTRY_CLIENTS * scale) or 1)
+
+    def register_all():
+        registry = ClientRegistry(timeout_seconds=30)
+        for i, addr in enumerate(addresses):
+            registry.register_client(addr, CHANNEL_ID + i % 10, i % 255)
+
+    results[f"registry.register_client[new, {len(addresses)} clients]"] = measure(
+        register_all, 1, repeat, len(addresses))
+
+    number = int(20000 * scale) or 1
+    for members in REGISTRY_SIZES:
+        registry = ClientRegistry(timeout_seconds=30)
+        members_addresses = client_addresses(members)
+        for i, addr in enumerate(members_addresses):
+            registry.register_client(addr, CHANNEL_ID, i % 255)
+        sender = members_addresses[0]
+        registry.get_clients_in_channel(CHANNEL_ID, exclude_address=sender)  # Warm up exclusion cache
+        results[f"registry.register_client[known, {members} members]"] = measure(
+            lambda: registry.register_client(sender, CHANNEL_ID, 0), number, repeat)
+        results[f"registry.get_clients_in_channel[{members} members]"] = measure(
+            lambda: registry.get_clients_in_channel(CHANNEL_ID, exclude_address=sender), number, repeat)
+    return results
+
+
+def bench_database(scale, repeat):
+    number = int(200 * scale) or 1
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        db = Database(os.path.join(tmp, "bench.db"))
+        keys = [f"bench-key-{i}" for i in range(DATABASE_USERS)]
+        for i, key in enumerate(keys):
+            db.create_user(f"bench_{i}", key, [CHANNEL_ID])
+        user_id = db.verify_user(keys[0])['id']
+        rng = random.Random(SEED)
+        return {
+            f"database.verify_user[{DATABASE_USERS} users]": measure(
+                lambda: db.verify_user(rng.choice(keys)), number, repeat),
+            "database.verify_user[unknown key]": measure(lambda: db.verify_user("no-such-key"), number, repeat),
+            "database.log_connection": measure(
+                lambda: db.log_connection(user_id, CHANNEL_ID, 'connect', '127.0.0.1'), number, repeat),
+        }
+
+
+GROUPS = {
+    "protocol": bench_protocol,
+    "jitter": bench_jitter,
+    "registry": bench_registry,
+    "database": bench_database,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=list(GROUPS), default=list(GROUPS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the iteration counts")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = {}
+    for group in args.only:
+        results.update(GROUPS[group](args.scale, args.repeat))
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        print(f"compared with {args.compare}")
+
+    print(f"{'benchmark':<52} {'ns/op':>12} {'change':>8}")
+    for name, value in results.items():
+        change = f"{(value - baseline[name]) / baseline[name]:+.1%}" if name in baseline else ""
+        print(f"{name:<52} {value:>12.1f} {change:>8}")
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": SEED,
+            "repeat": args.repeat,
+            "scale": args.scale,
+            "unit": "ns/op",
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
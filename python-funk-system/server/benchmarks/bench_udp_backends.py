@@ -0,0 +1,156 @@
+"""
+Load benchmark for the UDP I/O backends of AsyncUDPServer
+
+Starts the relay in a child process (once per backend), authenticates
+real UDP clients over localhost with funk keys from a temporary
+database and lets one talker per channel blast audio frames at the
+relay. Reports packets handled (in + out) per CPU second of the relay
+process, i.e. packets per second per core.
+
+Usage:
+    python benchmarks/bench_udp_backends.py [--channels 4] [--members 30] [--seconds 5]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+if multiprocessing.current_process().name == "MainProcess":
+    # Never the configured database; spawned relays re-import this module and keep the parent's path
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from database import Database
+from protocol import (build_auth_packet, build_ping_packet, build_packet,
+                      PACKET_TYPE_AUTH_OK)
+
+FIRST_CHANNEL = 41
+PAYLOAD = bytes(60)  # Typical 24 kbit/s Opus frame
+
+
+def counting_server_class():
+    """AsyncUDPServer subclass that counts handled and sent packets"""
+    from async_udp_server import AsyncUDPServer
+
+    class CountingServer(AsyncUDPServer):
+        packets_in = 0
+        packets_out = 0
+
+        def handle_packet(self, data, client_address):
+            self.packets_in += 1
+            super().handle_packet(data, client_address)
+
+        def _send_packet(self, data, address):
+            self.packets_out += 1
+            super()._send_packet(data, address)
+
+        def _send_packet_to_many(self, data, addresses):
+            if getattr(self.transport, 'sendto_many', None) is not None:
+                self.packets_out += len(addresses)
+            super()._send_packet_to_many(data, addresses)
+
+    return CountingServer
+
+
+def run_relay(backend, port, ready, stop, results):
+    """Child process: run AsyncUDPServer and report CPU time and packet counts"""
+    from client_registry import ClientRegistry
+    CountingServer = counting_server_class()
+
+    async def main():
+        server = CountingServer('127.0.0.1', port, ClientRegistry(3600), io_backend=backend)
+        await server.start()
+        ready.set()
+        cpu_start = time.process_time()
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+        results.put({
+            "backend": server.io_backend,
+            "cpu_seconds": time.process_time() - cpu_start,
+            "packets_in": server.packets_in,
+            "packets_out": server.packets_out,
+        })
+        await server.stop()
+
+    asyncio.run(main())
+
+
+def connect_clients(port, channels, members):
+    """Create users, authenticate one socket per member and join via PING"""
+    db = Database()
+    clients = []
+    for c in range(channels):
+        channel_id = FIRST_CHANNEL + c
+        for m in range(members):
+            funk_key = f"bench-key-{c}-{m}"
+            if not db.verify_user(funk_key):
+                db.create_user(f"bench_{c}_{m}", funk_key, [channel_id])
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(('127.0.0.1', 0))
+            sock.settimeout(5)
+            sock.sendto(build_auth_packet(channel_id, m + 1, funk_key), ('127.0.0.1', port))
+            clients.append((sock, channel_id, m + 1))
+
+    for sock, channel_id, user_id in clients:
+        reply = sock.recv(1024)
+        if reply[0] != PACKET_TYPE_AUTH_OK:
+            raise RuntimeError(f"Authentication failed for channel {channel_id}")
+        sock.sendto(build_ping_packet(channel_id, user_id), ('127.0.0.1', port))
+        # Listeners never read again; the kernel drops what overflows
+        sock.setblocking(False)
+    return clients
+
+
+def run_backend(backend, port, channels, members, seconds):
+    ctx = multiprocessing.get_context("spawn")
+    ready, stop, results = ctx.Event(), ctx.Event(), ctx.Queue()
+    relay = ctx.Process(target=run_relay, args=(backend, port, ready, stop, results))
+    relay.start()
+    ready.wait(10)
+
+    clients = connect_clients(port, channels, members)
+    talkers = [c for c in clients if c[2] == 1]
+    time.sleep(0.2)
+
+    seq = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for sock, channel_id, user_id in talkers:
+            try:
+                sock.sendto(build_packet(channel_id, user_id, seq, PAYLOAD), ('127.0.0.1', port))
+            except BlockingIOError:
+                pass
+        seq = (seq + 1) % 65536
+
+    stop.set()
+    result = results.get(timeout=10)
+    relay.join()
+    for sock, _, _ in clients:
+        sock.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--channels", type=int, default=4)
+    parser.add_argument("--members", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=50100)
+    args = parser.parse_args()
+
+    print(f"{args.channels} channels x {args.members} members, {args.seconds:.0f}s per backend")
+    print(f"{'backend':<10} {'pkts in':>10} {'pkts out':>10} {'CPU s':>7} {'pps/core':>10}")
+    for backend in ("asyncio", "mmsg"):
+        r = run_backend(backend, args.port, args.channels, args.members, args.seconds)
+        total = r["packets_in"] + r["packets_out"]
+        print(f"{r['backend']:<10} {r['packets_in']:>10} {r['packets_out']:>10} "
+              f"{r['cpu_seconds']:>7.2f} {total / r['cpu_seconds']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
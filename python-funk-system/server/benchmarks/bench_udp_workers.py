@@ -0,0 +1,127 @@
+"""
+Scaling benchmark for the SO_REUSEPORT multi-worker relay
+
+Runs the relay with 1 and with N worker processes (default: one per
+CPU core), connects 500+ real UDP clients over localhost and lets one
+talker per channel send audio frames as fast as possible. Since
+channel members are spread across workers by the kernel, most fan-out
+crosses the Unix-socket relay between workers.
+
+Reports wall-clock throughput (packets in/out per second) summed over
+all workers. Scaling needs as many free cores as workers.
+
+Usage:
+    python benchmarks/bench_udp_workers.py [--channels 50] [--members 11] [--workers 4]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+if multiprocessing.current_process().name == "MainProcess":
+    # Never the configured database; spawned relays re-import this module and keep the parent's path
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from bench_udp_backends import connect_clients, counting_server_class
+from protocol import build_packet
+
+PAYLOAD = bytes(60)  # Typical 24 kbit/s Opus frame
+
+
+def run_worker(index, count, socket_dir, port, ready, stop, results):
+    """Child process: one relay worker reporting its packet counts"""
+    from client_registry import ClientRegistry
+    from udp_workers import WorkerRelay
+    CountingServer = counting_server_class()
+
+    async def main():
+        server = CountingServer('127.0.0.1', port, ClientRegistry(3600), reuse_port=count > 1)
+        if count > 1:
+            server.worker_relay = WorkerRelay(index, count, socket_dir)
+        await server.start()
+        ready.set()
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+        relay_stats = server.worker_relay.get_stats() if server.worker_relay else {}
+        results.put({
+            "packets_in": server.packets_in,
+            "packets_out": server.packets_out,
+            "packets_relayed": relay_stats.get("packets_relayed", 0),
+            "cpu_seconds": time.process_time(),
+        })
+        await server.stop()
+
+    asyncio.run(main())
+
+
+def run_workers(count, port, channels, members, seconds):
+    ctx = multiprocessing.get_context("spawn")
+    socket_dir = tempfile.mkdtemp(prefix="funk-bench-")
+    stop, results = ctx.Event(), ctx.Queue()
+    workers = []
+    for index in range(count):
+        ready = ctx.Event()
+        worker = ctx.Process(target=run_worker,
+                             args=(index, count, socket_dir, port, ready, stop, results))
+        worker.start()
+        ready.wait(10)
+        workers.append(worker)
+
+    clients = connect_clients(port, channels, members)
+    talkers = [c for c in clients if c[2] == 1]
+    # Let every worker advertise its channels to the others
+    time.sleep(0.5)
+
+    seq = 0
+    start = time.monotonic()
+    deadline = start + seconds
+    while time.monotonic() < deadline:
+        for sock, channel_id, user_id in talkers:
+            try:
+                sock.sendto(build_packet(channel_id, user_id, seq, PAYLOAD), ('127.0.0.1', port))
+            except BlockingIOError:
+                pass
+        seq = (seq + 1) % 65536
+    elapsed = time.monotonic() - start
+
+    stop.set()
+    totals = {"packets_in": 0, "packets_out": 0, "packets_relayed": 0, "cpu_seconds": 0.0}
+    for _ in workers:
+        for key, value in results.get(timeout=10).items():
+            totals[key] += value
+    for worker in workers:
+        worker.join()
+    for sock, _, _ in clients:
+        sock.close()
+    shutil.rmtree(socket_dir, ignore_errors=True)
+    totals["elapsed"] = elapsed
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--members", type=int, default=11)
+    parser.add_argument("--workers", type=int, default=max(2, os.cpu_count() or 1))
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=50200)
+    args = parser.parse_args()
+
+    print(f"{args.channels * args.members} clients ({args.channels} channels x {args.members}), "
+          f"{os.cpu_count()} CPU cores, {args.seconds:.0f}s per run")
+    print(f"{'workers':>7} {'in/s':>10} {'out/s':>10} {'relayed':>10} {'CPU s':>7}")
+    for count in (1, args.workers):
+        r = run_workers(count, args.port, args.channels, args.members, args.seconds)
+        print(f"{count:>7} {r['packets_in'] / r['elapsed']:>10.0f} {r['packets_out'] / r['elapsed']:>10.0f} "
+              f"{r['packets_relayed']:>10} {r['cpu_seconds']:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
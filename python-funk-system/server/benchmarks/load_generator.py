@@ -0,0 +1,330 @@
+"""
+Synthetic load generator: hundreds of PTT clients against the relay
+
+Opens one UDP session per simulated client on localhost, authenticates
+each with a funk key seeded into a temporary database and joins its
+channel. Every client alternates between talking (one 20 ms Opus-sized
+frame per tick, FLOOR_RELEASE at the end like the real client) and
+listening, phase-shifted with a fixed seed. Each frame carries its send
+time, talker and talk spurt, so every receiver measures end-to-end
+latency, loss and reordering of what it heard.
+
+Talk spurts the relay's floor control denied (FLOOR_DENIED) are not
+expected at the receivers; they are counted separately.
+
+The funk keys go into --database, a fresh temporary file by default;
+DATABASE_PATH is never used, so a run can't add users to the configured
+database. The relay is started in a child process on that database
+unless --no-relay is given, in which case a relay already listening on
+--port is used (pass its database with --database). All packets are
+built with client/protocol.py.
+
+Usage:
+    python benchmarks/load_generator.py [--clients 200] [--channels 10] [--talk 2] [--listen 18] [--seconds 30] [--database DB] [--json]
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIENT_DIR = os.path.join(os.path.dirname(SERVER_DIR), "client")
+sys.path.insert(0, SERVER_DIR)
+
+from database import Database
+
+# The client's protocol module, loaded under its own name (the server has a protocol.py too)
+_spec = importlib.util.spec_from_file_location("client_protocol", os.path.join(CLIENT_DIR, "protocol.py"))
+client_protocol = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(client_protocol)
+
+FIRST_CHANNEL = 41
+FRAME_SECONDS = 0.02
+PING_TICKS = 250  # Keep-alive PING every 5 s
+FRAME_INFO = struct.Struct('!dHI')  # Send time (perf_counter), talker index, talk spurt
+PERCENTILES = (50, 95, 99)
+
+
+class SimulatedClient(asyncio.DatagramProtocol):
+    """One PTT client: talks in spurts, records everything it hears"""
+
+    def __init__(self, index, channel_id, funk_key, relay_address, frame_bytes, phase):
+        self.index = index
+        self.channel_id = channel_id
+        self.user_id = index % 255 + 1
+        self.funk_key = funk_key
+        self.relay_address = relay_address
+        self.padding = bytes(max(0, frame_bytes - FRAME_INFO.size))
+        self.phase = phase
+        self.transport = None
+        self.authenticated = asyncio.get_running_loop().create_future()
+
+        # Talker side
+        self.sequence = 0
+        self.spurt = 0
+        self.talking = False
+        self.sent = {}  # {spurt: frames sent}
+        self.denied = set()  # Spurts the relay answered with FLOOR_DENIED
+
+        # Receiver side
+        self.heard = {}  # {(talker, spurt): frames received}
+        self.latencies = []
+        self.reordered = 0
+        self.newest = {}  # {talker: highest sequence number received}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        now = time.perf_counter()
+        header = client_protocol.unpack_header(data)
+        if header is None:
+            return
+        packet_type, _, _, sequence_number = header
+
+        if packet_type == client_protocol.PACKET_TYPE_AUDIO:
+            if len(data) < client_protocol.HEADER_SIZE + FRAME_INFO.size:
+                return
+            sent_at, talker, spurt = FRAME_INFO.unpack_from(data, client_protocol.HEADER_SIZE)
+            self.latencies.append(now - sent_at)
+            key = (talker, spurt)
+            self.heard[key] = self.heard.get(key, 0) + 1
+            newest = self.newest.get(talker)
+            if newest is not None and (sequence_number - newest) % 65536 >= 32768:
+                self.reordered += 1
+            else:
+                self.newest[talker] = sequence_number
+        elif packet_type == client_protocol.PACKET_TYPE_FLOOR:
+            state = data[client_protocol.HEADER_SIZE] if len(data) > client_protocol.HEADER_SIZE else None
+            if state == client_protocol.FLOOR_DENIED and self.talking:
+                self.denied.add(self.spurt)
+        elif packet_type in (client_protocol.PACKET_TYPE_AUTH_OK, client_protocol.PACKET_TYPE_AUTH_FAIL):
+            if not self.authenticated.done():
+                self.authenticated.set_result(packet_type == client_protocol.PACKET_TYPE_AUTH_OK)
+
+    def send(self, packet):
+        self.transport.sendto(packet, self.relay_address)
+
+    def tick(self, talking):
+        """Send this tick's frame (or FLOOR_RELEASE when the spurt ended)"""
+        if talking and not self.talking:
+            self.spurt += 1
+            self.sent[self.spurt] = 0
+        elif not talking and self.talking:
+            self.send(client_protocol.build_floor_packet(self.channel_id, self.user_id,
+                                                         client_protocol.FLOOR_RELEASE))
+        self.talking = talking
+        if talking:
+            payload = FRAME_INFO.pack(time.perf_counter(), self.index, self.spurt) + self.padding
+            self.send(client_protocol.build_packet(self.channel_id, self.user_id, self.sequence, payload))
+            self.sequence = (self.sequence + 1) % 65536
+            self.sent[self.spurt] += 1
+
+
+def run_relay(port, database, ready, stop, quiet):
+    """Child process: the relay under test"""
+    if quiet:
+        sys.stdout = sys.stderr  # Keep stdout clean for the JSON report
+    os.environ["DATABASE_PATH"] = database
+    import event_loop
+    from client_registry import ClientRegistry
+    from async_udp_server import AsyncUDPServer
+
+    async def main():
+        server = AsyncUDPServer('127.0.0.1', port, ClientRegistry(3600))
+        await server.start()
+        ready.set()
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+        await server.stop()
+
+    event_loop.run(main())
+
+
+async def connect(args):
+    """Seed funk keys, open one session per client, authenticate and join"""
+    db = Database(args.database)
+    loop = asyncio.get_running_loop()
+    rng = random.Random(args.seed)
+    cycle = args.talk + args.listen
+    clients = []
+    for index in range(args.clients):
+        channel_id = FIRST_CHANNEL + index % args.channels
+        funk_key = f"load-key-{index}"
+        if not db.verify_user(funk_key):
+            db.create_user(f"load_{index}", funk_key, [channel_id])
+        client = SimulatedClient(index, channel_id, funk_key, ('127.0.0.1', args.port), args.frame_bytes,
+                                 rng.uniform(0, cycle))
+        await loop.create_datagram_endpoint(lambda c=client: c, local_addr=('127.0.0.1', 0))
+        client.send(client_protocol.build_auth_packet(channel_id, client.user_id, funk_key))
+        clients.append(client)
+
+    results = await asyncio.wait_for(asyncio.gather(*(c.authenticated for c in clients)), 30)
+    if not all(results):
+        raise RuntimeError(f"{results.count(False)} clients failed to authenticate")
+    for client in clients:
+        client.send(client_protocol.build_ping_packet(client.channel_id, client.user_id))
+    await asyncio.sleep(0.5)
+    return clients
+
+
+async def generate(clients, args):
+    """Drive all clients on a 20 ms tick for the configured duration"""
+    loop = asyncio.get_running_loop()
+    cycle = args.talk + args.listen
+    ticks = int(args.seconds / FRAME_SECONDS)
+    start = loop.time()
+    late_ticks = 0
+    for tick in range(ticks):
+        now = tick * FRAME_SECONDS
+        for client in clients:
+            client.tick((now + client.phase) % cycle < args.talk)
+            if (tick + client.index) % PING_TICKS == 0:
+                client.send(client_protocol.build_ping_packet(client.channel_id, client.user_id))
+        delay = start + (tick + 1) * FRAME_SECONDS - loop.time()
+        if delay < 0:
+            late_ticks += 1
+        await asyncio.sleep(max(0.0, delay))
+    for client in clients:
+        client.tick(False)
+    await asyncio.sleep(0.5)  # Frames still in flight
+    return late_ticks
+
+
+def percentiles_ms(values):
+    ordered = sorted(values)
+    if not ordered:
+        return {f"p{pct}_ms": None for pct in PERCENTILES}
+    return {
+        f"p{pct}_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000, 3)
+        for pct in PERCENTILES
+    }
+
+
+def build_report(clients, args, late_ticks):
+    members = {}
+    for client in clients:
+        members.setdefault(client.channel_id, []).append(client)
+
+    receivers = []
+    for client in clients:
+        expected = received = 0
+        for talker in members[client.channel_id]:
+            if talker is client:
+                continue
+            for spurt, frames in talker.sent.items():
+                if spurt in talker.denied:
+                    continue
+                expected += frames
+                received += min(frames, client.heard.get((talker.index, spurt), 0))
+        receivers.append({
+            "client": client.index,
+            "channel": client.channel_id,
+            "expected": expected,
+            "received": received,
+            "loss_pct": round((expected - received) / expected * 100, 3) if expected else 0.0,
+            "reordered": client.reordered,
+            **percentiles_ms(client.latencies),
+        })
+
+    spurts = sum(len(c.sent) for c in clients)
+    denied = sum(len(c.denied) for c in clients)
+    expected = sum(r["expected"] for r in receivers)
+    received = sum(r["received"] for r in receivers)
+    return {
+        "config": {
+            "clients": args.clients, "channels": args.channels, "talk_seconds": args.talk,
+            "listen_seconds": args.listen, "seconds": args.seconds, "frame_bytes": args.frame_bytes,
+            "seed": args.seed,
+        },
+        "summary": {
+            "frames_sent": sum(sum(c.sent.values()) for c in clients),
+            "spurts": spurts,
+            "spurts_denied": denied,
+            "frames_expected": expected,
+            "frames_received": received,
+            "loss_pct": round((expected - received) / expected * 100, 3) if expected else 0.0,
+            "reordered": sum(c.reordered for c in clients),
+            "late_ticks": late_ticks,
+            **percentiles_ms([latency for c in clients for latency in c.latencies]),
+        },
+        "receivers": receivers,
+    }
+
+
+def print_report(report):
+    config, summary = report["config"], report["summary"]
+    print(f"{config['clients']} clients in {config['channels']} channels, talk {config['talk_seconds']}s / "
+          f"listen {config['listen_seconds']}s, {config['seconds']}s")
+    print(f"frames sent:     {summary['frames_sent']} in {summary['spurts']} spurts "
+          f"({summary['spurts_denied']} denied by floor control)")
+    print(f"frames received: {summary['frames_received']} / {summary['frames_expected']} "
+          f"(loss {summary['loss_pct']}%), reordered: {summary['reordered']}")
+    print(f"latency:         p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms")
+    if summary["late_ticks"]:
+        print(f"⚠️  generator missed {summary['late_ticks']} ticks - results include generator overload")
+    worst = sorted(report["receivers"], key=lambda r: r["loss_pct"], reverse=True)[:5]
+    print(f"\n{'client':>6} {'channel':>7} {'expected':>9} {'received':>9} {'loss %':>7} {'reord':>6} {'p99 ms':>8}")
+    for r in worst:
+        print(f"{r['client']:>6} {r['channel']:>7} {r['expected']:>9} {r['received']:>9} "
+              f"{r['loss_pct']:>7} {r['reordered']:>6} {r['p99_ms'] if r['p99_ms'] is not None else '-':>8}")
+
+
+async def run(args):
+    clients = await connect(args)
+    try:
+        late_ticks = await generate(clients, args)
+    finally:
+        for client in clients:
+            client.transport.close()
+    return build_report(clients, args, late_ticks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--talk", type=float, default=2.0, help="seconds of each talk spurt")
+    parser.add_argument("--listen", type=float, default=18.0, help="seconds of listening between spurts")
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--frame-bytes", type=int, default=60, help="payload size (60 = 24 kbit/s Opus)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=50600)
+    parser.add_argument("--no-relay", action="store_true", help="use a relay already listening on --port")
+    parser.add_argument("--database", help="database to seed the funk keys into (default: a temporary file)")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+    if args.database is None:
+        args.database = os.path.join(tempfile.mkdtemp(), "load.db")
+
+    relay = None
+    if not args.no_relay:
+        ctx = multiprocessing.get_context("spawn")
+        ready, stop = ctx.Event(), ctx.Event()
+        relay = ctx.Process(target=run_relay, args=(args.port, args.database, ready, stop, args.json))
+        relay.start()
+        ready.wait(10)
+    try:
+        with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+            report = asyncio.run(run(args))
+    finally:
+        if relay is not None:
+            stop.set()
+            relay.join()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
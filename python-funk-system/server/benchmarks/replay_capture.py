@@ -0,0 +1,248 @@
+"""
+Replay of a packet capture against the relay
+
+Feeds a capture recorded with CAPTURE_PATH (packet_capture.py) back
+into an AsyncUDPServer over localhost, with the original timing
+(--speed 1) or accelerated (--speed 10). Every source address of the capture gets its own local
+socket, so the relay sees the same clients, sessions and packet order
+as in production - glitches reported from the field can be reproduced
+and the replay doubles as a realistic benchmark workload.
+
+The funk keys of the captured AUTH packets are seeded into --database,
+a fresh temporary file by default (DATABASE_PATH is never used, so a
+replay can't add the captured keys to the configured database), allowed
+for every channel their client used, so the sessions authenticate like
+they did. After each AUTH the replay waits for the relay's answer, as
+the client did, and shifts the rest of the schedule by that wait. The
+relay is started in a child process on that database unless --no-relay
+is given, in which case a relay already listening on --port is used
+(pass its database with --database, or --no-seed if the keys exist
+there).
+
+Reports how late the replay sent packets against the schedule, the
+relay's packets in/out, drops and CPU usage, and the packets that came
+back to the replayed clients.
+
+Usage:
+    python benchmarks/replay_capture.py CAPTURE [--speed 1] [--port 50700] [--no-relay] [--database DB] [--no-seed]
+"""
+import argparse
+import multiprocessing
+import os
+import selectors
+import socket
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from database import Database
+from packet_capture import read_capture
+from protocol import (HEADER_SIZE, PACKET_TYPE_AUTH, PACKET_TYPE_AUTH_OK, PACKET_TYPE_AUTH_FAIL,
+                      unpack_header)
+
+AUTH_REQUEST = bytes([PACKET_TYPE_AUTH])
+AUTH_ANSWERS = (bytes([PACKET_TYPE_AUTH_OK]), bytes([PACKET_TYPE_AUTH_FAIL]))
+BUSY_WAIT_SECONDS = 0.001  # Spin instead of select for sends due this soon
+AUTH_TIMEOUT_SECONDS = 1.0
+
+
+def run_relay(port, database, ready, replay, stop, results):
+    """Child process: the relay under test, reporting counters for the replay window"""
+    os.environ["DATABASE_PATH"] = database
+    import asyncio
+    import event_loop
+    from client_registry import ClientRegistry
+    from async_udp_server import AsyncUDPServer
+
+    async def main():
+        server = AsyncUDPServer('127.0.0.1', port, ClientRegistry(3600))
+        await server.start()
+        ready.set()
+        while not replay.is_set():
+            await asyncio.sleep(0.01)
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+        drops = {}
+        for (_, reason), count in server.metric_drops.values.items():
+            drops[reason] = drops.get(reason, 0) + count
+        results.put({
+            "cpu_seconds": time.process_time() - cpu_start,
+            "wall_seconds": time.perf_counter() - wall_start,
+            "packets_in": sum(server.metric_packets_in.values.values()),
+            "packets_out": sum(server.metric_packets_out.values.values()),
+            "drops": drops,
+        })
+        await server.stop()
+
+    event_loop.run(main())
+
+
+def load_capture(path):
+    """Read the whole capture into memory: [(offset seconds, source, datagram)]"""
+    started_at, records = read_capture(path)
+    packets = []
+    first = None
+    for timestamp, source, data in records:
+        if first is None:
+            first = timestamp
+        packets.append((timestamp - first, source, data))
+    return started_at, packets
+
+
+def seed_funk_keys(packets, database):
+    """Create a user for every funk key in the capture, allowed in every channel its clients used"""
+    keys = {}  # {funk_key: {channel_ids}}
+    key_of_source = {}
+    for _, source, data in packets:
+        header = unpack_header(data)
+        if header is None:
+            continue
+        packet_type, channel_id = header[0], header[1]
+        if packet_type == PACKET_TYPE_AUTH:
+            funk_key = data[HEADER_SIZE:].decode('utf-8', 'replace').strip()
+            key_of_source[source] = funk_key
+            keys.setdefault(funk_key, set())
+        funk_key = key_of_source.get(source)
+        if funk_key is not None:
+            keys[funk_key].add(channel_id)
+
+    db = Database(database)
+    created = 0
+    for i, (funk_key, channels) in enumerate(keys.items()):
+        if db.verify_user(funk_key) is None:
+            db.create_user(f"replay_{i}", funk_key, sorted(channels))
+            created += 1
+    return created
+
+
+def replay(packets, port, speed):
+    """Send the packets on their schedule; returns (elapsed, sorted lateness, packets received back, sources)"""
+    relay_address = ('127.0.0.1', port)
+    sockets = {}
+    selector = selectors.DefaultSelector()
+    for _, source, _ in packets:
+        if source not in sockets:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(('127.0.0.1', 0))
+            sock.setblocking(False)
+            sockets[source] = sock
+            selector.register(sock, selectors.EVENT_READ)
+
+    received = 0
+    waiting_for_auth = None  # Socket whose AUTH is not answered yet
+
+    def drain(timeout):
+        nonlocal received, waiting_for_auth
+        for key, _ in selector.select(timeout):
+            while True:
+                try:
+                    data = key.fileobj.recv(65536)
+                except BlockingIOError:
+                    break
+                received += 1
+                if key.fileobj is waiting_for_auth and data[:1] in AUTH_ANSWERS:
+                    waiting_for_auth = None
+
+    lateness = []
+    start = time.perf_counter()
+    for offset, source, data in packets:
+        due = start + offset / speed
+        while True:
+            wait = due - time.perf_counter()
+            if wait <= BUSY_WAIT_SECONDS:
+                break
+            drain(wait - BUSY_WAIT_SECONDS)
+        while time.perf_counter() < due:
+            pass
+        try:
+            sockets[source].sendto(data, relay_address)
+        except BlockingIOError:
+            pass
+        lateness.append(time.perf_counter() - due)
+
+        if data[:1] == AUTH_REQUEST:
+            # The client waited for AUTH_OK before talking; the relay checks
+            # the key in a thread, so without this an accelerated replay
+            # would send audio of sessions that are not authenticated yet
+            waiting_for_auth = sockets[source]
+            auth_sent = time.perf_counter()
+            while waiting_for_auth is not None and time.perf_counter() - auth_sent < AUTH_TIMEOUT_SECONDS:
+                drain(AUTH_TIMEOUT_SECONDS)
+            waiting_for_auth = None
+            start += time.perf_counter() - auth_sent  # Shift the rest of the schedule
+    elapsed = time.perf_counter() - start
+
+    # Collect what the relay still sends back
+    deadline = time.perf_counter() + 0.5
+    while time.perf_counter() < deadline:
+        drain(deadline - time.perf_counter())
+    selector.close()
+    for sock in sockets.values():
+        sock.close()
+    return elapsed, sorted(lateness), received, len(sockets)
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("capture")
+    parser.add_argument("--speed", type=float, default=1.0, help="time acceleration (1 = original timing)")
+    parser.add_argument("--port", type=int, default=50700)
+    parser.add_argument("--no-relay", action="store_true", help="use a relay already listening on --port")
+    parser.add_argument("--database", help="database to seed the funk keys into (default: a temporary file)")
+    parser.add_argument("--no-seed", action="store_true", help="don't seed the captured funk keys")
+    args = parser.parse_args()
+    if args.database is None:
+        args.database = os.path.join(tempfile.mkdtemp(), "replay.db")
+    if args.speed <= 0:
+        parser.error("--speed must be > 0")
+
+    started_at, packets = load_capture(args.capture)
+    if not packets:
+        print("❌ Capture is empty")
+        return
+    duration = packets[-1][0]
+    print(f"capture: {len(packets)} datagrams over {duration:.1f}s, "
+          f"recorded {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started_at))}")
+    if not args.no_seed:
+        print(f"seeded {seed_funk_keys(packets, args.database)} funk key(s)")
+
+    relay = None
+    if not args.no_relay:
+        ctx = multiprocessing.get_context("spawn")
+        ready, replaying, stop, results = ctx.Event(), ctx.Event(), ctx.Event(), ctx.Queue()
+        relay = ctx.Process(target=run_relay, args=(args.port, args.database, ready, replaying, stop, results))
+        relay.start()
+        ready.wait(10)
+        replaying.set()
+
+    try:
+        elapsed, lateness, received, sources = replay(packets, args.port, args.speed)
+    finally:
+        if relay is not None:
+            stop.set()
+    print(f"replayed from {sources} source(s) in {elapsed:.2f}s ({len(packets) / elapsed:.0f} pps in), "
+          f"speed {args.speed:g}x")
+    print(f"send lateness: p50 {percentile(lateness, 50) * 1000:.3f} ms, "
+          f"p99 {percentile(lateness, 99) * 1000:.3f} ms, max {lateness[-1] * 1000:.3f} ms")
+    print(f"received back at the replayed clients: {received}")
+
+    if relay is not None:
+        r = results.get(timeout=10)
+        relay.join()
+        wall = r["wall_seconds"]
+        drops = ", ".join(f"{reason} {count}" for reason, count in sorted(r["drops"].items())) or "none"
+        print(f"relay: {r['packets_in']} in, {r['packets_out']} out ({r['packets_out'] / wall:.0f} pps), "
+              f"CPU {r['cpu_seconds'] / wall:.1%}, drops: {drops}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,438 @@
+"""
+Channel-sharded relay: a header-only dispatcher in front of shard processes
+
+Unlike the SO_REUSEPORT workers (udp_workers.py), which split clients,
+this mode splits channels. The process owning the UDP socket only
+decodes the header, checks the session and channel permission, and
+hands every PING/FLOOR/AUDIO packet to the shard owning the channel
+(channel_id % CHANNEL_SHARDS). Jitter buffering, floor control, fan-out
+and per-channel statistics of a channel thus run on the shard's core.
+
+Handoff uses one single-producer/single-consumer ring buffer per shard
+in shared memory; a byte on a socketpair wakes the shard, at most once
+per event loop iteration of the dispatcher. Shards send through a
+duplicate of the dispatcher's socket (they never read from it), so
+clients see every packet coming from SERVER_PORT.
+
+Ring layout: producer head at offset 0, consumer tail at 64 followed by
+the statistics the shard publishes, records from DATA_OFFSET on. A
+record is a '<HBdB16sH' header (payload length, kind, enqueue time,
+address family 4/6, packed address, port) and the payload; records
+never wrap, the rest of the ring is skipped instead (marked with
+PAD_LENGTH if there is room).
+
+Besides client packets, the dispatcher sends SHARD_JOIN when a client
+authenticated for a channel (so it hears the channel before its first
+PING) and SHARD_LEAVE when it left one.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import struct
+import time
+from multiprocessing import shared_memory
+
+import event_loop
+from logger import log_event
+from protocol import unpack_header
+
+SHARD_PACKET = 0  # Client packet for the owning shard
+SHARD_LEAVE = 1  # Client left a channel (payload: channel_id)
+SHARD_JOIN = 2  # Client authenticated for a channel (payload: _JOIN)
+
+_U64 = struct.Struct('<Q')
+_RECORD = struct.Struct('<HBdB16sH')
+_JOIN = struct.Struct('<BI')  # channel_id, user_id
+_NO_ADDRESS = bytes(16)
+# Published by the shard: records, packets out, bytes out, handoff seconds (sum, max)
+_SHARD_STATS = struct.Struct('<QQQdd')
+BUSIEST_CHANNELS = 8
+_BUSIEST = struct.Struct('<' + 'HQ' * BUSIEST_CHANNELS)
+HEAD_OFFSET = 0
+TAIL_OFFSET = 64  # Own cache line, the consumer writes it for every record
+STATS_OFFSET = TAIL_OFFSET + _U64.size
+BUSIEST_OFFSET = STATS_OFFSET + _SHARD_STATS.size
+DATA_OFFSET = 256
+PAD_LENGTH = 0xFFFF
+NO_CHANNEL = 0xFFFF  # Empty slot in the busiest-channels table
+STATS_INTERVAL_SECONDS = 1.0
+
+
+class ShardRing:
+    """
+    SPSC ring of (kind, address, payload) records in shared memory
+
+    The dispatcher only calls put(), the shard only drain(). Each side
+    keeps its own index and publishes it after the record is complete,
+    so the other side never sees a partial record.
+    """
+
+    def __init__(self, shm, capacity):
+        self.shm = shm
+        self.buf = shm.buf
+        self.capacity = capacity
+        self.head = _U64.unpack_from(self.buf, HEAD_OFFSET)[0]
+        self.tail = _U64.unpack_from(self.buf, TAIL_OFFSET)[0]
+
+    @classmethod
+    def create(cls, capacity):
+        shm = shared_memory.SharedMemory(create=True, size=DATA_OFFSET + capacity)
+        shm.buf[:DATA_OFFSET] = bytes(DATA_OFFSET)
+        _BUSIEST.pack_into(shm.buf, BUSIEST_OFFSET, *([NO_CHANNEL, 0] * BUSIEST_CHANNELS))
+        return cls(shm, capacity)
+
+    @classmethod
+    def attach(cls, name, capacity):
+        return cls(shared_memory.SharedMemory(name=name), capacity)
+
+    def put(self, kind, address, payload, enqueued_at):
+        """
+        Append a record (producer side)
+
+        Returns:
+            False if the ring is full
+        """
+        size = _RECORD.size + len(payload)
+        head = self.head
+        position = head % self.capacity
+        room = self.capacity - position
+        skip = room if room < size else 0
+        tail = _U64.unpack_from(self.buf, TAIL_OFFSET)[0]
+        if head + skip + size - tail > self.capacity:
+            return False
+
+        buf = self.buf
+        if skip:
+            if room >= _RECORD.size:
+                _RECORD.pack_into(buf, DATA_OFFSET + position, PAD_LENGTH, 0, 0.0, 0, _NO_ADDRESS, 0)
+            head += skip
+            position = 0
+        offset = DATA_OFFSET + position
+        host = address[0]
+        if ':' in host:
+            _RECORD.pack_into(buf, offset, len(payload), kind, enqueued_at, 6,
+                              socket.inet_pton(socket.AF_INET6, host), address[1])
+        else:
+            _RECORD.pack_into(buf, offset, len(payload), kind, enqueued_at, 4, socket.inet_aton(host), address[1])
+        buf[offset + _RECORD.size:offset + size] = payload
+        self.head = head + size
+        _U64.pack_into(buf, HEAD_OFFSET, self.head)
+        return True
+
+    def drain(self, handler):
+        """
+        Pass every available record to handler(kind, address, payload, enqueued_at)
+
+        Returns:
+            Number of records handled
+        """
+        buf = self.buf
+        head = _U64.unpack_from(buf, HEAD_OFFSET)[0]
+        tail = self.tail
+        count = 0
+        while tail < head:
+            position = tail % self.capacity
+            room = self.capacity - position
+            if room < _RECORD.size:
+                tail += room
+                continue
+            offset = DATA_OFFSET + position
+            length, kind, enqueued_at, family, ip, port = _RECORD.unpack_from(buf, offset)
+            if length == PAD_LENGTH:
+                tail += room
+                continue
+            start = offset + _RECORD.size
+            payload = bytes(buf[start:start + length])
+            tail += _RECORD.size + length
+            # Free the slot before handling, the dispatcher may already refill it
+            self.tail = tail
+            _U64.pack_into(buf, TAIL_OFFSET, tail)
+            host = socket.inet_ntop(socket.AF_INET6, ip) if family == 6 else socket.inet_ntoa(ip[:4])
+            handler(kind, (host, port), payload, enqueued_at)
+            count += 1
+        self.tail = tail
+        _U64.pack_into(buf, TAIL_OFFSET, tail)
+        return count
+
+    def used(self):
+        """Bytes waiting in the ring"""
+        return self.head - _U64.unpack_from(self.buf, TAIL_OFFSET)[0]
+
+    def close(self, unlink=False):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class SendOnlyTransport:
+    """Sends through the dispatcher's UDP socket; shards never read from it"""
+
+    def __init__(self, sock):
+        self._sock = sock
+        self.send_dropped = 0  # Socket buffer full
+
+    def sendto(self, data, addr):
+        try:
+            self._sock.sendto(data, addr)
+        except BlockingIOError:
+            self.send_dropped += 1
+
+    def get_extra_info(self, name, default=None):
+        if name == "socket":
+            return self._sock
+        return default
+
+    def close(self):
+        self._sock.close()
+
+
+class _Shard:
+    """Dispatcher-side state of one shard process"""
+
+    def __init__(self, index, ring, wake, process):
+        self.index = index
+        self.ring = ring
+        self.wake = wake
+        self.process = process
+        self.wake_pending = False
+        self.dispatched = 0
+        self.dropped = 0  # Ring full
+
+
+class ChannelShards:
+    """Dispatcher side: owns the rings and shard processes (event loop thread only)"""
+
+    def __init__(self, count, ring_bytes):
+        self.count = count
+        self.ring_bytes = ring_bytes
+        self.server = None
+        self.shards = []
+        self.owners = ()  # channel_id -> _Shard
+        self._loop = None
+
+    def start(self, server):
+        """Create the rings and spawn one shard process per ring"""
+        self.server = server
+        self._loop = asyncio.get_running_loop()
+        front = server.transport.get_extra_info('socket')
+        ctx = multiprocessing.get_context("spawn")
+        for index in range(self.count):
+            ring = ShardRing.create(self.ring_bytes)
+            wake, shard_wake = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+            wake.setblocking(False)
+            send_sock = socket.socket(fileno=os.dup(front.fileno()))
+            process = ctx.Process(
+                target=run_channel_shard,
+                args=(index, self.count, ring.shm.name, self.ring_bytes, shard_wake, send_sock,
+                      server.host, server.port),
+                name=f"channel-shard-{index}",
+                daemon=True
+            )
+            process.start()
+            shard_wake.close()
+            send_sock.close()
+            self.shards.append(_Shard(index, ring, wake, process))
+        self.owners = tuple(self.shards[channel_id % self.count] for channel_id in range(256))
+        # Sends happen in the shards, so the dispatcher's per-channel send metrics stay empty
+        server.metrics.gauge(
+            'funk_shard_packets_sent', 'Audio packets sent by the shard process', ('shard',),
+            function=lambda: self._published(1))
+        server.metrics.gauge(
+            'funk_shard_bytes_sent', 'Audio bytes sent by the shard process', ('shard',),
+            function=lambda: self._published(2))
+
+    def _published(self, field):
+        """Field `field` of the statistics each shard publishes in its ring (records, packets, bytes, ...)"""
+        return {(shard.index,): _SHARD_STATS.unpack_from(shard.ring.buf, STATS_OFFSET)[field]
+                for shard in self.shards}
+
+    def dispatch(self, channel_id, client_address, packet):
+        """Hand a client packet to the shard owning the channel"""
+        shard = self.owners[channel_id]
+        if not shard.ring.put(SHARD_PACKET, client_address, packet, time.perf_counter()):
+            shard.dropped += 1
+            self.server.metric_drops.inc((channel_id, 'shard_full'))
+            return
+        shard.dispatched += 1
+        self._wake(shard)
+
+    def join(self, client_address, channel_id, user_id):
+        """Tell the owning shard that a client authenticated for a channel"""
+        self._control(SHARD_JOIN, client_address, channel_id, _JOIN.pack(channel_id, user_id))
+
+    def leave(self, client_address, channel_id):
+        """Tell the owning shard that a client left (expired or revoked) a channel"""
+        self._control(SHARD_LEAVE, client_address, channel_id, bytes((channel_id,)))
+
+    def _control(self, kind, client_address, channel_id, payload):
+        shard = self.owners[channel_id]
+        if not shard.ring.put(kind, client_address, payload, time.perf_counter()):
+            # Membership catches up with the client's next PING or its expiry in the shard
+            shard.dropped += 1
+            self.server.metric_drops.inc((channel_id, 'shard_full'))
+            return
+        self._wake(shard)
+
+    def _wake(self, shard):
+        if not shard.wake_pending:
+            shard.wake_pending = True
+            self._loop.call_soon(self._send_wake, shard)
+
+    @staticmethod
+    def _send_wake(shard):
+        shard.wake_pending = False
+        try:
+            shard.wake.send(b'\0')
+        except OSError:
+            pass  # Wake-up queue full: the shard has not drained yet anyway
+
+    def stop(self, timeout=5):
+        for shard in self.shards:
+            if shard.process.is_alive():
+                shard.process.terminate()
+        for shard in self.shards:
+            shard.process.join(timeout)
+            shard.wake.close()
+            shard.ring.close(unlink=True)
+        self.shards = []
+        self.owners = ()
+
+    def get_stats(self):
+        """Dispatcher counters and the statistics each shard publishes in its ring"""
+        shards = []
+        for shard in self.shards:
+            buf = shard.ring.buf
+            records, packets_out, bytes_out, handoff_total, handoff_max = _SHARD_STATS.unpack_from(buf, STATS_OFFSET)
+            busiest = _BUSIEST.unpack_from(buf, BUSIEST_OFFSET)
+            shards.append({
+                "shard": shard.index,
+                "alive": shard.process.is_alive(),
+                "channels": sorted(c for c in self.server.client_registry.channels if c % self.count == shard.index),
+                "dispatched": shard.dispatched,
+                "dropped_ring_full": shard.dropped,
+                "ring_used_bytes": shard.ring.used(),
+                "records_handled": records,
+                "packets_out": packets_out,
+                "bytes_out": bytes_out,
+                "avg_handoff_ms": round(handoff_total / records * 1000, 3) if records else 0.0,
+                "max_handoff_ms": round(handoff_max * 1000, 3),
+                "busiest_channels": {
+                    busiest[i]: busiest[i + 1]
+                    for i in range(0, len(busiest), 2) if busiest[i] != NO_CHANNEL
+                }
+            })
+        return {"shards": self.count, "ring_bytes": self.ring_bytes, "per_shard": shards}
+
+
+class ChannelShardWorker:
+    """Shard side: feeds ring records into an AsyncUDPServer without a socket of its own"""
+
+    def __init__(self, index, ring, wake, server):
+        self.index = index
+        self.ring = ring
+        self.wake = wake
+        self.server = server
+        self.records = 0
+        self.handoff_total = 0.0
+        self.handoff_max = 0.0
+
+    def start(self):
+        self.wake.setblocking(False)
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self.wake.fileno(), self._on_wake)
+        self._stats_task = asyncio.create_task(self._stats_loop())
+        self._on_wake()  # Packets dispatched while the process was starting
+
+    def _on_wake(self):
+        while True:
+            try:
+                self.wake.recv(64)
+            except BlockingIOError:
+                break
+        self.ring.drain(self._handle_record)
+
+    def _handle_record(self, kind, address, payload, enqueued_at):
+        handoff = time.perf_counter() - enqueued_at
+        self.records += 1
+        self.handoff_total += handoff
+        if handoff > self.handoff_max:
+            self.handoff_max = handoff
+
+        server = self.server
+        if kind == SHARD_JOIN:
+            channel_id, user_id = _JOIN.unpack(payload)
+            server.client_registry.register_client(address, channel_id, user_id)
+            return
+        if kind == SHARD_LEAVE:
+            channel_id = payload[0]
+            server.client_registry.unregister_client(address, channel_id)
+            server._drop_jitter_buffer((channel_id, address))
+            return
+        try:
+            header = unpack_header(payload)
+            if header is not None:
+                server._handle_member_packet(payload, address, *header,
+                                             received_at=enqueued_at if server.tracer is not None else None)
+        except Exception as e:
+            server.metric_drops.inc(('unknown', 'error'))
+            log_event(logging.ERROR, 'packet_error', "❌ Error handling packet in shard %s: %s", self.index, e,
+                      rate_key=address, client=address, error=repr(e))
+
+    async def _stats_loop(self):
+        """Publish counters and the busiest channels into the ring for the dispatcher"""
+        while True:
+            await asyncio.sleep(STATS_INTERVAL_SECONDS)
+            self.publish_stats()
+
+    def publish_stats(self):
+        server = self.server
+        packets = server.metric_packets_out.values
+        _SHARD_STATS.pack_into(self.ring.buf, STATS_OFFSET, self.records, sum(packets.values()),
+                               sum(server.metric_bytes_out.values.values()), self.handoff_total, self.handoff_max)
+        busiest = sorted(packets.items(), key=lambda item: item[1], reverse=True)[:BUSIEST_CHANNELS]
+        slots = []
+        for labels, count in busiest:
+            slots += [labels[0], count]
+        slots += [NO_CHANNEL, 0] * (BUSIEST_CHANNELS - len(busiest))
+        _BUSIEST.pack_into(self.ring.buf, BUSIEST_OFFSET, *slots)
+
+    def close(self):
+        asyncio.get_running_loop().remove_reader(self.wake.fileno())
+        self._stats_task.cancel()
+        self.publish_stats()
+        self.ring.close()
+        self.wake.close()
+
+
+async def serve_channel_shard(index, count, ring_name, ring_bytes, wake, send_sock, host, port):
+    """Run one shard until SIGINT/SIGTERM"""
+    from config import TIMEOUT_SECONDS
+    from client_registry import ClientRegistry
+    from async_udp_server import AsyncUDPServer
+
+    server = AsyncUDPServer(host, port, ClientRegistry(TIMEOUT_SECONDS))
+    server.transport = SendOnlyTransport(send_sock)
+    server.running = True
+    server._loop = asyncio.get_running_loop()
+    server.start_tasks()
+    worker = ChannelShardWorker(index, ShardRing.attach(ring_name, ring_bytes), wake, server)
+    worker.start()
+    log_event(logging.INFO, 'shard_started', f"🧩 Shard {index + 1}/{count} owns channel_id % {count} == {index}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await stop.wait()
+    worker.close()
+    await server.stop()
+
+
+def run_channel_shard(index, count, ring_name, ring_bytes, wake, send_sock, host, port):
+    """Process entry point for shard `index`"""
+    event_loop.run(serve_channel_shard(index, count, ring_name, ring_bytes, wake, send_sock, host, port))
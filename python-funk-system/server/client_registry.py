@@ -1,15 +1,40 @@
 import time
 from threading import Lock
 
+EXPIRY_TICK_SECONDS = 1.0  # Granularity of the expiry buckets
+
 
 class ClientRegistry:
+    """
+    Registry of clients and their channel memberships
+
+    Recipient lists are copy-on-write snapshots: an immutable tuple per
+    channel is rebuilt only on join/leave/expiry, so the per-packet
+    lookups (get_clients_in_channel, refreshing last_seen) need no lock
+    and allocate nothing.
+
+    Expiry uses a bucketed deadline index (lazy timer wheel): a client sits
+    in the bucket of its deadline and refreshing last_seen never moves it.
+    A sweep only visits due buckets; clients that were refreshed meanwhile
+    are re-bucketed, all others have actually expired.
+    """
+
     def __init__(self, timeout_seconds):
         self.clients = {}
         self.channels = {}
         self.lock = Lock()
         self.timeout_seconds = timeout_seconds
+        self._recipients = {}  # {channel_id: tuple(addresses)}
+        self._recipients_excluding = {}  # {channel_id: {exclude_address: tuple(addresses)}}
+        self._expiry_buckets = {}  # {tick: set(client_addresses)}
 
     def register_client(self, client_address, channel_id, user_id):
+        # Fast path: already a member, only refresh last_seen
+        client_info = self.clients.get(client_address)
+        if client_info is not None and channel_id in client_info['channel_ids']:
+            client_info['last_seen'] = time.time()
+            return
+        
         with self.lock:
             client_key = client_address
             
@@ -21,6 +46,7 @@ class ClientRegistry:
                     'user_id': user_id,
                     'last_seen': time.time()
                 }
+                self._schedule_expiry(client_key, self.clients[client_key]['last_seen'])
             
             # Add channel to client's channel list
             self.clients[client_key]['channel_ids'].add(channel_id)
@@ -30,39 +56,127 @@ class ClientRegistry:
             if channel_id not in self.channels:
                 self.channels[channel_id] = set()
             self.channels[channel_id].add(client_key)
+            self._rebuild_recipients(channel_id)
 
     def update_timestamp(self, client_address):
-        with self.lock:
-            if client_address in self.clients:
-                self.clients[client_address]['last_seen'] = time.time()
+        client_info = self.clients.get(client_address)
+        if client_info is not None:
+            client_info['last_seen'] = time.time()
 
     def get_clients_in_channel(self, channel_id, exclude_address=None):
+        """
+        Get recipient addresses of a channel as an immutable tuple
+        
+        The returned tuple is shared and must not be modified. Tuples
+        excluding a sender are built on first use and cached until the
+        channel membership changes.
+        """
+        if exclude_address is None:
+            return self._recipients.get(channel_id, ())
+        
+        excluding = self._recipients_excluding.get(channel_id)
+        if excluding is None:
+            return ()
+        recipients = excluding.get(exclude_address)
+        if recipients is None:
+            recipients = tuple(
+                address for address in self._recipients.get(channel_id, ())
+                if address != exclude_address
+            )
+            excluding[exclude_address] = recipients
+        return recipients
+
+    def unregister_client(self, client_address, channel_id=None):
+        """
+        Remove a client from one channel, or from all channels if channel_id is None
+        
+        Returns:
+            Set of channel IDs the client was removed from
+        """
         with self.lock:
-            if channel_id not in self.channels:
-                return []
+            client_info = self.clients.get(client_address)
+            if client_info is None:
+                return set()
+            
+            changed_channels = set()
+            if channel_id is None or client_info['channel_ids'] == {channel_id}:
+                self._remove_client(client_address, changed_channels)
+            elif channel_id in client_info['channel_ids']:
+                client_info['channel_ids'].discard(channel_id)
+                members = self.channels.get(channel_id)
+                if members is not None:
+                    members.discard(client_address)
+                    if not members:
+                        del self.channels[channel_id]
+                changed_channels.add(channel_id)
             
-            clients = []
-            for client_key in self.channels[channel_id]:
-                if client_key != exclude_address and client_key in self.clients:
-                    clients.append(self.clients[client_key]['address'])
-            return clients
+            for changed in changed_channels:
+                self._rebuild_recipients(changed)
+            return changed_channels
 
     def remove_stale_clients(self):
-        current_time = time.time()
+        return len(self.expire_clients())
+
+    def expire_clients(self, current_time=None):
+        """
+        Remove clients whose last_seen is older than the timeout
+        
+        Only buckets whose deadline has passed are visited.
+        
+        Returns:
+            List of removed client info dicts ('address', 'channel_ids', ...)
+        """
+        if current_time is None:
+            current_time = time.time()
+        current_tick = int(current_time // EXPIRY_TICK_SECONDS)
+        
         with self.lock:
-            stale_clients = []
-            for client_key, client_info in self.clients.items():
-                if current_time - client_info['last_seen'] > self.timeout_seconds:
-                    stale_clients.append(client_key)
+            due_ticks = sorted(tick for tick in self._expiry_buckets if tick <= current_tick)
+            removed = []
+            changed_channels = set()
+            for tick in due_ticks:
+                for client_key in self._expiry_buckets.pop(tick):
+                    client_info = self.clients.get(client_key)
+                    if client_info is None:
+                        continue
+                    if current_time - client_info['last_seen'] > self.timeout_seconds:
+                        self._remove_client(client_key, changed_channels)
+                        removed.append(client_info)
+                    else:
+                        # Refreshed since it was bucketed - move to its new deadline
+                        self._schedule_expiry(client_key, client_info['last_seen'])
             
-            for client_key in stale_clients:
-                client_info = self.clients[client_key]
-                # Remove client from all channels
-                for channel_id in client_info.get('channel_ids', set()):
-                    if channel_id in self.channels:
-                        self.channels[channel_id].discard(client_key)
-                        if not self.channels[channel_id]:
-                            del self.channels[channel_id]
-                del self.clients[client_key]
+            for channel_id in changed_channels:
+                self._rebuild_recipients(channel_id)
             
-            return len(stale_clients)
+            return removed
+
+    def _schedule_expiry(self, client_key, last_seen):
+        """Put a client into the bucket of its deadline (caller holds the lock)"""
+        tick = int((last_seen + self.timeout_seconds) // EXPIRY_TICK_SECONDS) + 1
+        bucket = self._expiry_buckets.get(tick)
+        if bucket is None:
+            bucket = self._expiry_buckets[tick] = set()
+        bucket.add(client_key)
+
+    def _remove_client(self, client_key, changed_channels):
+        """Remove client from all channels (caller holds the lock)"""
+        client_info = self.clients.pop(client_key)
+        for channel_id in client_info.get('channel_ids', set()):
+            if channel_id in self.channels:
+                self.channels[channel_id].discard(client_key)
+                if not self.channels[channel_id]:
+                    del self.channels[channel_id]
+                changed_channels.add(channel_id)
+
+    def _rebuild_recipients(self, channel_id):
+        """Publish a fresh recipient snapshot for a channel (caller holds the lock)"""
+        members = self.channels.get(channel_id)
+        if members:
+            # Publish the tuple before the exclusion cache so readers never
+            # fill a new cache from an outdated tuple
+            self._recipients[channel_id] = tuple(members)
+            self._recipients_excluding[channel_id] = {}
+        else:
+            self._recipients.pop(channel_id, None)
+            self._recipients_excluding.pop(channel_id, None)
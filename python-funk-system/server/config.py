@@ -1,11 +1,71 @@
+import os
+
 SERVER_HOST = '0.0.0.0'
 SERVER_PORT = 50000
 MAX_PACKET_SIZE = 8192  # Increased for Opus codec support (was 4096)
 TIMEOUT_SECONDS = 30
 
+# UDP I/O Backend
+UDP_IO_BACKEND = 'asyncio'  # 'asyncio' or 'mmsg' (Linux only: batched recvmmsg/sendmmsg)
+UDP_BATCH_SIZE = 64  # Max datagrams per recvmmsg/sendmmsg call
+EVENT_LOOP = os.environ.get('FUNK_EVENT_LOOP', 'asyncio')  # 'asyncio' or 'uvloop' (falls back to asyncio if not installed)
+UDP_WORKERS = 1  # >1: relay processes sharing SERVER_PORT via SO_REUSEPORT (Linux)
+CHANNEL_SHARDS = 0  # >0: shard processes own channel_id % CHANNEL_SHARDS, this process only dispatches (single worker only, no federation)
+CHANNEL_SHARD_RING_BYTES = 4 * 1024 * 1024  # Shared-memory ring per shard (~50000 audio packets)
+
+# Federation: relay nodes share channels over UDP (single worker only)
+FEDERATION_PORT = 0  # UDP port for peer nodes (0 = federation off)
+FEDERATION_PEERS = []  # Other nodes as 'host:port', e.g. ['relay-b.example.org:50001']
+FEDERATION_SECRET = ''  # Shared key for the HMAC-SHA256 tag of every message; required, federation stays off without it
+FEDERATION_ADVERTISE_SECONDS = 5.0  # Re-announce local channels; silent peers are forgotten after 3 intervals
+FEDERATION_MAX_AGE_SECONDS = 30.0  # Older messages are dropped as replays (node clocks must be in sync, e.g. NTP)
+
+# Packet capture for replay (benchmarks/replay_capture.py, single worker only)
+# The file contains funk keys in plain text (AUTH packets) and is created with mode 0600
+CAPTURE_PATH = os.environ.get('FUNK_CAPTURE_PATH', '')  # Record all incoming datagrams to this file ('' = off)
+CAPTURE_MAX_BUFFER_BYTES = 8 * 1024 * 1024  # Datagrams waiting for the writer; beyond this they are not recorded
+
+# Logging
+LOG_LEVEL = 'INFO'  # DEBUG, INFO, WARNING, ERROR
+LOG_FORMAT = 'text'  # 'text' (plain messages) or 'json' (one object per line with all fields)
+LOG_RATE_LIMIT_PER_SECOND = 1.0  # Sustained messages per event and client
+LOG_RATE_LIMIT_BURST = 5  # Messages per event and client before rate limiting starts
+LOG_RATE_LIMIT_EVENT_PER_SECOND = 20.0  # Sustained messages per event over all clients (spoofed source floods)
+LOG_RATE_LIMIT_EVENT_BURST = 100  # Messages per event over all clients before that limit starts
+LOG_QUEUE_SIZE = 10000  # Records waiting for the writer thread; further records are dropped and counted
+
+# Funk-Key Cache (AUTH without SQLite lookup)
+AUTH_CACHE_SIZE = 4096  # Max cached funk keys (LRU)
+AUTH_CACHE_TTL_SECONDS = 60  # Lifetime of a valid key's user record
+AUTH_CACHE_NEGATIVE_TTL_SECONDS = 5  # Lifetime of an invalid key entry
+
+# Metrics (/metrics, Prometheus text format)
+METRICS_TALKER_WINDOW_SECONDS = 1.0  # A stream counts as active talker this long after its last packet
+LATENCY_TRACE_ENABLED = False  # Sample ingress-to-egress latency of audio packets (/api/stats/latency)
+LATENCY_TRACE_SAMPLE_EVERY = 50  # Trace every Nth audio packet
+LATENCY_TRACE_SAMPLES = 1024  # Samples kept per channel
+
+# Floor control (half-duplex: one talker per channel, not applied to mixed channels)
+# The floor is only enforced within one process: with UDP_WORKERS > 1 or federation,
+# talkers on different workers/nodes can hold the floor of the same channel at once
+FLOOR_CONTROL = False  # Drop audio of competing talkers while the floor is held
+FLOOR_SILENCE_TIMEOUT_MS = 800  # Floor is freed after this much silence of the holder
+
+# Silence suppression (Opus only, classified from TOC byte and frame length)
+SILENCE_SUPPRESSION = False  # Stop forwarding DTX/comfort-noise frames of a stream after the hangover (opt-in)
+SILENCE_MAX_FRAME_BYTES = 20  # Opus frames up to this size may be silence (speech at 24 kbit/s is ~60 bytes)
+SILENCE_HANGOVER_FRAMES = 15  # Silent frames still forwarded before suppression starts (300 ms)
+
 # Jitter Buffer Settings
 JITTER_BUFFER_SIZE = 5  # Number of packets to buffer (~100ms at 20ms/packet)
-JITTER_MAX_AGE_MS = 200  # Maximum packet age before forced release
+JITTER_MAX_AGE_MS = 200  # Maximum packet age before forced release (scales with the adaptive depth)
+JITTER_ADAPTIVE = True  # Adapt each stream's depth to its measured jitter and reordering
+JITTER_MIN_BUFFER_SIZE = 2  # Lower bound of the adaptive depth (clean LAN streams)
+JITTER_MAX_BUFFER_SIZE = 15  # Upper bound of the adaptive depth (mobile streams)
+JITTER_CUT_THROUGH = True  # Forward in-order packets immediately, buffer only after a sequence gap
+JITTER_CUT_THROUGH_HOLD_MS = 60  # Max time packets wait behind a gap in cut-through mode
+JITTER_PLAYOUT_TIMER = True  # Release held packets on a per-stream timer, not only when the next packet arrives
+JITTER_END_OF_TALK_MS = 60  # Flush a stream's held packets after this much silence (end of PTT)
 
 # Audio Codec Settings
 AUDIO_CODEC = 'opus'  # 'opus' or 'pcm' (RAW)
@@ -13,3 +73,9 @@ OPUS_BITRATE = 24000  # 24 kbit/s (good quality for voice)
 OPUS_FRAME_SIZE = 960  # 20ms at 48kHz sample rate
 OPUS_SAMPLE_RATE = 48000
 OPUS_CHANNELS = 1  # Mono
+
+# Server-side mixing (MCU): listeners get one mixed stream instead of every talker's stream
+MIXING_CHANNELS = []  # Channel IDs to mix, e.g. [41, 42] (empty = forward streams as before)
+MIXING_WORKERS = 0  # Mixer processes, channels are pinned to one each (0 = one per CPU core)
+MIXING_MAX_TALKERS = 4  # Talkers mixed at once per channel
+MIXING_MAX_QUEUE_FRAMES = 3  # Frames queued per talker before the oldest is dropped
@@ -89,6 +89,11 @@ class Database:
                 )
             """)
             
+            # Fan-out bytes saved by silence suppression (column added later)
+            cursor.execute("PRAGMA table_info(traffic_stats)")
+            if 'bytes_suppressed' not in [column[1] for column in cursor.fetchall()]:
+                cursor.execute("ALTER TABLE traffic_stats ADD COLUMN bytes_suppressed INTEGER DEFAULT 0")
+            
             # Initialize default channels if empty
             cursor.execute("SELECT COUNT(*) FROM channels")
             if cursor.fetchone()[0] == 0:
@@ -353,14 +358,14 @@ class Database:
             """)
             return [dict(row) for row in cursor.fetchall()]
     
-    def record_traffic(self, bytes_in, bytes_out):
-        """Record incoming and outgoing traffic"""
+    def record_traffic(self, bytes_in, bytes_out, bytes_suppressed=0):
+        """Record incoming and outgoing traffic, and outgoing traffic saved by silence suppression"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                INSERT INTO traffic_stats (user_id, channel_id, packets_sent, bytes_sent)
-                VALUES (0, 0, ?, ?)
-            """, (bytes_out, bytes_in))
+                INSERT INTO traffic_stats (user_id, channel_id, packets_sent, bytes_sent, bytes_suppressed)
+                VALUES (0, 0, ?, ?, ?)
+            """, (bytes_out, bytes_in, bytes_suppressed))
     
     def get_traffic_summary(self):
         """Get traffic summary for 24h, 7d, and 30d"""
@@ -371,7 +376,8 @@ class Database:
             cursor.execute("""
                 SELECT 
                     COALESCE(SUM(bytes_sent), 0) as bytes_in,
-                    COALESCE(SUM(packets_sent), 0) as bytes_out
+                    COALESCE(SUM(packets_sent), 0) as bytes_out,
+                    COALESCE(SUM(bytes_suppressed), 0) as bytes_suppressed
                 FROM traffic_stats
                 WHERE timestamp >= datetime('now', '-24 hours')
             """)
@@ -381,7 +387,8 @@ class Database:
             cursor.execute("""
                 SELECT 
                     COALESCE(SUM(bytes_sent), 0) as bytes_in,
-                    COALESCE(SUM(packets_sent), 0) as bytes_out
+                    COALESCE(SUM(packets_sent), 0) as bytes_out,
+                    COALESCE(SUM(bytes_suppressed), 0) as bytes_suppressed
                 FROM traffic_stats
                 WHERE timestamp >= datetime('now', '-7 days')
             """)
@@ -391,7 +398,8 @@ class Database:
             cursor.execute("""
                 SELECT 
                     COALESCE(SUM(bytes_sent), 0) as bytes_in,
-                    COALESCE(SUM(packets_sent), 0) as bytes_out
+                    COALESCE(SUM(packets_sent), 0) as bytes_out,
+                    COALESCE(SUM(bytes_suppressed), 0) as bytes_suppressed
                 FROM traffic_stats
                 WHERE timestamp >= datetime('now', '-30 days')
             """)
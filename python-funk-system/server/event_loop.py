@@ -0,0 +1,49 @@
+"""
+Event loop selection for the relay and the API
+
+EVENT_LOOP in config.py (or the FUNK_EVENT_LOOP environment variable)
+selects the loop implementation: 'asyncio' (default selector loop) or
+'uvloop' (libuv based, installed with uvicorn[standard] on Linux/macOS).
+If uvloop is requested but not installed, the asyncio loop is used.
+Worker and shard processes use the same loop as the main process.
+"""
+import asyncio
+import logging
+
+from config import EVENT_LOOP
+from logger import log_event
+
+EVENT_LOOPS = ('asyncio', 'uvloop')
+
+
+def install_event_loop_policy(name=EVENT_LOOP):
+    """
+    Make asyncio create loops of the given implementation
+
+    Returns:
+        Name of the loop implementation actually used
+    """
+    if name not in EVENT_LOOPS:
+        log_event(logging.WARNING, 'event_loop_unknown',
+                  "⚠️ Unknown EVENT_LOOP %r - using the asyncio event loop", name)
+        name = 'asyncio'
+
+    if name == 'uvloop':
+        try:
+            import uvloop
+        except ImportError:
+            log_event(logging.WARNING, 'uvloop_unavailable',
+                      "⚠️ uvloop not installed - using the asyncio event loop")
+            name = 'asyncio'
+        else:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            return name
+
+    asyncio.set_event_loop_policy(None)
+    return name
+
+
+def run(main, name=EVENT_LOOP):
+    """asyncio.run() on the configured event loop"""
+    install_event_loop_policy(name)
+    return asyncio.run(main)
@@ -0,0 +1,265 @@
+"""
+Federation of relay nodes over UDP
+
+Several relays (e.g. one per site or region) share their channels. Every
+node is configured with the same static list of peers and:
+
+- advertises which channels have local listeners (256-bit bitmap), when
+  they change and every FEDERATION_ADVERTISE_SECONDS
+- sends every released audio packet once to each peer that advertised
+  the channel, never to peers without listeners in it
+- fans packets from peers out to its local members only, they are never
+  forwarded again (full mesh, so no loops and no duplicates)
+
+Peers that stop advertising are forgotten after three intervals; peers
+whose name does not resolve yet are retried every interval. Datagrams
+are only accepted from the configured peer addresses and with a
+truncated HMAC-SHA256 tag of the shared FEDERATION_SECRET (required:
+source addresses alone are spoofable).
+Every message carries its send time and a per-node sequence number
+(covered by the tag): messages older than max_age seconds (the nodes'
+clocks must be in sync, e.g. NTP) and sequence numbers a peer already
+used are dropped, so recorded messages can't be replayed.
+
+Message format: '!BBidQ' header (kind, channel_id, exclude_user_id or
+-1, send time, sequence number) followed by the payload.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import socket
+import struct
+import time
+
+from logger import log_event
+from udp_workers import channels_to_bitmap, bitmap_to_channels
+
+FEDERATION_PACKET = 0
+FEDERATION_INTEREST = 1
+_FEDERATION_HEADER = struct.Struct('!BBidQ')
+_NO_EXCLUDE = -1
+TAG_SIZE = 16  # Truncated HMAC-SHA256
+PEER_TIMEOUT_INTERVALS = 3
+REPLAY_WINDOW = 1024  # Sequence numbers below a peer's highest that may still arrive (UDP reordering)
+_REPLAY_MASK = (1 << REPLAY_WINDOW) - 1
+
+
+def parse_peer(peer):
+    """'host:port' -> (host, port)"""
+    host, _, port = peer.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"Invalid federation peer {peer!r}, expected 'host:port'")
+    return host.strip('[]'), int(port)
+
+
+class FederationProtocol(asyncio.DatagramProtocol):
+    """Receives federation messages from peer nodes"""
+
+    def __init__(self, link):
+        self.link = link
+        super().__init__()
+
+    def datagram_received(self, data, addr):
+        self.link.message_received(data, addr)
+
+    def error_received(self, exc):
+        # Peer down (ICMP port unreachable) - it re-advertises when it's back
+        pass
+
+
+class FederationLink:
+    """UDP link between the relay nodes of a federation"""
+
+    def __init__(self, host, port, peers, secret, advertise_interval=5.0, max_age=30.0):
+        if not secret:
+            # Peers are only told apart by their (spoofable) UDP source address otherwise
+            raise ValueError("Federation needs a shared secret (FEDERATION_SECRET)")
+        self.host = host
+        self.port = port
+        self.peers = [parse_peer(peer) for peer in peers]
+        self.secret = secret.encode('utf-8')
+        self.advertise_interval = advertise_interval
+        self.max_age = max_age
+        self.server = None
+        self.transport = None
+        self.peer_addresses = {}  # {resolved (ip, port): 'host:port' as configured}
+        self.unresolved = list(self.peers)  # (host, port) not resolvable yet, retried every interval
+        # Sequence numbers start at the wall clock in ns, so they keep growing over restarts
+        self._sequence = time.time_ns()
+        self._replay = {}  # {peer address: (highest sequence, bitmap of the REPLAY_WINDOW below it)}
+        self.local_channels = frozenset()
+        self.peer_channels = {}  # {peer address: frozenset(channel_ids with listeners there)}
+        self.peer_seen = {}  # {peer address: monotonic time of the last advertisement}
+        self._advertise_task = None
+
+        # Counters
+        self.packets_forwarded = 0  # Packets sent to peers (one per peer and packet)
+        self.bytes_forwarded = 0
+        self.packets_delivered = 0  # Packets from peers fanned out locally
+        self.messages_rejected = 0  # Unknown sender or bad tag
+        self.messages_stale = 0  # Too old or sequence number already seen (replayed)
+
+    async def start(self, server):
+        """Resolve the peers, bind the federation port and announce local channels"""
+        self.server = server
+        loop = asyncio.get_running_loop()
+        await self._resolve_peers()
+
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: FederationProtocol(self),
+            local_addr=(self.host, self.port)
+        )
+        self.advertise(force=True)
+        self._advertise_task = asyncio.create_task(self._advertise_loop())
+
+    async def _resolve_peers(self):
+        """Resolve the peers that have no address yet (DNS may not be up when the node starts)"""
+        loop = asyncio.get_running_loop()
+        for host, port in list(self.unresolved):
+            try:
+                infos = await loop.getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+            except OSError as e:
+                log_event(logging.WARNING, 'federation_peer_unresolved',
+                          "⚠️ Federation peer %s:%s not resolvable: %s - retrying", host, port, e,
+                          rate_key=(host, port), peer=f"{host}:{port}", error=repr(e))
+                continue
+            self.unresolved.remove((host, port))
+            self.peer_addresses[infos[0][4][:2]] = f"{host}:{port}"
+
+    def _header(self, kind, channel_id, exclude):
+        self._sequence += 1
+        return _FEDERATION_HEADER.pack(kind, channel_id, exclude, time.time(), self._sequence)
+
+    def _seal(self, message):
+        return message + hmac.new(self.secret, message, hashlib.sha256).digest()[:TAG_SIZE]
+
+    def _open(self, data):
+        """Message without tag, or None if the tag does not match"""
+        if len(data) < TAG_SIZE:
+            return None
+        message, tag = data[:-TAG_SIZE], data[-TAG_SIZE:]
+        if not hmac.compare_digest(tag, hmac.new(self.secret, message, hashlib.sha256).digest()[:TAG_SIZE]):
+            return None
+        return message
+
+    def relay_packet(self, channel_id, packet, exclude_user_id=None):
+        """Send a packet once to every peer node with listeners in the channel"""
+        message = None
+        for peer, channels in self.peer_channels.items():
+            if channel_id in channels:
+                if message is None:
+                    exclude = _NO_EXCLUDE if exclude_user_id is None else exclude_user_id
+                    message = self._seal(self._header(FEDERATION_PACKET, channel_id, exclude) + packet)
+                self.transport.sendto(message, peer)
+                self.packets_forwarded += 1
+                self.bytes_forwarded += len(message)
+
+    def advertise(self, force=False):
+        """Tell peers which channels have listeners on this node (if changed)"""
+        if self.transport is None:
+            return
+        channels = frozenset(self.server.client_registry.channels)
+        if not force and channels == self.local_channels:
+            return
+        self.local_channels = channels
+        message = self._seal(
+            self._header(FEDERATION_INTEREST, 0, _NO_EXCLUDE) + channels_to_bitmap(channels)
+        )
+        for peer in self.peer_addresses:
+            self.transport.sendto(message, peer)
+
+    async def _advertise_loop(self):
+        """Periodic re-advertisement; forget peers that went silent"""
+        while True:
+            await asyncio.sleep(self.advertise_interval)
+            deadline = time.monotonic() - self.advertise_interval * PEER_TIMEOUT_INTERVALS
+            for peer, seen in list(self.peer_seen.items()):
+                if seen < deadline:
+                    del self.peer_seen[peer]
+                    self.peer_channels.pop(peer, None)
+                    log_event(logging.WARNING, 'federation_peer_lost',
+                              "⚠️ Federation peer %s stopped advertising", self.peer_addresses[peer],
+                              peer=self.peer_addresses[peer])
+            if self.unresolved:
+                await self._resolve_peers()
+            self.advertise(force=True)
+
+    def message_received(self, data, addr):
+        peer = addr[:2]
+        if peer not in self.peer_addresses:
+            self.messages_rejected += 1
+            log_event(logging.WARNING, 'federation_rejected',
+                      "⚠️ Federation message from unknown node %s:%s dropped", addr[0], addr[1],
+                      rate_key=peer, peer=f"{addr[0]}:{addr[1]}")
+            return
+        data = self._open(data)
+        if data is None or len(data) < _FEDERATION_HEADER.size:
+            self.messages_rejected += 1
+            log_event(logging.WARNING, 'federation_rejected',
+                      "⚠️ Invalid federation message from %s dropped", self.peer_addresses[peer],
+                      rate_key=peer, peer=self.peer_addresses[peer])
+            return
+        kind, channel_id, exclude, sent_at, sequence = _FEDERATION_HEADER.unpack_from(data)
+        if abs(time.time() - sent_at) > self.max_age or not self._first_use(peer, sequence):
+            self.messages_stale += 1
+            log_event(logging.WARNING, 'federation_stale',
+                      "⚠️ Stale or replayed federation message from %s dropped", self.peer_addresses[peer],
+                      rate_key=peer, peer=self.peer_addresses[peer])
+            return
+        payload = data[_FEDERATION_HEADER.size:]
+
+        if kind == FEDERATION_PACKET:
+            self.packets_delivered += 1
+            self.server.deliver_relayed(channel_id, payload, None if exclude == _NO_EXCLUDE else exclude)
+        elif kind == FEDERATION_INTEREST:
+            is_new_peer = peer not in self.peer_seen
+            self.peer_channels[peer] = bitmap_to_channels(payload)
+            self.peer_seen[peer] = time.monotonic()
+            if is_new_peer:
+                log_event(logging.INFO, 'federation_peer_joined',
+                          "🌐 Federation peer %s joined", self.peer_addresses[peer], peer=self.peer_addresses[peer])
+                # Peer just (re)started - send our state right away
+                self.advertise(force=True)
+
+    def _first_use(self, peer, sequence):
+        """Record a peer's sequence number; False if it was seen or is too far behind (anti-replay window)"""
+        highest, seen = self._replay.get(peer, (0, 0))
+        if sequence > highest:
+            shift = sequence - highest
+            seen = (seen << shift | 1) & _REPLAY_MASK if shift < REPLAY_WINDOW else 1
+            highest = sequence
+        else:
+            offset = highest - sequence
+            if offset >= REPLAY_WINDOW or seen >> offset & 1:
+                return False
+            seen |= 1 << offset
+        self._replay[peer] = (highest, seen)
+        return True
+
+    def close(self):
+        if self._advertise_task is not None:
+            self._advertise_task.cancel()
+        if self.transport:
+            self.transport.close()
+            self.transport = None
+
+    def get_stats(self):
+        """Get federation statistics for monitoring"""
+        return {
+            "port": self.port,
+            "local_channels": sorted(self.local_channels),
+            "peers": {
+                name: {
+                    "connected": address in self.peer_seen,
+                    "channels": sorted(self.peer_channels.get(address, ()))
+                }
+                for address, name in list(self.peer_addresses.items())
+            },
+            "unresolved_peers": [f"{host}:{port}" for host, port in self.unresolved],
+            "packets_forwarded": self.packets_forwarded,
+            "bytes_forwarded": self.bytes_forwarded,
+            "packets_delivered": self.packets_delivered,
+            "messages_rejected": self.messages_rejected,
+            "messages_stale": self.messages_stale
+        }
@@ -0,0 +1,98 @@
+"""
+Server-side floor control: one active talker per channel
+
+The first talker of an idle channel gets the floor; audio of other
+talkers is dropped until the holder releases it (PTT released) or has
+been silent for the timeout. Half-duplex radio semantics are enforced
+by the relay instead of being simulated by every client.
+"""
+
+# Results of FloorControl.request()
+HOLDER = 0  # Sender already holds the floor
+GRANTED = 1  # Sender got the idle floor (announce FLOOR_TAKEN)
+DENIED = 2  # Floor is held by someone else (first denial of this talker, send FLOOR_DENIED)
+DENIED_AGAIN = 3  # Floor is held by someone else, talker was already told
+
+
+class FloorControl:
+    """Floor holder per channel (event loop thread only)"""
+
+    def __init__(self, timeout_seconds=0.8):
+        self.timeout = timeout_seconds
+        self.floors = {}  # {channel_id: [holder_address, holder_user_id, last_audio, denied_addresses]}
+
+        # Counters
+        self.grants = 0
+        self.releases = 0  # Explicit FLOOR_RELEASE by the holder
+        self.timeouts = 0  # Floors freed because the holder went silent
+        self.denied_packets = 0
+
+    def request(self, channel_id, address, user_id, now):
+        """
+        Check an audio packet against the channel's floor
+        
+        Returns:
+            HOLDER, GRANTED, DENIED or DENIED_AGAIN
+        """
+        floor = self.floors.get(channel_id)
+        if floor is not None:
+            if floor[0] == address:
+                floor[2] = now
+                return HOLDER
+            if now - floor[2] < self.timeout:
+                self.denied_packets += 1
+                denied = floor[3]
+                if address in denied:
+                    return DENIED_AGAIN
+                denied.add(address)
+                return DENIED
+            self.timeouts += 1
+
+        self.floors[channel_id] = [address, user_id, now, set()]
+        self.grants += 1
+        return GRANTED
+
+    def holder(self, channel_id):
+        """(address, user_id) of the floor holder, or None"""
+        floor = self.floors.get(channel_id)
+        return (floor[0], floor[1]) if floor is not None else None
+
+    def release(self, channel_id, address):
+        """
+        Give up the floor (FLOOR_RELEASE from the holder)
+        
+        Returns:
+            True if address held the floor, which is now idle
+        """
+        floor = self.floors.get(channel_id)
+        if floor is None or floor[0] != address:
+            return False
+        del self.floors[channel_id]
+        self.releases += 1
+        return True
+
+    def expire(self, now):
+        """
+        Free floors whose holder has been silent for the timeout
+        
+        Returns:
+            List of channel IDs whose floor became idle
+        """
+        idle = [channel_id for channel_id, floor in self.floors.items() if now - floor[2] >= self.timeout]
+        for channel_id in idle:
+            del self.floors[channel_id]
+        self.timeouts += len(idle)
+        return idle
+
+    def get_stats(self):
+        """Get floor control statistics for monitoring"""
+        return {
+            "timeout_ms": round(self.timeout * 1000),
+            "held_floors": {
+                channel_id: f"{floor[0][0]}:{floor[0][1]}" for channel_id, floor in list(self.floors.items())
+            },
+            "grants": self.grants,
+            "releases": self.releases,
+            "timeouts": self.timeouts,
+            "denied_packets": self.denied_packets
+        }
@@ -1,34 +1,109 @@
-from collections import deque
+import logging
+import math
 import time
+from collections import deque
+
+from logger import log_event
+
+
+SEQUENCE_MODULO = 65536
+HALF_SEQUENCE_RANGE = SEQUENCE_MODULO // 2
+
+# Adaptive depth
+ADAPT_INTERVAL_PACKETS = 50  # Re-evaluate depth every ~1s of audio
+ADAPT_HISTORY_LENGTH = 20  # Depth changes kept per stream
+JITTER_DEPTH_FACTOR = 4  # Depth covers this many times the mean jitter (RFC 3550 estimate)
+TALK_SPURT_GAP = 0.5  # Seconds of silence after which arrival timing is re-based
 
 
 class JitterBuffer:
     """
     Jitter Buffer for audio packet reordering
-    
+
     Solves UDP out-of-order packet delivery problem:
     - Buffers incoming packets
     - Sorts by sequence number
     - Releases packets in correct order
     - Handles sequence number wraparound (0-65535)
-    
+
+    Implemented as a fixed-size ring indexed by sequence number modulo
+    capacity, so insert and release are O(1) and nothing is ever sorted.
+    Events are counted instead of printed (see get_stats).
+
+    With min_size < max_size the depth adapts per stream: the inter-arrival
+    jitter (RFC 3550 estimator against the nominal frame interval) and the
+    reorder displacement are measured on every packet, and every
+    ADAPT_INTERVAL_PACKETS the depth grows at once to what the stream needs
+    or shrinks by one step. max_age scales with the depth.
+
+    Cut-through: pass_through() accepts the next expected packet without
+    storing it while nothing is held, so clean streams bypass the ring.
+    max_hold_ms caps how long packets wait behind a gap in that mode.
+
     Trade-off: Adds ~50-100ms latency for stable audio playback
     """
-    
-    def __init__(self, buffer_size=5, max_age_ms=200):
+
+    def __init__(self, buffer_size=5, max_age_ms=200, min_size=None, max_size=None, frame_ms=20,
+                 max_hold_ms=None, name=None):
         """
         Initialize jitter buffer
         
         Args:
             buffer_size: Number of packets to buffer (5 = ~100ms at 20ms/packet)
             max_age_ms: Maximum age of packet before forced release (prevents stalling)
+            min_size: Lower bound for the adaptive depth (default: buffer_size, fixed depth)
+            max_size: Upper bound for the adaptive depth (default: buffer_size, fixed depth)
+            frame_ms: Nominal audio duration of one packet, used for jitter measurement
+            max_hold_ms: Upper bound for max_age regardless of depth (cut-through hold window)
+            name: Stream label for log messages (also their rate-limit key)
         """
-        self.buffer_size = buffer_size
-        self.max_age_ms = max_age_ms
-        self.buffer = {}  # {sequence_number: (data, timestamp)}
+        self.name = name
+        self.min_size = max(1, min_size if min_size is not None else buffer_size)
+        self.max_size = max(self.min_size, max_size if max_size is not None else buffer_size)
+        self.adaptive = self.min_size < self.max_size
+        self.frame = frame_ms / 1000.0
+        self.max_hold = max_hold_ms / 1000.0 if max_hold_ms is not None else None
+        self._age_per_packet = max_age_ms / 1000.0 / max(1, buffer_size)
+        self._set_depth(min(max(buffer_size, self.min_size), self.max_size))
+        
+        # Ring is sized for the largest depth, so resizing never moves packets
+        capacity = 1
+        while capacity < self.max_size * 2:
+            capacity <<= 1
+        self.capacity = capacity
+        self._mask = capacity - 1
+        
+        self._slots = [None] * capacity  # Packet data by seq & mask
+        self._arrival = [0.0] * capacity  # time.monotonic() of arrival
+        self.held = 0  # Packets waiting in the ring
         self.next_sequence = None  # Next expected sequence number
-        self.ready_queue = deque()  # Ordered packets ready for delivery
-    
+        self.ready_queue = []  # Ordered packets ready for delivery
+        self.ready_arrivals = []  # Arrival time of each packet in ready_queue
+        self._waiting_since = None  # Arrival of the oldest packet held behind a gap
+        self._late_streak = 0  # Consecutive late packets, signals a restarted sender
+        self.last_arrival = None  # time.monotonic() of the most recent packet
+        
+        # Counters
+        self.packets_in = 0
+        self.packets_released = 0
+        self.packets_cut_through = 0  # Released by pass_through() without buffering
+        self.packets_late = 0  # Arrived after their slot was already released/skipped
+        self.packets_duplicate = 0
+        self.packets_skipped = 0  # Sequence numbers given up on (lost or too late)
+        self.force_releases = 0  # Gaps skipped because of max_age
+        self.overflow_releases = 0  # Gaps skipped because the window was full
+        
+        # Adaptation state
+        self.jitter = 0.0  # Smoothed inter-arrival jitter in seconds
+        self.reorder_rate = 0.0  # Share of reordered packets in the last interval
+        self.depth_history = deque(maxlen=ADAPT_HISTORY_LENGTH)
+        self._highest_seq = None  # Highest sequence number seen, with its arrival time
+        self._highest_arrival = 0.0
+        self._interval_packets = 0
+        self._interval_reordered = 0
+        self._interval_displacement = 0  # Largest reorder distance in the interval
+        self._interval_late = 0
+
     def add_packet(self, sequence_number, data):
         """
         Add packet to jitter buffer
@@ -37,18 +112,84 @@ class JitterBuffer:
             sequence_number: Packet sequence number (0-65535, wraps around)
             data: Raw packet data
         """
-        timestamp = time.time()
+        now = time.monotonic()
+        self.packets_in += 1
+        if self.adaptive:
+            self._measure(sequence_number, now)
+        self.last_arrival = now
         
         # Initialize next_sequence on first packet
         if self.next_sequence is None:
             self.next_sequence = sequence_number
         
-        # Store packet with timestamp
-        self.buffer[sequence_number] = (data, timestamp)
+        offset = (sequence_number - self.next_sequence) % SEQUENCE_MODULO
+        if offset >= HALF_SEQUENCE_RANGE:
+            # Behind the head: its slot has already been released or skipped
+            self.packets_late += 1
+            self._late_streak += 1
+            if self._late_streak <= self.window:
+                return
+            # Sender restarted its sequence - resync on this packet
+            log_event(logging.WARNING, 'jitter_resync', "🔄 Jitter buffer %s: resync at sequence %s",
+                      self.name, sequence_number, rate_key=self.name, stream=self.name)
+            self.flush()
+            self.next_sequence = sequence_number
+            offset = 0
+        self._late_streak = 0
+        
+        if offset >= self.window:
+            # Too far ahead - give up on the oldest gaps to make room
+            self.overflow_releases += 1
+            log_event(logging.DEBUG, 'jitter_overflow', "⚠️ Jitter buffer %s overflow: jumped to sequence %s",
+                      self.name, sequence_number, rate_key=self.name, stream=self.name)
+            self._advance_head((sequence_number - self.window + 1) % SEQUENCE_MODULO)
+        
+        index = sequence_number & self._mask
+        if self._slots[index] is not None:
+            self.packets_duplicate += 1
+            return
+        self._slots[index] = data
+        self._arrival[index] = now
+        self.held += 1
+        
+        if index == self.next_sequence & self._mask:
+            self._release_in_order()
+            if self.held:
+                # A gap was filled, later gaps may hold younger packets
+                self._update_waiting_since()
+        elif self._waiting_since is None:
+            self._waiting_since = now
+        
+        # Force-release old packets to prevent buffer stalling
+        self.release_expired(now)
+
+    def pass_through(self, sequence_number):
+        """
+        Accept the next expected packet without buffering it (cut-through)
+        
+        Args:
+            sequence_number: Packet sequence number (0-65535, wraps around)
+        
+        Returns:
+            True if the caller may forward the packet immediately, False if
+            a gap is pending and the packet must go through add_packet()
+        """
+        if self.held or self.ready_queue:
+            return False
+        if self.next_sequence is not None and sequence_number != self.next_sequence:
+            return False
         
-        # Try to release ordered packets
-        self._process_buffer()
-    
+        now = time.monotonic()
+        self.packets_in += 1
+        if self.adaptive:
+            self._measure(sequence_number, now)
+        self.last_arrival = now
+        self._late_streak = 0
+        self.next_sequence = (sequence_number + 1) % SEQUENCE_MODULO
+        self.packets_released += 1
+        self.packets_cut_through += 1
+        return True
+
     def get_ready_packets(self):
         """
         Get packets ready for forwarding (in correct order)
@@ -56,74 +197,217 @@ class JitterBuffer:
         Returns:
             List of packet data ready to send
         """
-        ready = list(self.ready_queue)
-        self.ready_queue.clear()
+        ready = self.ready_queue
+        self.ready_queue = []
+        self.ready_arrivals = []
         return ready
-    
-    def _process_buffer(self):
-        """Process buffer and move ordered packets to ready queue"""
-        current_time = time.time()
-        
-        while True:
-            # Check if next expected packet is available
-            if self.next_sequence in self.buffer:
-                data, timestamp = self.buffer.pop(self.next_sequence)
-                self.ready_queue.append(data)
-                self.next_sequence = self._increment_sequence(self.next_sequence)
+
+    def pop_ready(self):
+        """
+        Get packets ready for forwarding together with their arrival times
+        
+        Returns:
+            (packets, arrivals): arrivals[i] is the time.monotonic() at
+            which packets[i] was added, for latency measurement
+        """
+        ready, arrivals = self.ready_queue, self.ready_arrivals
+        self.ready_queue = []
+        self.ready_arrivals = []
+        return ready, arrivals
+
+    def release_expired(self, now=None):
+        """
+        Skip gaps whose waiting packets are older than max_age_ms
+        
+        Returns:
+            True if packets were moved to the ready queue
+        """
+        if self._waiting_since is None:
+            return False
+        if now is None:
+            now = time.monotonic()
+        if now - self._waiting_since <= self.max_age:
+            return False
+        
+        released_before = self.packets_released
+        skipped_before = self.packets_skipped
+        while self._waiting_since is not None and now - self._waiting_since > self.max_age:
+            self.force_releases += 1
+            self._skip_gap()
+        log_event(logging.DEBUG, 'jitter_force_release',
+                  "⚠️ Jitter buffer %s: force-released after %.0f ms, %s packets skipped",
+                  self.name, self.max_age_ms, self.packets_skipped - skipped_before,
+                  rate_key=self.name, stream=self.name)
+        return self.packets_released != released_before
+
+    def next_deadline(self):
+        """Monotonic time at which release_expired() will release packets, or None"""
+        if self._waiting_since is None:
+            return None
+        return self._waiting_since + self.max_age
+
+    def flush(self):
+        """Release everything still held, in sequence order (e.g. end of talk)"""
+        while self.held:
+            self._skip_gap()
+
+    def _measure(self, sequence_number, now):
+        """Update jitter/reorder measurement and re-evaluate the depth periodically"""
+        if self._highest_seq is None or now - self._highest_arrival > TALK_SPURT_GAP:
+            # First packet of a talk spurt: nothing to compare against
+            self._highest_seq = sequence_number
+            self._highest_arrival = now
+        else:
+            distance = (sequence_number - self._highest_seq) % SEQUENCE_MODULO
+            if distance == 0:
+                pass
+            elif distance < HALF_SEQUENCE_RANGE:
+                # Arrival spacing vs. send spacing of the skipped frames
+                deviation = abs((now - self._highest_arrival) - distance * self.frame)
+                self.jitter += (deviation - self.jitter) / 16
+                self._highest_seq = sequence_number
+                self._highest_arrival = now
             else:
-                # Next packet not available yet
-                break
+                # Overtaken by a later packet
+                displacement = SEQUENCE_MODULO - distance
+                self._interval_reordered += 1
+                if displacement > self._interval_displacement:
+                    self._interval_displacement = displacement
         
-        # Force-release old packets to prevent buffer stalling
-        self._release_old_packets(current_time)
-        
-        # Prevent buffer overflow
-        self._trim_buffer()
-    
-    def _release_old_packets(self, current_time):
-        """Force release packets that are too old (prevents stalling)"""
-        old_packets = []
-        
-        for seq, (data, timestamp) in self.buffer.items():
-            age_ms = (current_time - timestamp) * 1000
-            if age_ms > self.max_age_ms:
-                old_packets.append((seq, data))
-        
-        if old_packets:
-            # Sort by sequence number and release
-            old_packets.sort(key=lambda x: x[0])
-            for seq, data in old_packets:
-                self.ready_queue.append(data)
-                del self.buffer[seq]
-                print(f"⚠️ Jitter buffer: Force-released old packet {seq} (age: {self.max_age_ms}ms)")
-            
-            # Update next_sequence to after released packets
-            if old_packets:
-                self.next_sequence = self._increment_sequence(old_packets[-1][0])
-    
-    def _trim_buffer(self):
-        """Prevent buffer overflow by releasing oldest packets"""
-        if len(self.buffer) > self.buffer_size * 2:
-            # Buffer is too full - release oldest packets
-            sorted_packets = sorted(self.buffer.items(), key=lambda x: x[1][1])  # Sort by timestamp
-            
-            excess_count = len(self.buffer) - self.buffer_size
-            for i in range(excess_count):
-                seq, (data, _) = sorted_packets[i]
+        self._interval_packets += 1
+        if self._interval_packets >= ADAPT_INTERVAL_PACKETS:
+            self._adapt()
+
+    def _adapt(self):
+        """Grow the depth at once to the measured need, shrink it one step at a time"""
+        late = self.packets_late - self._interval_late
+        self.reorder_rate = self._interval_reordered / self._interval_packets
+        
+        target = math.ceil(JITTER_DEPTH_FACTOR * self.jitter / self.frame) + self._interval_displacement
+        if late:
+            # Packets arrived after their slot was given up: the buffer was too shallow
+            target = max(target, self.buffer_size + 1)
+        target = min(max(target, self.min_size), self.max_size)
+        
+        if target > self.buffer_size:
+            new_size = target
+        elif target < self.buffer_size:
+            new_size = self.buffer_size - 1
+        else:
+            new_size = self.buffer_size
+        
+        if new_size != self.buffer_size:
+            self.depth_history.append({
+                "time": time.time(),
+                "from": self.buffer_size,
+                "to": new_size,
+                "jitter_ms": round(self.jitter * 1000, 2),
+                "reorder_rate": round(self.reorder_rate, 4),
+                "late": late
+            })
+            self._set_depth(new_size)
+        
+        self._interval_packets = 0
+        self._interval_reordered = 0
+        self._interval_displacement = 0
+        self._interval_late = self.packets_late
+
+    def _set_depth(self, buffer_size):
+        """Apply a depth: reorder window and max age follow it"""
+        self.buffer_size = buffer_size
+        # Reorder window: packets further ahead than this push the head forward
+        self.window = max(1, buffer_size * 2)
+        self.max_age = self._age_per_packet * buffer_size
+        if self.max_hold is not None and self.max_age > self.max_hold:
+            self.max_age = self.max_hold
+        self.max_age_ms = self.max_age * 1000
+
+    def _release_in_order(self):
+        """Move the contiguous run starting at next_sequence to the ready queue"""
+        slots = self._slots
+        mask = self._mask
+        seq = self.next_sequence
+        data = slots[seq & mask]
+        while data is not None:
+            slots[seq & mask] = None
+            self.ready_queue.append(data)
+            self.ready_arrivals.append(self._arrival[seq & mask])
+            self.held -= 1
+            self.packets_released += 1
+            seq = (seq + 1) % SEQUENCE_MODULO
+            data = slots[seq & mask]
+        self.next_sequence = seq
+        if not self.held:
+            self._waiting_since = None
+
+    def _skip_gap(self):
+        """Give up on the missing packets at the head and release the next run"""
+        slots = self._slots
+        mask = self._mask
+        seq = self.next_sequence
+        for _ in range(self.capacity):
+            if slots[seq & mask] is not None:
+                break
+            seq = (seq + 1) % SEQUENCE_MODULO
+            self.packets_skipped += 1
+        self.next_sequence = seq
+        self._release_in_order()
+        self._update_waiting_since()
+
+    def _advance_head(self, new_head):
+        """Release or skip everything before new_head"""
+        distance = (new_head - self.next_sequence) % SEQUENCE_MODULO
+        if distance >= self.capacity:
+            # Everything held lies before new_head
+            self.flush()
+            self.packets_skipped += (new_head - self.next_sequence) % SEQUENCE_MODULO
+            self.next_sequence = new_head
+            self._waiting_since = None
+            return
+        while self.next_sequence != new_head:
+            index = self.next_sequence & self._mask
+            data = self._slots[index]
+            if data is None:
+                self.packets_skipped += 1
+            else:
+                self._slots[index] = None
                 self.ready_queue.append(data)
-                del self.buffer[seq]
-            
-            print(f"⚠️ Jitter buffer overflow: Released {excess_count} packets")
-    
-    def _increment_sequence(self, seq):
-        """Increment sequence number with wraparound (0-65535)"""
-        return (seq + 1) % 65536
-    
+                self.ready_arrivals.append(self._arrival[index])
+                self.held -= 1
+                self.packets_released += 1
+            self.next_sequence = (self.next_sequence + 1) % SEQUENCE_MODULO
+        self._release_in_order()
+        self._update_waiting_since()
+
+    def _update_waiting_since(self):
+        """Recompute arrival time of the oldest held packet (bounded by capacity)"""
+        if not self.held:
+            self._waiting_since = None
+            return
+        self._waiting_since = min(
+            self._arrival[i] for i in range(self.capacity) if self._slots[i] is not None
+        )
+
     def get_stats(self):
         """Get buffer statistics for monitoring"""
         return {
-            "buffer_size": len(self.buffer),
+            "buffer_size": self.held,
             "ready_queue_size": len(self.ready_queue),
             "next_sequence": self.next_sequence,
-            "max_buffer_size": self.buffer_size
+            "max_buffer_size": self.buffer_size,
+            "depth": self.buffer_size,
+            "min_depth": self.min_size,
+            "max_depth": self.max_size,
+            "adaptive": self.adaptive,
+            "max_age_ms": round(self.max_age_ms, 1),
+            "jitter_ms": round(self.jitter * 1000, 2),
+            "reorder_rate": round(self.reorder_rate, 4),
+            "packets_in": self.packets_in,
+            "packets_released": self.packets_released,
+            "packets_cut_through": self.packets_cut_through,
+            "packets_late": self.packets_late,
+            "packets_duplicate": self.packets_duplicate,
+            "packets_skipped": self.packets_skipped,
+            "force_releases": self.force_releases,
+            "overflow_releases": self.overflow_releases
         }
@@ -0,0 +1,94 @@
+"""
+Sampled ingress-to-egress latency tracing for forwarded audio
+
+Every Nth audio packet is timestamped when it is received, when it
+leaves the jitter buffer and when the last sendto of its fan-out
+returned. The last samples are kept per channel, so the admin API can
+show percentiles split into buffering time and send time.
+"""
+from collections import deque
+
+PERCENTILES = (50, 95, 99)
+
+
+def _percentile(ordered, pct):
+    """Nearest-rank percentile of a sorted list"""
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class LatencyTracer:
+    """
+    Per-channel ring buffers of latency samples
+    
+    Only touched from the event loop thread; get_stats() copies the
+    rings, so it may also be called from API handlers.
+    """
+
+    def __init__(self, sample_every=50, max_samples=1024):
+        self.sample_every = max(1, sample_every)
+        self.max_samples = max_samples
+        self.channels = {}  # {channel_id: deque of (buffering, send, total, fanout)}
+        self.held = {}  # {(channel_id, client_addr): (sequence_number, received_at)} sampled packets in a jitter buffer
+        self._countdown = self.sample_every
+        self.samples_taken = 0
+
+    def should_sample(self):
+        """Count an audio packet; True for every sample_every-th one"""
+        self._countdown -= 1
+        if self._countdown:
+            return False
+        self._countdown = self.sample_every
+        return True
+
+    def hold(self, buffer_key, sequence_number, received_at):
+        """
+        Remember a sampled packet that went into the jitter buffer
+        
+        Replaces an older pending sample of the stream (e.g. a packet the
+        buffer discarded as late or duplicate, which is never released).
+        """
+        self.held[buffer_key] = (sequence_number, received_at)
+
+    def discard(self, buffer_key):
+        """Forget the pending sample of a stream whose jitter buffer was dropped"""
+        self.held.pop(buffer_key, None)
+
+    def record(self, channel_id, received_at, released_at, sent_at, fanout):
+        """
+        Store a sample (times from time.perf_counter())
+        
+        Args:
+            received_at: Packet was received (datagram_received)
+            released_at: Packet left the jitter buffer (cut-through: forwarding started)
+            sent_at: Last sendto of the fan-out returned
+            fanout: Number of recipients
+        """
+        ring = self.channels.get(channel_id)
+        if ring is None:
+            ring = self.channels[channel_id] = deque(maxlen=self.max_samples)
+        ring.append((released_at - received_at, sent_at - released_at, sent_at - received_at, fanout))
+        self.samples_taken += 1
+
+    def get_stats(self):
+        """Percentiles in milliseconds per channel, over the samples in the ring"""
+        channels = {}
+        for channel_id, ring in list(self.channels.items()):
+            samples = list(ring)
+            if not samples:
+                continue
+            stats = {"samples": len(samples)}
+            for index, name in enumerate(("buffering", "send", "total")):
+                ordered = sorted(sample[index] for sample in samples)
+                stats[name] = {
+                    f"p{pct}_ms": round(_percentile(ordered, pct) * 1000, 3) for pct in PERCENTILES
+                }
+                stats[name]["max_ms"] = round(ordered[-1] * 1000, 3)
+            stats["avg_fanout"] = round(sum(sample[3] for sample in samples) / len(samples), 1)
+            channels[channel_id] = stats
+        return {
+            "sample_every": self.sample_every,
+            "max_samples": self.max_samples,
+            "samples_taken": self.samples_taken,
+            "pending": len(self.held),
+            "channels": channels
+        }
@@ -0,0 +1,243 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import time
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener
+from threading import Lock
+
+from config import (LOG_LEVEL, LOG_FORMAT, LOG_RATE_LIMIT_PER_SECOND, LOG_RATE_LIMIT_BURST,
+                    LOG_RATE_LIMIT_EVENT_PER_SECOND, LOG_RATE_LIMIT_EVENT_BURST, LOG_QUEUE_SIZE)
+
+LOGGER_NAME = 'DFG-Funk-Server'
+MAX_RATE_KEYS = 10000  # Bounds memory when spoofed sources produce many distinct keys
+
+_listener = None
+
+
+class RecordQueueHandler(QueueHandler):
+    """
+    Enqueues records as they are; formatting happens on the listener thread
+
+    The queue is bounded: when the writer thread falls behind, records
+    are dropped and counted instead of blocking the caller.
+    """
+
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if getattr(record, 'event', None) == 'log_queue_full':
+                self.dropped += record.fields['dropped']  # Summary dropped too, report it next time
+            else:
+                self.dropped += 1
+
+    def take_dropped(self):
+        """Return and reset the number of dropped records"""
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class RecordQueueListener(QueueListener):
+    """QueueListener whose stop() waits for room in the bounded queue"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats records with the structured fields passed to log_event
+
+    'text': the message, plus a note on suppressed similar messages
+    'json': one JSON object per line with all fields (log collectors)
+    """
+
+    def __init__(self, fmt='text'):
+        super().__init__()
+        self.fmt = fmt
+
+    def format(self, record):
+        event = getattr(record, 'event', None)
+        fields = getattr(record, 'fields', None) or {}
+        message = record.getMessage()
+        if self.fmt == 'json':
+            entry = {
+                'time': round(record.created, 3),
+                'level': record.levelname,
+                'event': event,
+                'message': message
+            }
+            entry.update(fields)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        if fields.get('suppressed') and event != 'log_suppressed':
+            message += f" (+{fields['suppressed']} ähnliche Meldungen unterdrückt)"
+        return message
+
+
+class RateLimiter:
+    """
+    Token bucket per key (e.g. event + client address)
+
+    Suppressed messages are counted per key and reported with the next
+    message that gets through, or by flush() once the key went quiet.
+    """
+
+    def __init__(self, rate=1.0, burst=5, max_keys=MAX_RATE_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # {key: [tokens, last_refill, suppressed]}
+        self.lock = Lock()
+
+    def check(self, key, now=None):
+        """
+        Take a token for key
+
+        Returns:
+            (allowed, suppressed): suppressed is the number of messages
+            dropped for this key since the last one that got through
+        """
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [self.burst, now, 0]
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False, 0
+            bucket[0] -= 1
+            suppressed = bucket[2]
+            bucket[2] = 0
+            return True, suppressed
+
+    def flush(self, now=None):
+        """
+        Collect suppressed counts of keys that went quiet and forget idle keys
+
+        Returns:
+            List of (key, suppressed) with suppressed > 0
+        """
+        if now is None:
+            now = time.monotonic()
+        idle_after = self.burst / self.rate if self.rate > 0 else 0
+        summaries = []
+        with self.lock:
+            for key in list(self.buckets):
+                tokens, last, suppressed = self.buckets[key]
+                if now - last < idle_after:
+                    continue
+                if suppressed:
+                    summaries.append((key, suppressed))
+                del self.buckets[key]
+        return summaries
+
+
+_logger = logging.getLogger(LOGGER_NAME)
+_rate_limiter = RateLimiter(LOG_RATE_LIMIT_PER_SECOND, LOG_RATE_LIMIT_BURST)
+# Cap per event over all keys: every new (spoofed) source address gets a fresh burst above
+_event_limiter = RateLimiter(LOG_RATE_LIMIT_EVENT_PER_SECOND, LOG_RATE_LIMIT_EVENT_BURST)
+_queue_handler = None
+
+
+def setup_logger():
+    """
+    Setup the server logger (once)
+
+    Records are put on a queue by the calling thread; a QueueListener
+    thread formats them and writes to stdout, so console I/O never
+    blocks the event loop.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _logger
+
+    _logger.setLevel(getattr(logging, str(LOG_LEVEL).upper(), logging.INFO))
+    _logger.propagate = False
+    _logger.handlers.clear()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(StructuredFormatter(LOG_FORMAT))
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _queue_handler = RecordQueueHandler(log_queue)
+    _logger.addHandler(_queue_handler)
+    _listener = RecordQueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(stop_logger)
+    return _logger
+
+
+def stop_logger():
+    """Flush suppressed summaries and write out all queued records"""
+    global _listener
+    if _listener is None:
+        return
+    flush_suppressed()
+    _listener.stop()
+    _listener = None
+
+
+def log_event(level, event, message, *args, rate_key=None, **fields):
+    """
+    Log a structured event
+
+    Args:
+        level: logging level (e.g. logging.WARNING)
+        event: Short machine-readable event name (e.g. 'unauthenticated_packet')
+        message: Human readable message, %-style with *args (formatted only
+            if the message is actually written, on the listener thread)
+        rate_key: If given, messages are rate limited per (event, rate_key),
+            e.g. the client address, and per event over all keys; dropped
+            messages are summarized later
+        **fields: Structured fields (client=..., channel_id=...)
+    """
+    if not _logger.isEnabledFor(level):
+        return
+    if rate_key is not None:
+        allowed, suppressed = _rate_limiter.check((event, rate_key))
+        if not allowed:
+            return
+        allowed, event_suppressed = _event_limiter.check(event)
+        if not allowed:
+            return
+        suppressed += event_suppressed
+        if suppressed:
+            fields['suppressed'] = suppressed
+    _logger.log(level, message, *args, extra={'event': event, 'fields': fields})
+
+
+def flush_suppressed():
+    """Log a 'suppressed N similar messages' summary per key that went quiet"""
+    for (event, rate_key), suppressed in _rate_limiter.flush():
+        log_event(logging.INFO, 'log_suppressed',
+                  f"⏸️ {suppressed} ähnliche Meldungen unterdrückt ({event})",
+                  suppressed_event=event, key=rate_key, suppressed=suppressed)
+    for event, suppressed in _event_limiter.flush():
+        log_event(logging.INFO, 'log_suppressed',
+                  f"⏸️ {suppressed} ähnliche Meldungen unterdrückt ({event}, alle Clients)",
+                  suppressed_event=event, key=None, suppressed=suppressed)
+    dropped = _queue_handler.take_dropped() if _queue_handler is not None else 0
+    if dropped:
+        log_event(logging.WARNING, 'log_queue_full',
+                  f"⚠️ {dropped} Logmeldungen verworfen (Log-Queue voll)", dropped=dropped)
+
+
+setup_logger()
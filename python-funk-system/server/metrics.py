@@ -0,0 +1,146 @@
+"""
+In-memory metrics registry with Prometheus text exposition
+
+Counters, gauges and fixed-bucket histograms keyed by a tuple of label
+values. Updating a metric is a dict update on the event loop thread -
+no locks, no per-sample allocation - so it is cheap enough for the
+packet path. render() produces the text format served at /metrics.
+"""
+from bisect import bisect_left
+
+# Fan-out: recipients per forwarded packet
+FANOUT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Ingress-to-egress latency in seconds (50 us .. 500 ms)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+
+
+def _format_labels(labelnames, labels, extra=None):
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, labels)]
+    if extra is not None:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+class Counter:
+    """Monotonic counter per label tuple"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.values = {}  # {label_values: count}
+
+    def inc(self, labels=(), amount=1):
+        values = self.values
+        values[labels] = values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Gauge:
+    """
+    Current value per label tuple
+
+    With `function` the values are computed at render time (the function
+    returns {label_values: value}), so nothing is tracked per packet.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=(), function=None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.function = function
+        self.values = {}
+
+    def set(self, value, labels=()):
+        self.values[labels] = value
+
+    def samples(self):
+        values = self.function() if self.function is not None else self.values
+        for labels, value in values.items():
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Fixed-bucket histogram per label tuple (cumulative only when rendered)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # {label_values: [bucket_counts (+Inf last), sum]}
+
+    def observe(self, value, labels=()):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def observe_many(self, value, count, labels=()):
+        """Record the same value `count` times (e.g. one latency per recipient)"""
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0]
+        entry[0][bisect_left(self.buckets, value)] += count
+        entry[1] += value * count
+
+    def samples(self):
+        bounds = self.buckets + (float('inf'),)
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield self.name + '_bucket', _format_labels(self.labelnames, labels, le), cumulative
+            plain = _format_labels(self.labelnames, labels)
+            yield self.name + '_sum', plain, total
+            yield self.name + '_count', plain, cumulative
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=(), function=None):
+        return self._register(Gauge(name, help_text, labelnames, function))
+
+    def histogram(self, name, help_text, buckets, labelnames=()):
+        return self._register(Histogram(name, help_text, buckets, labelnames))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,320 @@
+"""
+Server-side mixing (MCU mode) for multi-talker channels
+
+In a mixed channel the relay no longer forwards every talker's stream.
+Once per frame it takes one frame from each active talker, decodes
+them, mixes them with NumPy and sends each listener a single encoded
+stream - talkers get the mix minus their own voice. Listeners that are
+not talking share one encoder, so a tick costs one decode per talker
+and one encode per talker plus one.
+
+Decoding/encoding runs in a pool of mixer processes. Each channel is
+pinned to one process, which keeps the channel's Opus coder state.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from config import (AUDIO_CODEC, OPUS_BITRATE, OPUS_FRAME_SIZE, OPUS_SAMPLE_RATE,
+                    MIXING_WORKERS, MIXING_MAX_TALKERS, MIXING_MAX_QUEUE_FRAMES)
+from logger import log_event
+from protocol import build_packet, HEADER_SIZE
+
+try:
+    import opuslib
+    OPUS_AVAILABLE = True
+except Exception:  # ImportError, or libopus itself missing
+    opuslib = None
+    OPUS_AVAILABLE = False
+
+MIXER_USER_ID = 0  # Sender ID of mixed packets
+CODER_IDLE_TICKS = 50  # Forget decoders/encoders unused for this many ticks (1 s)
+
+_channel_mixers = {}  # {channel_id: ChannelMixer}, per mixer process
+
+
+class ChannelMixer:
+    """Opus decoder per talker and encoder per mixed stream of one channel"""
+
+    def __init__(self, codec=AUDIO_CODEC, frame_size=OPUS_FRAME_SIZE,
+                 sample_rate=OPUS_SAMPLE_RATE, bitrate=OPUS_BITRATE):
+        self.use_opus = codec == 'opus'
+        self.frame_size = frame_size
+        self.sample_rate = sample_rate
+        self.bitrate = bitrate
+        self.decoders = {}  # {talker: opuslib.Decoder}
+        self.encoders = {}  # {talker or None (everyone else): opuslib.Encoder}
+        self.last_used = {}  # {('dec'|'enc', key): tick}
+        self.tick = 0
+
+    def decode(self, talker, payload):
+        """
+        Decode a frame to int32 samples (PCM passthrough without Opus)
+        
+        A frame that fails to decode is concealed by the decoder (an empty
+        payload is a lost packet to libopus) or replaced with silence - it
+        must never be mixed in as raw samples.
+        """
+        self.last_used[('dec', talker)] = self.tick
+        pcm = payload
+        if self.use_opus:
+            decoder = self.decoders.get(talker)
+            if decoder is None:
+                decoder = self.decoders[talker] = opuslib.Decoder(self.sample_rate, 1)
+            try:
+                pcm = decoder.decode(payload, self.frame_size)
+            except Exception:
+                try:
+                    pcm = decoder.decode(b'', self.frame_size)  # Packet loss concealment
+                except Exception:
+                    return np.zeros(self.frame_size, np.int32)
+        samples = np.frombuffer(pcm[:len(pcm) & ~1], dtype=np.int16)
+        if len(samples) != self.frame_size:
+            samples = np.resize(samples, self.frame_size) if len(samples) else np.zeros(self.frame_size, np.int16)
+        return samples.astype(np.int32)
+
+    def encode(self, stream, samples):
+        """Clip int32 samples and encode them for a stream"""
+        self.last_used[('enc', stream)] = self.tick
+        pcm = np.clip(samples, -32768, 32767).astype(np.int16).tobytes()
+        if not self.use_opus:
+            return pcm
+        encoder = self.encoders.get(stream)
+        if encoder is None:
+            encoder = self.encoders[stream] = opuslib.Encoder(self.sample_rate, 1, opuslib.APPLICATION_VOIP)
+            encoder.bitrate = self.bitrate
+        return encoder.encode(pcm, self.frame_size)
+
+    def mix(self, frames, listening_talkers):
+        """
+        Mix one frame per talker
+        
+        Args:
+            frames: List of (talker, payload)
+            listening_talkers: Talkers that are also listeners of the channel
+        
+        Returns:
+            {None: mix for everyone else, talker: mix minus that talker}
+        """
+        self.tick += 1
+        decoded = [(talker, self.decode(talker, payload)) for talker, payload in frames]
+        total = decoded[0][1].copy()
+        for _, samples in decoded[1:]:
+            total += samples
+
+        outputs = {None: self.encode(None, total)}
+        for talker, samples in decoded:
+            if talker in listening_talkers:
+                outputs[talker] = self.encode(talker, total - samples)
+
+        if self.tick % CODER_IDLE_TICKS == 0:
+            self._prune()
+        return outputs
+
+    def _prune(self):
+        """Drop coders of talkers that stopped talking"""
+        for (kind, key), tick in list(self.last_used.items()):
+            if self.tick - tick >= CODER_IDLE_TICKS and key is not None:
+                del self.last_used[(kind, key)]
+                (self.decoders if kind == 'dec' else self.encoders).pop(key, None)
+
+
+def mix_frames(channel_id, frames, listening_talkers):
+    """Mixer process entry point: mix one tick of a channel"""
+    mixer = _channel_mixers.get(channel_id)
+    if mixer is None:
+        mixer = _channel_mixers[channel_id] = ChannelMixer()
+    return mixer.mix(frames, listening_talkers)
+
+
+class MixingRelay:
+    """
+    Collects the in-order audio of mixed channels and sends the mixes
+    
+    Runs on the server's event loop; only mix_frames runs in the pool.
+    """
+
+    def __init__(self, server, channels, workers=MIXING_WORKERS, max_talkers=MIXING_MAX_TALKERS,
+                 max_queue_frames=MIXING_MAX_QUEUE_FRAMES, frame_ms=OPUS_FRAME_SIZE * 1000 / OPUS_SAMPLE_RATE):
+        self.server = server
+        self.channels = set(channels)
+        # A channel is pinned to one pool, so pools beyond the channel count would stay idle
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(self.channels)))
+        self.max_talkers = max_talkers
+        self.max_queue_frames = max_queue_frames
+        self.frame = frame_ms / 1000.0
+        self.pending = {}  # {channel_id: {talker: deque of payloads}}
+        self.sequence = {}  # {channel_id: sequence number of the mixed stream}
+        self.executors = []  # One single-process pool per worker, see _executor_for()
+        self._in_flight = set()  # Channels whose previous tick is still being mixed
+        self._tasks = set()
+        self._tick_task = None
+
+        # Counters
+        self.ticks = 0
+        self.frames_in = 0
+        self.frames_dropped = 0  # Oldest frames dropped because the mixer fell behind
+        self.mixes = 0
+        self.passthroughs = 0  # Ticks with a single talker, forwarded without mixing
+        self.ticks_skipped = 0  # Ticks of a channel whose previous mix was still running
+        self.mix_time = 0.0  # Wall time of mix_frames calls
+
+    def start(self):
+        """
+        Start the mixer pool and tick loop
+        
+        Returns:
+            False if mixing is not possible (Opus codec without opuslib)
+        """
+        if AUDIO_CODEC == 'opus' and not OPUS_AVAILABLE:
+            log_event(logging.WARNING, 'mixing_disabled',
+                      "⚠️ opuslib not available - mixing disabled for channels %s", sorted(self.channels))
+            return False
+
+        if multiprocessing.current_process().daemon:
+            # Relay workers are daemon processes and may not have children; opuslib and
+            # NumPy release the GIL, so threads still use several cores
+            self.executors = [ThreadPoolExecutor(max_workers=1) for _ in range(self.workers)]
+        else:
+            ctx = multiprocessing.get_context("spawn")
+            self.executors = [ProcessPoolExecutor(max_workers=1, mp_context=ctx) for _ in range(self.workers)]
+
+        self._tick_task = asyncio.create_task(self._tick_loop())
+        log_event(logging.INFO, 'mixing_started',
+                  f"🎚️ Mixing channels {sorted(self.channels)} with {self.workers} mixer workers ({AUDIO_CODEC})")
+        return True
+
+    def stop(self):
+        if self._tick_task is not None:
+            self._tick_task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        for executor in self.executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.executors = []
+
+    def submit(self, channel_id, talker, packet):
+        """Queue an in-order audio packet of a talker for the next tick"""
+        talkers = self.pending.get(channel_id)
+        if talkers is None:
+            talkers = self.pending[channel_id] = {}
+        queue = talkers.get(talker)
+        if queue is None:
+            queue = talkers[talker] = deque()
+        if len(queue) >= self.max_queue_frames:
+            queue.popleft()
+            self.frames_dropped += 1
+        queue.append(packet[HEADER_SIZE:])
+        self.frames_in += 1
+
+    async def _tick_loop(self):
+        """Mix every channel once per frame"""
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.frame
+            delay = next_tick - time.monotonic()
+            if delay < -self.frame:
+                next_tick = time.monotonic()  # Fell behind: don't try to catch up
+            await asyncio.sleep(max(0.0, delay))
+            self._tick()
+
+    def _tick(self):
+        self.ticks += 1
+        for channel_id, talkers in list(self.pending.items()):
+            if channel_id in self._in_flight:
+                self.ticks_skipped += 1
+                continue
+
+            frames = []
+            for talker in list(talkers):
+                queue = talkers[talker]
+                if len(frames) < self.max_talkers:
+                    frames.append((talker, queue.popleft()))
+                if not queue:
+                    del talkers[talker]
+            if not talkers:
+                del self.pending[channel_id]
+            if not frames:
+                continue
+
+            if len(frames) == 1:
+                self.passthroughs += 1
+                self._send_mix(channel_id, {None: frames[0][1]}, frames[0][0])
+                continue
+
+            self._in_flight.add(channel_id)
+            task = asyncio.create_task(self._mix(channel_id, frames))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _mix(self, channel_id, frames):
+        try:
+            listeners = self.server.client_registry.get_clients_in_channel(channel_id)
+            listening_talkers = [talker for talker, _ in frames if talker in listeners]
+            started = time.perf_counter()
+            outputs = await asyncio.get_running_loop().run_in_executor(
+                self._executor_for(channel_id), mix_frames, channel_id, frames, listening_talkers
+            )
+            self.mix_time += time.perf_counter() - started
+            self.mixes += 1
+            self._send_mix(channel_id, outputs)
+        except Exception as e:
+            log_event(logging.ERROR, 'mixing_error', "❌ Mixing channel %s failed: %s", channel_id, e,
+                      rate_key=channel_id, channel_id=channel_id, error=repr(e))
+        finally:
+            self._in_flight.discard(channel_id)
+
+    def _executor_for(self, channel_id):
+        """A channel always uses the same mixer process (it holds the coder state)"""
+        return self.executors[channel_id % len(self.executors)]
+
+    def _send_mix(self, channel_id, outputs, exclude=None):
+        """
+        Send each listener its mix
+        
+        Args:
+            outputs: {None: mix for everyone, talker: mix minus the talker}
+            exclude: Listener that gets nothing (the only talker of a passthrough tick)
+        """
+        server = self.server
+        if not server.running:
+            return
+        sequence_number = self.sequence.get(channel_id, 0)
+        self.sequence[channel_id] = (sequence_number + 1) % 65536
+
+        # Listeners of the same stream get the same packet: one batch send per stream
+        batches = {}
+        for recipient in server.client_registry.get_clients_in_channel(channel_id):
+            if recipient == exclude:
+                continue
+            stream = recipient if recipient in outputs else None
+            batches.setdefault(stream, []).append(recipient)
+
+        labels = (channel_id,)
+        for stream, recipients in batches.items():
+            packet = build_packet(channel_id, MIXER_USER_ID, sequence_number, outputs[stream])
+            server._send_packet_to_many(packet, recipients)
+            server.metric_packets_out.inc(labels, len(recipients))
+            server.metric_bytes_out.inc(labels, len(packet) * len(recipients))
+
+    def get_stats(self):
+        """Get mixer statistics for monitoring"""
+        return {
+            "channels": sorted(self.channels),
+            "workers": self.workers,
+            "codec": AUDIO_CODEC,
+            "active_channels": len(self.pending),
+            "ticks": self.ticks,
+            "frames_in": self.frames_in,
+            "frames_dropped": self.frames_dropped,
+            "mixes": self.mixes,
+            "passthroughs": self.passthroughs,
+            "ticks_skipped": self.ticks_skipped,
+            "avg_mix_ms": round(self.mix_time / self.mixes * 1000, 3) if self.mixes else 0.0
+        }
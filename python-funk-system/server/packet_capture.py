@@ -0,0 +1,171 @@
+"""
+Capture of incoming relay datagrams for replay
+
+With CAPTURE_PATH set, AsyncUDPServer appends every received datagram
+to an in-memory buffer before handling it; a background task writes the
+buffer to the capture file in a worker thread every flush interval, so
+the receive path never waits for the disk. When more than
+max_buffer_bytes are pending (disk too slow), datagrams are counted as
+dropped instead of being buffered.
+
+Captures contain credentials: AUTH datagrams carry the funk key in
+plain text (the replay needs them to re-authenticate the sessions).
+The file is created with mode 0600; store and delete it like a copy of
+the user database.
+
+File format (little endian):
+
+    header:  b'FUNKCAP' + version byte, '<dd' wall-clock and monotonic
+             time when the capture started
+    record:  '<dBHH' monotonic receive time, address family (4 or 6),
+             source port, datagram length; then the packed source
+             address (4 or 16 bytes) and the datagram itself
+
+benchmarks/replay_capture.py feeds a capture back into a relay.
+"""
+import asyncio
+import logging
+import os
+import socket
+import struct
+import time
+
+from logger import log_event
+
+MAGIC = b'FUNKCAP'
+VERSION = 1
+_FILE_HEADER = struct.Struct('<dd')
+_RECORD = struct.Struct('<dBHH')
+_FAMILIES = {4: socket.AF_INET, 6: socket.AF_INET6}
+_ADDRESS_SIZES = {4: 4, 6: 16}
+
+
+def pack_address(address):
+    """(host, port[, flowinfo, scope_id]) -> (family 4/6, port, packed host)"""
+    host, port = address[0], address[1]
+    if ':' in host:
+        return 6, port, socket.inet_pton(socket.AF_INET6, host)
+    return 4, port, socket.inet_pton(socket.AF_INET, host)
+
+
+class PacketCapture:
+    """Buffered writer of a capture file, flushed from a background task"""
+
+    def __init__(self, path, max_buffer_bytes=8 * 1024 * 1024, flush_interval=0.5):
+        self.path = path
+        self.max_buffer_bytes = max_buffer_bytes
+        self.flush_interval = flush_interval
+        self._buffer = bytearray()
+        self._file = None
+        self._task = None
+        self._stopping = None
+        self._addresses = {}  # {source address: packed record address}, hosts repeat for every datagram
+
+        # Counters
+        self.packets = 0
+        self.bytes_written = 0
+        self.dropped = 0
+
+    def start(self):
+        """Open the capture file and start the writer task (on the running loop)"""
+        # Owner-only: the capture contains funk keys (AUTH payloads)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.fchmod(fd, 0o600)  # O_CREAT keeps the mode of an existing file
+        self._file = os.fdopen(fd, 'wb')
+        self._file.write(MAGIC + bytes([VERSION]) + _FILE_HEADER.pack(time.time(), time.monotonic()))
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._writer_loop())
+
+    def record(self, data, address):
+        """Append one received datagram (called inline from handle_packet)"""
+        if len(self._buffer) > self.max_buffer_bytes:
+            self.dropped += 1
+            return
+        packed = self._addresses.get(address)
+        if packed is None:
+            if len(self._addresses) > 65536:
+                self._addresses.clear()
+            packed = self._addresses[address] = pack_address(address)
+        family, port, host = packed
+        self._buffer += _RECORD.pack(time.monotonic(), family, port, len(data))
+        self._buffer += host
+        self._buffer += data
+        self.packets += 1
+
+    async def _writer_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            stopping = self._stopping.is_set()
+            try:
+                await self._flush()
+            except OSError as e:
+                log_event(logging.ERROR, 'capture_write_failed',
+                          "❌ Packet capture to %s failed: %s - capture stopped", self.path, e, error=repr(e))
+                self.max_buffer_bytes = -1  # Count everything as dropped from now on
+                self._buffer = bytearray()
+                return
+            if stopping:
+                return  # Flushed once more after close() was requested
+
+    async def _flush(self):
+        if not self._buffer:
+            return
+        chunk, self._buffer = self._buffer, bytearray()
+        await asyncio.to_thread(self._file.write, chunk)
+        self.bytes_written += len(chunk)
+
+    async def close(self):
+        """Write what is still buffered and close the file"""
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+        await asyncio.to_thread(self._file.close)
+        log_event(logging.INFO, 'capture_closed',
+                  "💾 Packet capture %s closed (%d datagrams, %d dropped)", self.path, self.packets, self.dropped)
+
+    def get_stats(self):
+        return {
+            'path': self.path,
+            'packets': self.packets,
+            'bytes_written': self.bytes_written,
+            'bytes_buffered': len(self._buffer),
+            'dropped_buffer_full': self.dropped,
+        }
+
+
+def read_capture(path):
+    """
+    Read a capture file
+
+    Returns:
+        (wall-clock start time, iterator of (monotonic time, (host, port), datagram))
+    """
+    f = open(path, 'rb')
+    header = f.read(len(MAGIC) + 1 + _FILE_HEADER.size)
+    if len(header) < len(MAGIC) + 1 + _FILE_HEADER.size or not header.startswith(MAGIC):
+        f.close()
+        raise ValueError(f"{path} is not a funk packet capture")
+    if header[len(MAGIC)] != VERSION:
+        f.close()
+        raise ValueError(f"{path}: unsupported capture version {header[len(MAGIC)]}")
+    started_at, _ = _FILE_HEADER.unpack_from(header, len(MAGIC) + 1)
+
+    def records():
+        with f:
+            while True:
+                head = f.read(_RECORD.size)
+                if len(head) < _RECORD.size:
+                    return  # End of file (or a record cut off by a crash)
+                timestamp, family, port, length = _RECORD.unpack(head)
+                host = f.read(_ADDRESS_SIZES[family])
+                data = f.read(length)
+                if len(data) < length:
+                    return
+                yield timestamp, (socket.inet_ntop(_FAMILIES[family], host), port), data
+
+    return started_at, records()
@@ -1,14 +1,30 @@
 """
 Combined server that runs both UDP server and REST API
+
+AsyncUDPServer and the FastAPI app share a single asyncio event loop,
+so the API can call into the relay without crossing thread boundaries.
 """
-import threading
-from config import SERVER_HOST, SERVER_PORT, TIMEOUT_SECONDS
+import asyncio
+import shutil
+import tempfile
+import event_loop
+from config import (SERVER_HOST, SERVER_PORT, TIMEOUT_SECONDS, UDP_WORKERS, FEDERATION_PORT,
+                    FEDERATION_PEERS, FEDERATION_SECRET, FEDERATION_ADVERTISE_SECONDS,
+                    FEDERATION_MAX_AGE_SECONDS, CHANNEL_SHARDS, CHANNEL_SHARD_RING_BYTES, CAPTURE_PATH,
+                    CAPTURE_MAX_BUFFER_BYTES, FLOOR_CONTROL)
 from client_registry import ClientRegistry
-from udp_server import UDPServer
-from api_server import start_api_server, set_udp_server
+from async_udp_server import AsyncUDPServer
+from api_server import serve_api_server, set_udp_server
+from udp_workers import WorkerRelay, start_udp_workers, stop_udp_workers
+from federation import FederationLink
+from channel_shards import ChannelShards
+from packet_capture import PacketCapture
+
+API_HOST = "0.0.0.0"
+API_PORT = 8000
 
 
-def main():
+async def main():
     print("=" * 60)
     print("🎙️  Starting Python Funk System Server")
     print("=" * 60)
@@ -16,50 +32,79 @@ def main():
     # Initialize UDP server
     print("\n[1/2] Initializing UDP server...")
     client_registry = ClientRegistry(TIMEOUT_SECONDS)
-    udp_server = UDPServer(SERVER_HOST, SERVER_PORT, client_registry)
-    udp_server.start()
-    
-    # Start UDP threads
-    receive_thread = threading.Thread(target=udp_server.receive_and_forward, daemon=True)
-    receive_thread.start()
-    print(f"✅ UDP Server running on {SERVER_HOST}:{SERVER_PORT}")
-    
-    cleanup_thread = threading.Thread(target=udp_server.cleanup_stale_clients, daemon=True)
-    cleanup_thread.start()
-    print(f"✅ Cleanup thread started (timeout: {TIMEOUT_SECONDS}s)")
+    worker_processes = []
+    worker_dir = None
+    if UDP_WORKERS > 1:
+        if FEDERATION_PORT:
+            print("⚠️  Federation needs UDP_WORKERS = 1 - federation disabled")
+        if CHANNEL_SHARDS:
+            print("⚠️  Channel shards need UDP_WORKERS = 1 - channel shards disabled")
+        if CAPTURE_PATH:
+            print("⚠️  Packet capture needs UDP_WORKERS = 1 - capture disabled")
+        if FLOOR_CONTROL:
+            print("⚠️  Floor control is per worker - talkers on different workers are not arbitrated")
+        # Worker 0 runs here next to the API, workers 1..N-1 in own processes
+        worker_dir = tempfile.mkdtemp(prefix="funk-workers-")
+        udp_server = AsyncUDPServer(SERVER_HOST, SERVER_PORT, client_registry, reuse_port=True)
+        udp_server.worker_relay = WorkerRelay(0, UDP_WORKERS, worker_dir)
+        await udp_server.start()
+        worker_processes = start_udp_workers(UDP_WORKERS, worker_dir, SERVER_HOST, SERVER_PORT)
+    else:
+        udp_server = AsyncUDPServer(SERVER_HOST, SERVER_PORT, client_registry)
+        if FEDERATION_PORT and not FEDERATION_SECRET:
+            print("❌ FEDERATION_SECRET is not set - federation disabled (peers would be unauthenticated)")
+        elif FEDERATION_PORT:
+            udp_server.federation = FederationLink(SERVER_HOST, FEDERATION_PORT, FEDERATION_PEERS,
+                                                   FEDERATION_SECRET, FEDERATION_ADVERTISE_SECONDS,
+                                                   FEDERATION_MAX_AGE_SECONDS)
+            if FLOOR_CONTROL:
+                print("⚠️  Floor control is per node - talkers on different nodes are not arbitrated")
+        if CHANNEL_SHARDS and udp_server.federation is not None:
+            print("⚠️  Channel shards don't forward to federation peers - channel shards disabled")
+        elif CHANNEL_SHARDS:
+            udp_server.channel_shards = ChannelShards(CHANNEL_SHARDS, CHANNEL_SHARD_RING_BYTES)
+        if CAPTURE_PATH:
+            udp_server.capture = PacketCapture(CAPTURE_PATH, CAPTURE_MAX_BUFFER_BYTES)
+        await udp_server.start()
+    print(f"✅ UDP Server running on {SERVER_HOST}:{SERVER_PORT} ({UDP_WORKERS} worker(s))")
+    if udp_server.channel_shards is not None:
+        print(f"✅ Channels dispatched to {CHANNEL_SHARDS} shard process(es)")
+    if udp_server.capture is not None:
+        print(f"✅ Recording incoming datagrams to {CAPTURE_PATH}")
+    print(f"✅ Cleanup task started (timeout: {TIMEOUT_SECONDS}s)")
+    print(f"✅ Event loop: {type(asyncio.get_running_loop()).__module__.split('.')[0]}")
     
     # Set UDP server reference for API
     set_udp_server(udp_server)
     
-    # Start API server in separate thread
     print("\n[2/2] Starting REST API server...")
-    api_thread = threading.Thread(
-        target=start_api_server,
-        kwargs={"host": "0.0.0.0", "port": 8000},
-        daemon=True
-    )
-    api_thread.start()
-    print("✅ REST API running on http://0.0.0.0:8000")
-    
     print("\n" + "=" * 60)
     print("🟢 Server is ready!")
     print("=" * 60)
     print("\n📋 Available services:")
     print(f"   • UDP Server:     {SERVER_HOST}:{SERVER_PORT}")
-    print(f"   • REST API:       http://localhost:8000")
-    print(f"   • Admin Web UI:   http://localhost:8000")
-    print(f"   • API Docs:       http://localhost:8000/docs")
-    print(f"   • Health Check:   http://localhost:8000/health")
+    if udp_server.federation is not None:
+        print(f"   • Federation:     {SERVER_HOST}:{FEDERATION_PORT} ({len(FEDERATION_PEERS)} peer(s))")
+    print(f"   • REST API:       http://localhost:{API_PORT}")
+    print(f"   • Admin Web UI:   http://localhost:{API_PORT}")
+    print(f"   • API Docs:       http://localhost:{API_PORT}/docs")
+    print(f"   • Health Check:   http://localhost:{API_PORT}/health")
     print("\n💡 Press Ctrl+C to stop the server\n")
     
     try:
-        while True:
-            threading.Event().wait(1)
-    except KeyboardInterrupt:
+        # Runs until uvicorn receives SIGINT/SIGTERM
+        await serve_api_server(host=API_HOST, port=API_PORT)
+    finally:
         print("\n\n🛑 Shutting down server...")
-        udp_server.stop()
+        stop_udp_workers(worker_processes)
+        await udp_server.stop()
+        if worker_dir:
+            shutil.rmtree(worker_dir, ignore_errors=True)
         print("✅ Server stopped. Goodbye!")
 
 
 if __name__ == '__main__':
-    main()
+    try:
+        event_loop.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -1,4 +1,5 @@
 import asyncio
+import event_loop
 from config import SERVER_HOST, SERVER_PORT, TIMEOUT_SECONDS
 from client_registry import ClientRegistry
 from async_udp_server import AsyncUDPServer
@@ -25,4 +26,4 @@ async def main():
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    event_loop.run(main())
@@ -0,0 +1,357 @@
+"""
+Batched UDP I/O with recvmmsg/sendmmsg (Linux only)
+
+Provides a datagram transport that drains the socket with a single
+recvmmsg call per readiness event and flushes queued sends with
+sendmmsg, so a fan-out round to N recipients costs one syscall
+instead of N. The transport mimics the parts of
+asyncio.DatagramTransport that AsyncUDPServer uses (sendto, close,
+get_extra_info), so the server code stays the same for both backends.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import socket
+import struct
+import sys
+
+MSG_DONTWAIT = 0x40
+SOCKADDR_MAX_LEN = 28  # sizeof(struct sockaddr_in6)
+SOCKADDR_CACHE_LIMIT = 4096
+FANOUT_CACHE_LIMIT = 1024
+
+
+class iovec(ctypes.Structure):
+    _fields_ = [
+        ("iov_base", ctypes.c_void_p),
+        ("iov_len", ctypes.c_size_t),
+    ]
+
+
+class msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_hdr", msghdr),
+        ("msg_len", ctypes.c_uint),
+    ]
+
+
+def _load_libc():
+    """Load libc and check for recvmmsg/sendmmsg, None if unavailable"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint,
+                                  ctypes.c_int, ctypes.c_void_p]
+        libc.recvmmsg.restype = ctypes.c_int
+        libc.sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint,
+                                  ctypes.c_int]
+        libc.sendmmsg.restype = ctypes.c_int
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _load_libc()
+
+# Per-message fields written with pack_into: much cheaper than ctypes attribute access
+_IOV_FIELDS = struct.Struct("@PN")  # iov_base, iov_len
+_NAME_FIELDS = struct.Struct("@PI")  # msg_name, msg_namelen (start of mmsghdr)
+_IOV_SIZE = ctypes.sizeof(iovec)
+_MMSG_SIZE = ctypes.sizeof(mmsghdr)
+
+
+def is_available():
+    """True if recvmmsg/sendmmsg can be used on this platform"""
+    return _libc is not None
+
+
+def _encode_sockaddr(family, addr):
+    """Build a raw sockaddr for (host, port) as used by sendmmsg"""
+    host, port = addr[0], addr[1]
+    if family == socket.AF_INET6:
+        raw = (socket.AF_INET6.to_bytes(2, sys.byteorder) + port.to_bytes(2, "big")
+               + bytes(4) + socket.inet_pton(socket.AF_INET6, host) + bytes(4))
+    else:
+        raw = (socket.AF_INET.to_bytes(2, sys.byteorder) + port.to_bytes(2, "big")
+               + socket.inet_aton(host) + bytes(8))
+    return ctypes.create_string_buffer(raw, len(raw))
+
+
+def _decode_sockaddr(raw):
+    """Parse a raw sockaddr written by recvmmsg into (host, port)"""
+    family = int.from_bytes(raw[0:2], sys.byteorder)
+    port = int.from_bytes(raw[2:4], "big")
+    if family == socket.AF_INET6:
+        return (socket.inet_ntop(socket.AF_INET6, raw[8:24]), port, 0, 0)
+    return (socket.inet_ntoa(raw[4:8]), port)
+
+
+class BatchedUDPTransport:
+    """Datagram transport backed by recvmmsg/sendmmsg"""
+
+    def __init__(self, loop, sock, protocol, batch_size, max_packet_size):
+        self._loop = loop
+        self._sock = sock
+        self._fd = sock.fileno()
+        self._family = sock.family
+        self._protocol = protocol
+        self._batch_size = batch_size
+        self._closing = False
+
+        # Preallocated receive slots: one buffer, iovec and sockaddr per message
+        self._recv_bufs = [ctypes.create_string_buffer(max_packet_size) for _ in range(batch_size)]
+        self._recv_names = [ctypes.create_string_buffer(SOCKADDR_MAX_LEN) for _ in range(batch_size)]
+        self._recv_iovs = (iovec * batch_size)()
+        self._recv_msgs = (mmsghdr * batch_size)()
+        for i in range(batch_size):
+            self._recv_iovs[i].iov_base = ctypes.addressof(self._recv_bufs[i])
+            self._recv_iovs[i].iov_len = max_packet_size
+            hdr = self._recv_msgs[i].msg_hdr
+            hdr.msg_iov = ctypes.pointer(self._recv_iovs[i])
+            hdr.msg_iovlen = 1
+            hdr.msg_name = ctypes.addressof(self._recv_names[i])
+            hdr.msg_namelen = SOCKADDR_MAX_LEN
+
+        # Send side: queued (data, addr) pairs flushed with sendmmsg
+        self._send_queue = []
+        self._send_iovs = (iovec * batch_size)()
+        self._send_msgs = (mmsghdr * batch_size)()
+        for i in range(batch_size):
+            hdr = self._send_msgs[i].msg_hdr
+            hdr.msg_iov = ctypes.pointer(self._send_iovs[i])
+            hdr.msg_iovlen = 1
+        self._sockaddr_cache = {}
+        self._peer_cache = {}  # raw sockaddr bytes -> (host, port)
+        self._fanout_cache = {}  # recipients tuple -> prepared mmsghdr array
+        self._fanout_iov = iovec()  # Shared by all messages of a fan-out round
+        self._flush_scheduled = False
+        self._writer_registered = False
+
+        loop.add_reader(self._fd, self._on_readable)
+
+    def get_extra_info(self, name, default=None):
+        if name == "socket":
+            return self._sock
+        if name == "sockname":
+            return self._sock.getsockname()
+        return default
+
+    def is_closing(self):
+        return self._closing
+
+    def sendto(self, data, addr):
+        """Queue a datagram; it is sent with the next sendmmsg flush"""
+        if self._closing:
+            return
+        self._send_queue.append((bytes(data), addr))
+        if len(self._send_queue) >= self._batch_size:
+            self.flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._loop.call_soon(self._scheduled_flush)
+
+    def sendto_many(self, data, addrs):
+        """
+        Send the same datagram to many recipients with sendmmsg
+        
+        The mmsghdr array for a recipient tuple is built once and reused,
+        all messages point at one shared iovec, so a fan-out round costs
+        O(1) Python work regardless of the number of recipients.
+        """
+        if self._closing or not addrs:
+            return
+        # Keep ordering with datagrams queued through sendto()
+        self.flush()
+        if self._send_queue:
+            for addr in addrs:
+                self._send_queue.append((data, addr))
+            return
+
+        key = addrs if type(addrs) is tuple else tuple(addrs)
+        prepared = self._fanout_cache.get(key)
+        if prepared is None:
+            prepared = self._prepare_fanout(key)
+
+        data = bytes(data)
+        self._fanout_iov.iov_base = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p)
+        self._fanout_iov.iov_len = len(data)
+
+        total = len(key)
+        offset = 0
+        while offset < total:
+            sent = _libc.sendmmsg(self._fd, prepared[1] + offset * _MMSG_SIZE,
+                                  total - offset, 0)
+            if sent < 0:
+                err = ctypes.get_errno()
+                if err == errno.EINTR:
+                    continue
+                if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    # Hand the rest to the queued path, which waits for writability
+                    for addr in key[offset:]:
+                        self._send_queue.append((data, addr))
+                    self.flush()
+                    return
+                self._protocol.error_received(OSError(err, os.strerror(err)))
+                sent = 1
+            offset += sent
+
+    def _prepare_fanout(self, key):
+        """Build a reusable mmsghdr array for a recipient tuple"""
+        if len(self._fanout_cache) >= FANOUT_CACHE_LIMIT:
+            self._fanout_cache.clear()
+        msgs = (mmsghdr * len(key))()
+        sockaddrs = []
+        iov_ptr = ctypes.pointer(self._fanout_iov)
+        for i, addr in enumerate(key):
+            entry = self._sockaddr(addr)
+            sockaddrs.append(entry)
+            hdr = msgs[i].msg_hdr
+            hdr.msg_name = entry[1]
+            hdr.msg_namelen = entry[2]
+            hdr.msg_iov = iov_ptr
+            hdr.msg_iovlen = 1
+        # sockaddrs keeps the name buffers alive even if the address cache is cleared
+        prepared = (msgs, ctypes.addressof(msgs), sockaddrs)
+        self._fanout_cache[key] = prepared
+        return prepared
+
+    def close(self):
+        if self._closing:
+            return
+        self.flush()
+        self._closing = True
+        self._loop.remove_reader(self._fd)
+        if self._writer_registered:
+            self._loop.remove_writer(self._fd)
+        self._sock.close()
+        self._loop.call_soon(self._protocol.connection_lost, None)
+
+    def _on_readable(self):
+        """Drain the socket in batches, then flush the resulting fan-out"""
+        while not self._closing:
+            count = _libc.recvmmsg(self._fd, ctypes.addressof(self._recv_msgs), self._batch_size,
+                                   MSG_DONTWAIT, None)
+            if count < 0:
+                err = ctypes.get_errno()
+                if err not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    self._protocol.error_received(OSError(err, os.strerror(err)))
+                break
+
+            for i in range(count):
+                msg = self._recv_msgs[i]
+                data = ctypes.string_at(self._recv_bufs[i], msg.msg_len)
+                raw_name = ctypes.string_at(self._recv_names[i], msg.msg_hdr.msg_namelen)
+                addr = self._peer_cache.get(raw_name)
+                if addr is None:
+                    if len(self._peer_cache) >= SOCKADDR_CACHE_LIMIT:
+                        self._peer_cache.clear()
+                    addr = _decode_sockaddr(raw_name)
+                    self._peer_cache[raw_name] = addr
+                # recvmmsg overwrites msg_namelen, reset it for the next call
+                msg.msg_hdr.msg_namelen = SOCKADDR_MAX_LEN
+                self._protocol.datagram_received(data, addr)
+
+            if count < self._batch_size:
+                break
+
+        self.flush()
+
+    def _scheduled_flush(self):
+        self._flush_scheduled = False
+        self.flush()
+
+    def _sockaddr(self, addr):
+        """Return (buffer, address, length) of the cached raw sockaddr for addr"""
+        entry = self._sockaddr_cache.get(addr)
+        if entry is None:
+            if len(self._sockaddr_cache) >= SOCKADDR_CACHE_LIMIT:
+                self._sockaddr_cache.clear()
+            sockaddr = _encode_sockaddr(self._family, addr)
+            entry = (sockaddr, ctypes.addressof(sockaddr), len(sockaddr))
+            self._sockaddr_cache[addr] = entry
+        return entry
+
+    def flush(self):
+        """Send all queued datagrams with as few sendmmsg calls as possible"""
+        queue = self._send_queue
+        iovs = self._send_iovs
+        msgs = self._send_msgs
+        while queue and not self._closing:
+            chunk = queue[:self._batch_size]
+            sockaddrs = []  # Keeps the sockaddr buffers alive until sendmmsg returns
+            last_data = None
+            data_ptr = None
+            for i, (data, addr) in enumerate(chunk):
+                # Fan-out queues the same bytes object for every recipient
+                if data is not last_data:
+                    # bytes are immutable, c_char_p points at their buffer without copying
+                    data_ptr = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p).value
+                    last_data = data
+                entry = self._sockaddr(addr)
+                sockaddrs.append(entry)
+                _IOV_FIELDS.pack_into(iovs, i * _IOV_SIZE, data_ptr, len(data))
+                _NAME_FIELDS.pack_into(msgs, i * _MMSG_SIZE, entry[1], entry[2])
+
+            sent = _libc.sendmmsg(self._fd, ctypes.addressof(msgs), len(chunk), 0)
+            if sent < 0:
+                err = ctypes.get_errno()
+                if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    # Socket buffer full - retry once writable
+                    if not self._writer_registered:
+                        self._writer_registered = True
+                        self._loop.add_writer(self._fd, self._on_writable)
+                    return
+                if err != errno.EINTR:
+                    # First message failed (e.g. unreachable) - report and skip it
+                    self._protocol.error_received(OSError(err, os.strerror(err)))
+                    del queue[0]
+                continue
+            del queue[:sent]
+
+    def _on_writable(self):
+        self._loop.remove_writer(self._fd)
+        self._writer_registered = False
+        self.flush()
+
+
+async def create_batched_datagram_endpoint(loop, protocol_factory, local_addr,
+                                           batch_size=64, max_packet_size=8192,
+                                           reuse_port=False):
+    """
+    Counterpart of loop.create_datagram_endpoint using BatchedUDPTransport
+
+    Returns:
+        (transport, protocol) tuple
+    """
+    if not is_available():
+        raise OSError("recvmmsg/sendmmsg not available on this platform")
+
+    family = socket.AF_INET6 if ":" in local_addr[0] else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        sock.setblocking(False)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(local_addr)
+    except OSError:
+        sock.close()
+        raise
+
+    protocol = protocol_factory()
+    transport = BatchedUDPTransport(loop, sock, protocol, batch_size, max_packet_size)
+    protocol.connection_made(transport)
+    return transport, protocol
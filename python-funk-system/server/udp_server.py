@@ -1,10 +1,12 @@
+import logging
 import socket
 import threading
-from protocol import (parse_header, build_pong_packet, build_auth_ok_packet, 
+from protocol import (unpack_header, HEADER_SIZE, build_pong_packet, build_auth_ok_packet, 
                      build_auth_fail_packet, PACKET_TYPE_PING, PACKET_TYPE_AUDIO, 
-                     PACKET_TYPE_AUTH)
+                     PACKET_TYPE_AUTH, build_channel_mask)
 from config import MAX_PACKET_SIZE
 from database import Database
+from logger import log_event, flush_suppressed
 
 
 class UDPServer:
@@ -15,16 +17,17 @@ class UDPServer:
         self.socket = None
         self.running = False
         self.db = Database()
-        self.authenticated_clients = {}  # {client_address: {'username': str, 'user_id': int, 'allowed_channels': list}}
+        self.authenticated_clients = {}  # {client_address: {'username': str, 'user_id': int, 'allowed_channels': list, 'channel_mask': int}}
         self.traffic_bytes_in = 0  # Total incoming bytes
         self.traffic_bytes_out = 0  # Total outgoing bytes
+        self.traffic_bytes_suppressed = 0  # No silence suppression here, reported for the traffic API
         self.last_traffic_save = None
 
     def start(self):
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.bind((self.host, self.port))
         self.running = True
-        print(f"UDP Server listening on {self.host}:{self.port}")
+        log_event(logging.INFO, 'server_started', f"UDP Server listening on {self.host}:{self.port}")
 
     def receive_and_forward(self):
         while self.running:
@@ -34,18 +37,21 @@ class UDPServer:
                 # Track incoming traffic
                 self.traffic_bytes_in += len(data)
                 
-                packet_type, channel_id, user_id, sequence_number, payload = parse_header(data)
-                if channel_id is None:
+                header = unpack_header(data)
+                if header is None:
                     continue
+                packet_type, channel_id, user_id, sequence_number = header
                 
                 # Handle AUTH packets first
                 if packet_type == PACKET_TYPE_AUTH:
-                    self._handle_auth(client_address, channel_id, user_id, payload)
+                    self._handle_auth(client_address, channel_id, user_id, data[HEADER_SIZE:])
                     continue
                 
                 # Check if client is authenticated before processing other packets
                 if client_address not in self.authenticated_clients:
-                    print(f"⚠️ Unauthenticated client {client_address} tried to send packet type {packet_type}")
+                    log_event(logging.WARNING, 'unauthenticated_packet',
+                              "⚠️ Unauthenticated client %s tried to send packet type %s", client_address, packet_type,
+                              rate_key=client_address, client=client_address, packet_type=packet_type)
                     # Send auth fail
                     auth_fail = build_auth_fail_packet(channel_id, user_id, b'Not authenticated')
                     try:
@@ -56,8 +62,11 @@ class UDPServer:
                 
                 # Check channel permission
                 auth_info = self.authenticated_clients[client_address]
-                if channel_id not in auth_info['allowed_channels']:
-                    print(f"⚠️ User {auth_info['username']} not authorized for channel {channel_id}")
+                if not auth_info['channel_mask'] >> channel_id & 1:
+                    log_event(logging.WARNING, 'channel_not_authorized',
+                              "⚠️ User %s not authorized for channel %s", auth_info['username'], channel_id,
+                              rate_key=client_address, client=client_address, username=auth_info['username'],
+                              channel_id=channel_id)
                     continue
                 
                 self.client_registry.register_client(client_address, channel_id, user_id)
@@ -70,7 +79,8 @@ class UDPServer:
                         self.socket.sendto(pong_packet, client_address)
                         self.traffic_bytes_out += len(pong_packet)
                     except Exception as e:
-                        print(f"Failed to send PONG to {client_address}: {e}")
+                        log_event(logging.WARNING, 'send_failed', "Failed to send PONG to %s: %s", client_address, e,
+                                  rate_key=client_address)
                     continue
                 
                 # Forward audio packets to other clients in channel
@@ -85,11 +95,13 @@ class UDPServer:
                             self.socket.sendto(data, recipient_address)
                             self.traffic_bytes_out += len(data)
                         except Exception as e:
-                            print(f"Failed to send to {recipient_address}: {e}")
+                            log_event(logging.WARNING, 'send_failed', "Failed to send to %s: %s", recipient_address, e,
+                                      rate_key=recipient_address)
                         
             except Exception as e:
                 if self.running:
-                    print(f"Error receiving packet: {e}")
+                    log_event(logging.ERROR, 'packet_error', "Error receiving packet: %s", e,
+                              rate_key=type(e).__name__, error=repr(e))
     
     def _handle_auth(self, client_address, channel_id, user_id, payload):
         """Handle authentication request"""
@@ -102,7 +114,10 @@ class UDPServer:
             if user:
                 # Check channel permission
                 if channel_id not in user['allowed_channels']:
-                    print(f"🔒 User {user['username']} not authorized for channel {channel_id}")
+                    log_event(logging.WARNING, 'channel_not_authorized',
+                              f"🔒 User {user['username']} not authorized for channel {channel_id}",
+                              rate_key=client_address, client=client_address, username=user['username'],
+                              channel_id=channel_id)
                     auth_fail = build_auth_fail_packet(channel_id, user_id, b'Channel not authorized')
                     self.socket.sendto(auth_fail, client_address)
                     return
@@ -112,6 +127,7 @@ class UDPServer:
                     'username': user['username'],
                     'user_id': user['id'],
                     'allowed_channels': user['allowed_channels'],
+                    'channel_mask': build_channel_mask(user['allowed_channels']),
                     'funk_key': funk_key
                 }
                 
@@ -119,7 +135,10 @@ class UDPServer:
                 self.db.log_connection(user['id'], channel_id, 'connect', client_address[0])
                 self.db.update_last_seen(user['id'])
                 
-                print(f"✅ User {user['username']} authenticated for channel {channel_id}")
+                log_event(logging.INFO, 'authenticated',
+                          f"✅ User {user['username']} authenticated for channel {channel_id}",
+                          rate_key=client_address, client=client_address, username=user['username'],
+                          channel_id=channel_id)
                 
                 # Register client immediately in this channel
                 self.client_registry.register_client(client_address, channel_id, user['id'])
@@ -129,13 +148,15 @@ class UDPServer:
                 self.socket.sendto(auth_ok, client_address)
                 self.traffic_bytes_out += len(auth_ok)
             else:
-                print(f"❌ Invalid funk key from {client_address}")
+                log_event(logging.WARNING, 'invalid_funk_key', f"❌ Invalid funk key from {client_address}",
+                          rate_key=client_address[0], client=client_address)
                 auth_fail = build_auth_fail_packet(channel_id, user_id, b'Invalid funk key')
                 self.socket.sendto(auth_fail, client_address)
                 self.traffic_bytes_out += len(auth_fail)
                 
         except Exception as e:
-            print(f"Error handling auth: {e}")
+            log_event(logging.ERROR, 'auth_error', f"Error handling auth: {e}",
+                      rate_key=client_address, client=client_address, error=repr(e))
             auth_fail = build_auth_fail_packet(channel_id, user_id, b'Auth error')
             try:
                 self.socket.sendto(auth_fail, client_address)
@@ -144,18 +165,19 @@ class UDPServer:
 
     def cleanup_stale_clients(self):
         while self.running:
-            removed = self.client_registry.remove_stale_clients()
-            if removed > 0:
-                print(f"Removed {removed} stale clients")
+            removed = self.client_registry.expire_clients()
+            if removed:
+                log_event(logging.INFO, 'clients_expired', f"Removed {len(removed)} stale clients",
+                          count=len(removed))
                 # Clean up authentication cache for removed clients
-                stale_auth = []
-                for addr in self.authenticated_clients:
-                    if addr not in self.client_registry.clients:
-                        stale_auth.append(addr)
-                for addr in stale_auth:
-                    username = self.authenticated_clients[addr]['username']
-                    print(f"🔓 Logged out: {username}")
-                    del self.authenticated_clients[addr]
+                for client_info in removed:
+                    auth_info = self.authenticated_clients.pop(client_info['address'], None)
+                    if auth_info:
+                        log_event(logging.INFO, 'logged_out', f"🔓 Logged out: {auth_info['username']}",
+                                  username=auth_info['username'], client=client_info['address'])
+            
+            # Summaries for rate-limited messages of clients that went quiet
+            flush_suppressed()
             
             # Save traffic stats every 5 minutes
             self._save_traffic_stats()
@@ -177,12 +199,13 @@ class UDPServer:
         if self.traffic_bytes_in > 0 or self.traffic_bytes_out > 0:
             try:
                 self.db.record_traffic(self.traffic_bytes_in, self.traffic_bytes_out)
-                print(f"📊 Traffic gespeichert: ⬇️ {self._format_bytes(self.traffic_bytes_in)} | ⬆️ {self._format_bytes(self.traffic_bytes_out)}")
+                log_event(logging.INFO, 'traffic_saved',
+                          f"📊 Traffic gespeichert: ⬇️ {self._format_bytes(self.traffic_bytes_in)} | ⬆️ {self._format_bytes(self.traffic_bytes_out)}")
                 self.traffic_bytes_in = 0
                 self.traffic_bytes_out = 0
                 self.last_traffic_save = now
             except Exception as e:
-                print(f"Fehler beim Speichern der Traffic-Statistiken: {e}")
+                log_event(logging.ERROR, 'traffic_save_failed', f"Fehler beim Speichern der Traffic-Statistiken: {e}")
     
     def _format_bytes(self, bytes_val):
         """Format bytes to human readable format"""
@@ -198,9 +221,10 @@ class UDPServer:
         if self.traffic_bytes_in > 0 or self.traffic_bytes_out > 0:
             try:
                 self.db.record_traffic(self.traffic_bytes_in, self.traffic_bytes_out)
-                print(f"📊 Final traffic saved: ⬇️ {self._format_bytes(self.traffic_bytes_in)} | ⬆️ {self._format_bytes(self.traffic_bytes_out)}")
+                log_event(logging.INFO, 'traffic_saved',
+                          f"📊 Final traffic saved: ⬇️ {self._format_bytes(self.traffic_bytes_in)} | ⬆️ {self._format_bytes(self.traffic_bytes_out)}")
             except Exception as e:
-                print(f"Fehler beim Speichern der finalen Traffic-Statistiken: {e}")
+                log_event(logging.ERROR, 'traffic_save_failed', f"Fehler beim Speichern der finalen Traffic-Statistiken: {e}")
         if self.socket:
             self.socket.close()
     
@@ -208,7 +232,8 @@ class UDPServer:
         """Get current traffic counters (not yet saved)"""
         return {
             "bytes_in": self.traffic_bytes_in,
-            "bytes_out": self.traffic_bytes_out
+            "bytes_out": self.traffic_bytes_out,
+            "bytes_suppressed": self.traffic_bytes_suppressed
         }
     
     def forward_to_channel(self, channel_id, packet, exclude_user_id=None):
@@ -239,6 +264,7 @@ class UDPServer:
                 self.traffic_bytes_out += len(packet)
                 sent_count += 1
             except Exception as e:
-                print(f"Failed to send to {recipient_address}: {e}")
+                log_event(logging.WARNING, 'send_failed', "Failed to send to %s: %s", recipient_address, e,
+                          rate_key=recipient_address)
         
         return sent_count
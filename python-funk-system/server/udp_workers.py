@@ -0,0 +1,221 @@
+"""
+Multi-process UDP relay using SO_REUSEPORT
+
+Every worker process binds SERVER_PORT with SO_REUSEPORT, the kernel then
+spreads clients across workers by hashing the source address. A client
+therefore always talks to the same worker, which keeps its AUTH state
+local. Channel members can however be spread over several workers, so
+each worker owns a Unix datagram socket and:
+
+- advertises which channels have local members (256-bit bitmap)
+- relays every released audio packet to the peers that advertised the channel
+- broadcasts session control messages (admin revocation/kick) to all peers
+
+Relay message format: '!BBi' header (kind, channel_id / worker index,
+exclude_user_id or -1) followed by the payload (JSON for control messages).
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import struct
+
+RELAY_PACKET = 0
+RELAY_INTEREST = 1
+RELAY_CONTROL = 2
+_RELAY_HEADER = struct.Struct('!BBi')
+_NO_EXCLUDE = -1
+
+
+def channels_to_bitmap(channels):
+    """Encode a set of channel IDs (0-255) as 32 bytes"""
+    bits = 0
+    for channel_id in channels:
+        bits |= 1 << channel_id
+    return bits.to_bytes(32, 'big')
+
+
+def bitmap_to_channels(bitmap):
+    """Decode a 32 byte bitmap into a frozenset of channel IDs"""
+    bits = int.from_bytes(bitmap, 'big')
+    return frozenset(c for c in range(256) if bits >> c & 1)
+
+
+class WorkerRelayProtocol(asyncio.DatagramProtocol):
+    """Receives relay messages from peer workers"""
+
+    def __init__(self, relay):
+        self.relay = relay
+        super().__init__()
+
+    def datagram_received(self, data, addr):
+        self.relay.message_received(data)
+
+    def error_received(self, exc):
+        # Peer not (yet) bound or already gone - it re-advertises when it's back
+        pass
+
+
+class WorkerRelay:
+    """Unix-socket link between the SO_REUSEPORT workers of one host"""
+
+    def __init__(self, index, count, socket_dir):
+        self.index = index
+        self.count = count
+        self.socket_dir = socket_dir
+        self.server = None
+        self.transport = None
+        self.local_channels = frozenset()
+        self.peer_channels = {}  # {peer_index: frozenset(channel_ids with members there)}
+        self.peer_paths = {
+            peer: self.socket_path(socket_dir, peer)
+            for peer in range(count) if peer != index
+        }
+        self.packets_relayed = 0
+        self.packets_delivered = 0
+
+    @staticmethod
+    def socket_path(socket_dir, index):
+        return os.path.join(socket_dir, f"worker-{index}.sock")
+
+    async def start(self, server):
+        """Bind this worker's Unix socket and announce local channels"""
+        self.server = server
+        path = self.socket_path(self.socket_dir, self.index)
+        if os.path.exists(path):
+            os.unlink(path)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind(path)
+
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: WorkerRelayProtocol(self),
+            sock=sock
+        )
+        self.advertise(force=True)
+
+    def relay_packet(self, channel_id, packet, exclude_user_id=None):
+        """Send a packet to every peer worker with members in the channel"""
+        message = None
+        for peer, channels in self.peer_channels.items():
+            if channel_id in channels:
+                if message is None:
+                    exclude = _NO_EXCLUDE if exclude_user_id is None else exclude_user_id
+                    message = _RELAY_HEADER.pack(RELAY_PACKET, channel_id, exclude) + packet
+                self.transport.sendto(message, self.peer_paths[peer])
+                self.packets_relayed += 1
+
+    def advertise(self, force=False):
+        """Tell peers which channels have members in this worker (if changed)"""
+        if self.transport is None:
+            return
+        channels = frozenset(self.server.client_registry.channels)
+        if not force and channels == self.local_channels:
+            return
+        self.local_channels = channels
+        message = _RELAY_HEADER.pack(RELAY_INTEREST, self.index, _NO_EXCLUDE) + channels_to_bitmap(channels)
+        for path in self.peer_paths.values():
+            self.transport.sendto(message, path)
+
+    def send_control(self, message):
+        """Broadcast a session control message (dict) to every peer worker"""
+        if self.transport is None:
+            return
+        data = _RELAY_HEADER.pack(RELAY_CONTROL, self.index, _NO_EXCLUDE) + json.dumps(message).encode('utf-8')
+        for path in self.peer_paths.values():
+            self.transport.sendto(data, path)
+
+    def message_received(self, data):
+        if len(data) < _RELAY_HEADER.size:
+            return
+        kind, value, exclude = _RELAY_HEADER.unpack_from(data)
+        payload = data[_RELAY_HEADER.size:]
+
+        if kind == RELAY_PACKET:
+            self.packets_delivered += 1
+            self.server.deliver_relayed(value, payload, None if exclude == _NO_EXCLUDE else exclude)
+        elif kind == RELAY_INTEREST and value in self.peer_paths:
+            is_new_peer = value not in self.peer_channels
+            self.peer_channels[value] = bitmap_to_channels(payload)
+            if is_new_peer:
+                # Peer just (re)started - send our state right away
+                self.advertise(force=True)
+        elif kind == RELAY_CONTROL:
+            self.server.apply_session_control(json.loads(payload), relay=False)
+
+    def close(self):
+        if self.transport:
+            self.transport.close()
+            self.transport = None
+        path = self.socket_path(self.socket_dir, self.index)
+        if os.path.exists(path):
+            os.unlink(path)
+
+    def get_stats(self):
+        return {
+            "worker": self.index,
+            "workers": self.count,
+            "local_channels": sorted(self.local_channels),
+            "peer_channels": {peer: sorted(ch) for peer, ch in self.peer_channels.items()},
+            "packets_relayed": self.packets_relayed,
+            "packets_delivered": self.packets_delivered
+        }
+
+
+async def serve_udp_worker(index, count, socket_dir, host, port):
+    """Run one additional relay worker until SIGINT/SIGTERM"""
+    from config import TIMEOUT_SECONDS
+    from client_registry import ClientRegistry
+    from async_udp_server import AsyncUDPServer
+
+    server = AsyncUDPServer(host, port, ClientRegistry(TIMEOUT_SECONDS), reuse_port=True)
+    server.worker_relay = WorkerRelay(index, count, socket_dir)
+    await server.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await stop.wait()
+    await server.stop()
+
+
+def run_udp_worker(index, count, socket_dir, host, port):
+    """Process entry point for worker `index`"""
+    from event_loop import run
+    run(serve_udp_worker(index, count, socket_dir, host, port))
+
+
+def start_udp_workers(count, socket_dir, host, port):
+    """
+    Spawn workers 1..count-1 (worker 0 runs in the calling process)
+
+    Returns:
+        List of started multiprocessing.Process objects
+    """
+    ctx = multiprocessing.get_context("spawn")
+    processes = []
+    for index in range(1, count):
+        process = ctx.Process(
+            target=run_udp_worker,
+            args=(index, count, socket_dir, host, port),
+            name=f"udp-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def stop_udp_workers(processes, timeout=5):
+    """Ask worker processes to shut down gracefully and wait for them"""
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(timeout)
@@ -324,14 +324,17 @@ async function loadStats() {
             // 24 hours
             document.getElementById('traffic_24h_in').textContent = data.traffic['24h'].bytes_in_formatted;
             document.getElementById('traffic_24h_out').textContent = data.traffic['24h'].bytes_out_formatted;
+            document.getElementById('traffic_24h_suppressed').textContent = data.traffic['24h'].bytes_suppressed_formatted;
             
             // 7 days
             document.getElementById('traffic_7d_in').textContent = data.traffic['7d'].bytes_in_formatted;
             document.getElementById('traffic_7d_out').textContent = data.traffic['7d'].bytes_out_formatted;
+            document.getElementById('traffic_7d_suppressed').textContent = data.traffic['7d'].bytes_suppressed_formatted;
             
             // 30 days
             document.getElementById('traffic_30d_in').textContent = data.traffic['30d'].bytes_in_formatted;
             document.getElementById('traffic_30d_out').textContent = data.traffic['30d'].bytes_out_formatted;
+            document.getElementById('traffic_30d_suppressed').textContent = data.traffic['30d'].bytes_suppressed_formatted;
         }
     } catch (error) {
         console.error('Error loading stats:', error);